@@ -1,10 +1,20 @@
+import argparse
+import asyncio
+
 import uvicorn
 from app.core.settings import settings
+from taskiq.cli.scheduler.args import SchedulerArgs
+from taskiq.cli.scheduler.run import run_scheduler
+from taskiq.cli.worker.args import WorkerArgs
+from taskiq.cli.worker.run import run_worker
 
+_BROKER = "app.background.broker:broker"
+_SCHEDULER = "app.background.broker:scheduler"
+_TASK_MODULES = ["app.services.job.dispatcher"]
 
-def main() -> None:
-    """Entrypoint of the application."""
 
+def run_api() -> None:
+    """Runs the API server."""
     uvicorn.run(
         "app.api.application:get_app",
         workers=settings.uvicorn_workers_count,
@@ -16,5 +26,47 @@ def main() -> None:
     )
 
 
+def run_workers() -> None:
+    """Runs the taskiq workers that launch and handle Jobs."""
+    run_worker(
+        WorkerArgs(
+            broker=_BROKER,
+            modules=_TASK_MODULES,
+            workers=settings.taskiq_workers_count,
+            log_level=settings.log_level.value,
+        ),
+    )
+
+
+def run_job_scheduler() -> None:
+    """Runs the scheduler that triggers the Job Manager sweeps."""
+    asyncio.run(
+        run_scheduler(
+            SchedulerArgs(
+                scheduler=_SCHEDULER,
+                modules=_TASK_MODULES,
+                log_level=settings.log_level.value,
+            ),
+        ),
+    )
+
+
+def main() -> None:
+    """Entrypoint of the application."""
+    parser = argparse.ArgumentParser(prog="buildbot")
+    parser.add_argument(
+        "mode",
+        nargs="?",
+        choices=["api", "worker", "scheduler"],
+        default="api",
+        help="Process to run (default: api)",
+    )
+    {
+        "api": run_api,
+        "worker": run_workers,
+        "scheduler": run_job_scheduler,
+    }[parser.parse_args().mode]()
+
+
 if __name__ == "__main__":
     main()
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -11,3 +13,34 @@ class GetJobStatusResponse(BaseModel):
     """Job status response model."""
 
     status: str
+
+
+class GetJobUsageResponse(BaseModel):
+    """Job resource usage response model."""
+
+    cpu_seconds: float
+    peak_memory_bytes: int
+    block_read_bytes: int
+    block_write_bytes: int
+    network_rx_bytes: int
+    network_tx_bytes: int
+    samples: int
+
+
+class StartLatency(BaseModel):
+    """Job start latency model."""
+
+    count: int
+    p50_ms: Optional[float]
+    p99_ms: Optional[float]
+
+
+class GetJobPoolStatsResponse(BaseModel):
+    """Warm container pool statistics response model."""
+
+    size: int
+    idle: int
+    hits: int
+    misses: int
+    warm_start: StartLatency
+    cold_start: StartLatency
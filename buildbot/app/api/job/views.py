@@ -1,18 +1,39 @@
+import asyncio
 from pathlib import Path
-from typing import List
+from typing import AsyncIterator, List, Optional
 
-from app.api.job.schema import CreateJobResponse, GetJobStatusResponse
+from app.api.job.schema import (
+    CreateJobResponse,
+    GetJobPoolStatsResponse,
+    GetJobStatusResponse,
+    GetJobUsageResponse,
+)
+from app.core.enums import JobManagerType
 from app.core.exceptions import (
+    ArtifactCorruptedError,
     JobCreationError,
     JobFailedError,
+    JobLogsNotAvailableError,
     JobNotCompletedError,
     JobNotFoundError,
     JobOutputNotFoundError,
+    JobQueueFullError,
+    JobUsageNotFoundError,
     TaskNotFoundError,
 )
+from app.core.settings import settings
 from app.services.job import JobService
-from app.services.job.schema import JobDTO
-from fastapi import APIRouter, Depends, HTTPException, status
+from app.services.job.pool import get_pool_stats
+from app.services.job.schema import JobDTO, LogEntry
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
 from fastapi.responses import StreamingResponse
 
 router = APIRouter()
@@ -35,6 +56,7 @@ async def create_job(
 
     :param job_request: The CreateJobRequest
     :return: The ID of the created Job
+    :raises HTTPException: If the Task is not found or the queue is full
     """
     try:
         job_id = await job_svc.create(job_request)
@@ -44,6 +66,28 @@ async def create_job(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
         ) from e
+    except JobQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        ) from e
+
+
+@router.get("/pool", response_model=GetJobPoolStatsResponse, tags=_tags)
+async def get_job_pool_stats() -> GetJobPoolStatsResponse:
+    """
+    Retrieve the warm container pool statistics of all the Job runners.
+
+    :return: The pool hit/miss counters and the Job start latencies
+    :raises HTTPException: If Jobs do not run in containers
+    """
+    if settings.job_manager_settings.type != JobManagerType.CONTAINER:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Jobs do not run in containers.",
+        )
+    return GetJobPoolStatsResponse(**await get_pool_stats())
 
 
 @router.get("/{job_id}/status", tags=_tags)
@@ -65,26 +109,58 @@ async def get_job_status(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
 
-@router.get("/{job_id}/output/{file_path}", tags=_tags)
+@router.get(
+    "/{job_id}/usage",
+    response_model=GetJobUsageResponse,
+    tags=_tags,
+)
+async def get_job_usage(
+    job_id: str,
+    job_svc: JobService = Depends(),
+) -> GetJobUsageResponse:
+    """
+    Retrieve the resource usage of a Job.
+
+    :param job_id: The ID of the Job
+    :return: The CPU, memory, block I/O and network usage of the Job
+    :raises HTTPException: If the Job or its usage is not found or it has not ended yet
+    """
+    try:
+        usage = await job_svc.get_usage(job_id)
+        return GetJobUsageResponse(**usage.model_dump())
+    except (JobNotFoundError, JobUsageNotFoundError) as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
+    except JobNotCompletedError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
+
+
+@router.get("/{job_id}/output/{file_path:path}", tags=_tags)
 async def get_job_output(
     job_id: str,
     file_path: Path,
+    archive: bool = False,
     job_svc: JobService = Depends(),
 ) -> StreamingResponse:
     """Get a file from a Job's output.
 
     :param job_id: The ID of the Job
     :param file_path: The path to the file within the Job's output
+    :param archive: Whether to get the file wrapped into a .tar.gz archive
     :raise HTTPException: If the Job does not exist or is not completed
     :return: The contents of the file
     """
     try:
-        return await job_svc.get_output(job_id, file_path)
+        return await job_svc.get_output(job_id, file_path, archive)
     except JobOutputNotFoundError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cannot retrieve the output. Not found.",
         ) from e
+    except ArtifactCorruptedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e),
+        ) from e
     except JobNotCompletedError as e:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT) from e
     except JobFailedError as e:
@@ -102,3 +178,98 @@ async def get_job_output(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found",
         ) from e
+
+
+@router.get("/{job_id}/logs/stream", tags=_tags)
+async def stream_job_logs(
+    job_id: str,
+    offset: int = 0,
+    last_event_id: Optional[int] = Header(default=None),
+    job_svc: JobService = Depends(),
+) -> StreamingResponse:
+    """
+    Stream a Job's live logs as Server-Sent Events.
+
+    :param job_id: The ID of the Job
+    :param offset: The offset of the first log line to replay
+    :param last_event_id: The last event received before reconnecting
+    :return: The Job's log lines as an event stream
+    :raises HTTPException: If the Job is not found or is not running
+    """
+    if last_event_id is not None:
+        offset = max(offset, last_event_id + 1)
+    try:
+        entries = await job_svc.stream_logs(job_id, offset)
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
+    except JobLogsNotAvailableError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
+
+    return StreamingResponse(
+        _to_server_sent_events(entries),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/{job_id}/logs/stream")
+async def stream_job_logs_ws(
+    websocket: WebSocket,
+    job_id: str,
+    offset: int = 0,
+    job_svc: JobService = Depends(),
+) -> None:
+    """
+    Stream a Job's live logs over a WebSocket.
+
+    :param websocket: The WebSocket connection
+    :param job_id: The ID of the Job
+    :param offset: The offset of the first log line to replay
+    """
+    try:
+        entries = await job_svc.stream_logs(job_id, offset)
+    except (JobNotFoundError, JobLogsNotAvailableError) as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e))
+        return
+
+    await websocket.accept()
+    # ? Viewers never send anything, so a disconnect would only be noticed on
+    # ? the next send, which does not come while the Job is silent. Reading
+    # ? concurrently notices it at once and lets go of the log follower.
+    sender = asyncio.create_task(_send_log_entries(websocket, entries))
+    receiver = asyncio.create_task(_wait_for_disconnect(websocket))
+    try:
+        await asyncio.wait([sender, receiver], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in [sender, receiver]:
+            task.cancel()
+        await asyncio.gather(sender, receiver, return_exceptions=True)
+        await entries.aclose()
+    if not sender.cancelled():
+        sender.result()
+
+
+async def _send_log_entries(
+    websocket: WebSocket,
+    entries: AsyncIterator[LogEntry],
+) -> None:
+    try:
+        async for entry in entries:
+            await websocket.send_json(entry.model_dump())
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+async def _wait_for_disconnect(websocket: WebSocket) -> None:
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+async def _to_server_sent_events(
+    entries: AsyncIterator[LogEntry],
+) -> AsyncIterator[str]:
+    async for entry in entries:
+        # ? A bare carriage return would end the SSE line, so it splits data lines.
+        data = "".join(f"data: {part}\n" for part in entry.data.split("\r"))
+        yield f"id: {entry.offset}\nevent: {entry.stream}\n{data}\n"
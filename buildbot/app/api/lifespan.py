@@ -1,8 +1,11 @@
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
-from app.background.broker import broker
+from app.background.broker import broker, job_manager
+from app.core.docker.fleet import get_docker_fleet
+from app.core.enums import BrokerType, JobManagerType
 from app.core.settings import settings
+from app.services.job.dispatcher import get_job_dispatcher
 from app.services.job.runner import get_job_runner
 from fastapi import FastAPI
 
@@ -21,14 +24,30 @@ async def lifespan_setup(
     :return: Async generator for the app lifespan.
     """
 
+    # ? Jobs are launched by the taskiq workers, or by the API itself when
+    # ? the in-memory broker is used and there are no workers.
+    runs_jobs = broker.is_worker_process or settings.broker_type == BrokerType.MEMORY
     app.middleware_stack = None
     try:
         if not broker.is_worker_process:
             await broker.startup()
         app.middleware_stack = app.build_middleware_stack()
-        get_job_runner(settings.job_manager_settings.type).startup()
+        if runs_jobs:
+            await get_job_runner(settings.job_manager_settings.type).startup()
+            await get_job_dispatcher().start()
+        elif settings.job_manager_settings.type == JobManagerType.CONTAINER:
+            # ? Live logs are followed by the API, from the daemon running the Job.
+            await get_docker_fleet().connect()
+        if broker.is_worker_process:
+            await job_manager.start()
         yield
 
     finally:
+        if broker.is_worker_process:
+            await job_manager.stop()
+        if runs_jobs:
+            await get_job_dispatcher().stop()
+            await get_job_runner(settings.job_manager_settings.type).shutdown()
         if not broker.is_worker_process:
             await broker.shutdown()
+        get_docker_fleet().close()
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, field_validator
 
 
@@ -29,3 +31,4 @@ class GetTaskResponse(BaseModel):
     """Task response model."""
 
     script: str
+    resource_profile: Optional[str] = None
@@ -5,7 +5,7 @@ from app.api.task.schema import (
     GetTaskResponse,
     UpdateTaskResponse,
 )
-from app.core.exceptions import TaskNotFoundError
+from app.core.exceptions import ResourceProfileNotFoundError, TaskNotFoundError
 from app.services.task import TaskService
 from app.services.task.schema import TaskDTO
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -29,9 +29,16 @@ async def create_task(
 
     :param task: The CreateTaskRequest
     :return: The ID of the created Task
+    :raises HTTPException: If the resource profile does not exist
     """
-    task_id = await task_svc.create(task)
-    return CreateTaskResponse(task_id=task_id)
+    try:
+        task_id = await task_svc.create(task)
+        return CreateTaskResponse(task_id=task_id)
+    except ResourceProfileNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
 
 
 @router.get("/", response_model=GetTaskResponse, tags=_tags)
@@ -48,7 +55,10 @@ async def get_task(
     """
     try:
         task = await task_svc.get(task_id)
-        return GetTaskResponse(script=task.script)
+        return GetTaskResponse(
+            script=task.script,
+            resource_profile=task.resource_profile,
+        )
     except TaskNotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND) from e
 
@@ -77,3 +87,8 @@ async def update_task(
         return UpdateTaskResponse(task_id=task_id)
     except TaskNotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND) from e
+    except ResourceProfileNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
@@ -1,22 +1,52 @@
 import taskiq_fastapi
-from app.background.job_manager.container import (
-    ContainerJobManager,
-    get_container_manager,
-)
+from app.background.job_manager import JobManager, get_job_manager
+from app.core.enums import BrokerType
 from app.core.settings import settings
 from taskiq import AsyncBroker, InMemoryBroker, TaskiqScheduler
 from taskiq.schedule_sources import LabelScheduleSource
+from taskiq_redis import ListQueueBroker
 
 SCHEDULE: str = [{"cron": settings.job_manager_settings.schedule}]
 
-broker: AsyncBroker = InMemoryBroker()
-scheduler = TaskiqScheduler(
+
+# ? The in-memory broker runs every task in the process that sends it. The
+# ? Redis broker hands them to `taskiq worker` processes, which launch and
+# ? handle the Jobs, so the API only persists and enqueues them.
+def _create_broker() -> AsyncBroker:
+    if settings.broker_type == BrokerType.REDIS:
+        return ListQueueBroker(
+            url=settings.redis_settings.get_url(),
+            queue_name=settings.broker_queue_name,
+        )
+    return InMemoryBroker()
+
+
+broker: AsyncBroker = _create_broker()
+
+job_manager: JobManager = get_job_manager(settings.job_manager_settings.type)
+
+
+class JobManagerScheduler(TaskiqScheduler):
+    """Scheduler that also runs the Job Manager when there are no workers."""
+
+    async def startup(self) -> None:
+        """Starts the broker and the Job Manager."""
+        await super().startup()
+        if settings.broker_type == BrokerType.MEMORY:
+            await job_manager.start()
+
+    async def shutdown(self) -> None:
+        """Stops the Job Manager and the broker."""
+        if settings.broker_type == BrokerType.MEMORY:
+            await job_manager.stop()
+        await super().shutdown()
+
+
+scheduler = JobManagerScheduler(
     broker=broker,
     sources=[LabelScheduleSource(broker)],
 )
 
-job_manager: ContainerJobManager = get_container_manager()
-
 
 @broker.task(schedule=SCHEDULE)
 async def manage_jobs() -> None:
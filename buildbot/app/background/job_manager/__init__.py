@@ -3,5 +3,27 @@ from app.background.job_manager.container.manager import (
     get_container_manager,
 )
 from app.background.job_manager.manager_base import JobManager
+from app.background.job_manager.process.manager import (
+    ProcessJobManager,
+    get_process_manager,
+)
+from app.core.enums import JobManagerType
+
+
+def get_job_manager(job_manager_type: JobManagerType) -> JobManager:
+    """Returns the Job Manager of a Job Manager type."""
+    if job_manager_type == JobManagerType.CONTAINER:
+        return get_container_manager()
+    if job_manager_type == JobManagerType.PROCESS:
+        return get_process_manager()
+    raise NotImplementedError(f"Unsupported job manager type: {job_manager_type}")
 
-__all__ = ["get_container_manager", JobManager, ContainerJobManager]
+
+__all__ = [
+    "get_container_manager",
+    "get_job_manager",
+    "get_process_manager",
+    JobManager,
+    ContainerJobManager,
+    ProcessJobManager,
+]
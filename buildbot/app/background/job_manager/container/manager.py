@@ -1,76 +1,252 @@
 from __future__ import annotations
 
 import asyncio
-from io import BytesIO
+import contextlib
+import time
+from functools import partial
+from typing import Dict, List, Optional, Set
 
 import loguru
 from app.background.job_manager.container.handler import ContainerJobArtifactHandler
+from app.background.job_manager.container.reconciler import ContainerJobReconciler
+from app.background.job_manager.container.stats import ContainerStatsSampler
+from app.background.job_manager.container.watchdog import ContainerDeadlineWatchdog
+from app.background.job_manager.container.watcher import ContainerEventWatcher
 from app.background.job_manager.manager_base import JobManager
-from app.background.job_manager.utils import JobOutput
+from app.background.job_manager.sharding import JobOwnership
+from app.background.job_manager.utils import JobOutput, LogBuffer
+from app.core.docker.client import AsyncDockerClient
+from app.core.docker.fleet import get_docker_fleet
 from app.core.docker.utils import ContainerStatus as Status
-from app.core.docker.utils import Labels, get_docker_client
+from app.core.docker.utils import Labels, get_job_id
 from app.core.settings import ContainerJobManagerSettings, settings
+from app.repository.job.queue import get_job_queue_repository
 from app.repository.job.repository import get_job_repository
 from app.repository.job.schemas import JobStatus
+from docker.errors import NotFound
 from docker.models.containers import Container
 from loguru import logger
 
 _container_settings: ContainerJobManagerSettings = settings.job_manager_settings
 
+# ? Only the end of stderr is logged when a Job fails.
+_ERROR_LOG_TAIL = 4096
 
-# ? Fallback background task to collect pending jobs
+
+# ? Terminated containers are picked up by the event watcher as soon as Docker
+# ? reports them; manage_jobs is kept as a low-frequency fallback sweep.
 class ContainerJobManager(JobManager):
     """Container Job Manager."""
 
     def __init__(self) -> None:
         self._logger = logger.bind(job_manager=type(self))
-        self._client = get_docker_client()
-        self._handler = ContainerJobArtifactHandler(self._client)
+        self._fleet = get_docker_fleet()
+        self._handler = ContainerJobArtifactHandler()
         self._job_repo = get_job_repository()
+        self._job_queue = get_job_queue_repository()
+        self._ownership = JobOwnership()
+        self._watchers: Dict[str, ContainerEventWatcher] = {}
+        self._watchdog = ContainerDeadlineWatchdog(
+            self._fleet,
+            self._job_repo,
+            self._ownership.owns,
+        )
+        self._stats = ContainerStatsSampler(self._fleet, self._ownership.owns)
+        self._reconciler = ContainerJobReconciler(
+            self._fleet,
+            self._job_repo,
+            self._job_queue,
+        )
+        self._in_flight: Set[str] = set()
+        self._seen: Set[str] = set()
+        self._workers = asyncio.Semaphore(_container_settings.concurrent_jobs)
+
+    # ? Every Docker host has its own events stream. Hosts unreachable at
+    # ? start-up are only covered by the fallback sweep.
+    async def start(self) -> None:
+        """Joins the Job Managers and starts the watchers, watchdog and sampler."""
+        await self._ownership.start()
+        if _container_settings.watch_events:
+            await self._fleet.connect()
+            for host, docker in self._fleet.clients.items():
+                watcher = ContainerEventWatcher(
+                    partial(self.handle_container, host=host),
+                    docker,
+                    on_started=partial(self._stats.sample_started, docker),
+                )
+                watcher.start()
+                self._watchers[host] = watcher
+        self._watchdog.start()
+        self._stats.start()
+
+    async def stop(self) -> None:
+        """Stops the watchers, watchdog and sampler and leaves the Job Managers."""
+        await asyncio.gather(*[watcher.stop() for watcher in self._watchers.values()])
+        self._watchers.clear()
+        await self._watchdog.stop()
+        await self._stats.stop()
+        await self._ownership.stop()
 
     async def manage_jobs(self) -> None:
         """Handles the termination of a container, updating job status and saving outputs."""
         self._logger.info("Starting container status check cycle.")
+        started_at = time.monotonic()
+
+        # ? Label and status filters are applied by the daemon and the listing
+        # ? is sparse, so unrelated containers are never inspected.
+        containers = await self._fleet.list_containers(
+            all=True,
+            sparse=True,
+            filters={
+                "label": Labels.JOB_ID,
+                "status": [Status.EXITED, Status.DEAD],
+            },
+        )
+        # ? Each Job Manager only handles the Jobs it owns. Unclaimed warm
+        # ? containers belong to no Job and may be removed by any of them.
+        hosts = {
+            container.id: host
+            for host, listing in containers.items()
+            for container in listing
+            if (job_id := get_job_id(container)) is None or self._ownership.owns(job_id)
+        }
+        self._seen &= hosts.keys()
+
+        waits = await asyncio.gather(
+            *[
+                self.handle_container(container_id, hosts[container_id])
+                for container_id in hosts.keys() - self._seen - self._in_flight
+            ],
+        )
+        self._log_cycle_stats(
+            [wait for wait in waits if wait is not None],
+            time.monotonic() - started_at,
+        )
 
-        containers = self._client.containers
-        for container in containers.list(all=True):
-            try:
-                job_id = container.labels.get(Labels.JOB_ID)
-                job_logger = self._logger.bind(job_id=job_id)
-                if not job_id:
-                    self._logger.debug("Skipping container without job_id label.")
-                    continue
-                if container.status == Status.RUNNING:
-                    job_logger.info(f"Container '{container.name}' is still running.")
-                else:
-                    await self._handle_container_termination(
-                        job_id=job_id,
-                        job_logger=job_logger,
-                        container=container,
-                    )
-            except Exception as e:
-                job_logger.error(f"Error handling container termination: {e}")
+        if not self._ownership.is_leader:
+            return
+        try:
+            await self._reconciler.reconcile(busy_containers=self._in_flight)
+        except Exception as e:
+            self._logger.error(f"Error reconciling Jobs with containers: {e}")
+
+    # ? The watcher and the fallback sweep may report the same container,
+    # ? so only one of them is allowed to handle it at a time. Handling is
+    # ? bounded by `concurrent_jobs` so one slow upload does not stall the rest.
+    async def handle_container(
+        self,
+        container_id: str,
+        host: Optional[str] = None,
+    ) -> Optional[float]:
+        """Handles a terminated container and returns its worker wait in seconds."""
+        if container_id in self._in_flight:
+            self._logger.debug(f"Container '{container_id}' is already being handled.")
+            return None
+        self._in_flight.add(container_id)
+        queued_at = time.monotonic()
+        try:
+            async with self._workers:
+                waited = time.monotonic() - queued_at
+                await self._process_container(
+                    self._fleet.get_client(host),
+                    container_id,
+                    waited,
+                )
+            return waited
+        finally:
+            self._in_flight.discard(container_id)
+
+    async def _process_container(
+        self,
+        docker: AsyncDockerClient,
+        container_id: str,
+        waited: float,
+    ) -> None:
+        try:
+            container = await docker.get_container(container_id)
+        except NotFound:
+            self._logger.debug(f"Container '{container_id}' was already removed.")
+            return
+
+        job_id = get_job_id(container)
+        if not job_id:
+            # ? A warm container that exited before it was claimed by a Job.
+            with contextlib.suppress(NotFound):
+                await docker.remove_container(container, force=True)
+            return
+        if not await self._ownership.acquire(job_id):
+            self._logger.debug(f"Job '{job_id}' is handled by another Job Manager.")
+            return
+        try:
+            # ? Another Job Manager may have handled the container meanwhile.
+            await docker.run_in_executor(container.reload)
+        except NotFound:
+            await self._ownership.release(job_id)
+            self._logger.debug(f"Container '{container_id}' was already removed.")
+            return
+        try:
+            await self._process_job_container(docker, job_id, container, waited)
+        finally:
+            await self._ownership.release(job_id)
+
+    async def _process_job_container(
+        self,
+        docker: AsyncDockerClient,
+        job_id: str,
+        container: Container,
+        waited: float,
+    ) -> None:
+        job_logger = self._logger.bind(job_id=job_id)
+        job_logger.debug(
+            f"Container '{container.name}' waited {waited:.3f}s for a worker.",
+        )
+        try:
+            await self._handle_container_termination(
+                docker=docker,
+                job_id=job_id,
+                job_logger=job_logger,
+                container=container,
+            )
+            self._seen.add(container.id)
+        except Exception as e:
+            job_logger.error(f"Error handling container termination: {e}")
+
+    def _log_cycle_stats(self, waits: List[float], duration: float) -> None:
+        if not waits:
+            self._logger.info(
+                f"Check cycle finished in {duration:.3f}s. No jobs ended.",
+            )
+            return
+        self._logger.info(
+            f"Check cycle handled {len(waits)} containers in {duration:.3f}s "
+            f"({len(waits) / duration:.2f} containers/s). Worker wait: "
+            f"avg={sum(waits) / len(waits):.3f}s, max={max(waits):.3f}s.",
+        )
 
     async def _handle_container_termination(
         self,
+        docker: AsyncDockerClient,
         job_id: str,
         container: Container,
         job_logger: loguru.Logger,
     ) -> None:
         """Handles the termination of a container, updating job status and saving outputs."""
+        logs = JobOutput(job_id=job_id)
         try:
             exit_code = container.attrs["State"]["ExitCode"]
             job_logger.info(
                 f"Container '{container.name}' stopped with exit code {exit_code}.",
             )
-            logs = self._get_container_logs(container, job_id)
+            await docker.collect_logs(container, logs.write)
+            await self._job_repo.update_usage(job_id, self._stats.pop(job_id))
             if exit_code != 0:
                 await self._handle_errors(logs.stderr, job_id, job_logger)
             else:
                 job_logger.info(f"Job '{job_id}' completed successfully.")
                 await self._job_repo.update_status(job_id, JobStatus.SUCCEEDED)
 
-            tar_stream, _ = container.get_archive(
+            tar_stream = docker.stream_archive(
+                container,
                 str(_container_settings.workdir),
             )
             await asyncio.gather(
@@ -78,26 +254,22 @@ class ContainerJobManager(JobManager):
                 self._handler.handle_outputs(logs),
             )
 
-            container.remove(force=True)
+            await docker.remove_container(container, force=True)
         except Exception as e:
             job_logger.error(f"Error handling container termination: {e}")
             raise
-
-    def _get_container_logs(self, container: Container, job_id: str) -> JobOutput:
-        return JobOutput(
-            job_id=job_id,
-            stderr=container.logs(stdout=False, stderr=True),
-            stdout=container.logs(stdout=True, stderr=False),
-        )
+        finally:
+            logs.close()
+            # ? Frees the Job's running slot so the dispatcher can admit the next one.
+            await self._job_queue.release(job_id)
 
     async def _handle_errors(
         self,
-        stderr: BytesIO,
+        stderr: LogBuffer,
         job_id: str,
         job_logger: loguru.Logger,
     ) -> None:
-        stderr.seek(0)
-        stderr_str = stderr.getvalue().decode("utf-8", errors="replace")
+        stderr_str = stderr.tail(_ERROR_LOG_TAIL).decode("utf-8", errors="replace")
         job_logger.error(f"Job '{job_id}' failed. Logs: {stderr_str}")
         await self._job_repo.update_status(job_id, JobStatus.FAILED)
 
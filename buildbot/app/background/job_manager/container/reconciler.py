@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import loguru
+from app.core.docker.client import AsyncDockerClient
+from app.core.docker.fleet import DockerFleet, get_docker_fleet
+from app.core.docker.utils import ContainerStatus as Status
+from app.core.docker.utils import Labels, get_job_id
+from app.core.settings import ContainerJobManagerSettings, settings
+from app.repository.job.queue import JobQueueRepository, get_job_queue_repository
+from app.repository.job.repository import JobRepository, get_job_repository
+from app.repository.job.schemas import JobStatus
+from docker.errors import NotFound
+from docker.models.containers import Container
+
+_container_settings: ContainerJobManagerSettings = settings.job_manager_settings
+
+_UNFINISHED = [JobStatus.PENDING, JobStatus.RUNNING]
+
+
+# ? A crash between two steps of a Job's life (enqueue, launch, status
+# ? update, container removal) leaves Redis and Docker disagreeing. Every
+# ? cycle compares both sides. A mismatch is only acted upon when it is seen
+# ? in two consecutive cycles, so steps that are merely in progress are left
+# ? alone. Exited containers are left to the termination handling.
+class ContainerJobReconciler:
+    """Reconciles unfinished Jobs in the repository with the Job containers."""
+
+    def __init__(
+        self,
+        fleet: DockerFleet = None,
+        job_repo: JobRepository = None,
+        job_queue: JobQueueRepository = None,
+    ) -> None:
+        self._fleet = fleet or get_docker_fleet()
+        self._job_repo = job_repo or get_job_repository()
+        self._job_queue = job_queue or get_job_queue_repository()
+        self._logger = loguru.logger.bind(reconciler=type(self))
+        self._suspects: Set[str] = set()
+
+    async def reconcile(
+        self,
+        busy_containers: Optional[Set[str]] = None,
+    ) -> Dict[str, List[str]]:
+        """
+        Runs a reconciliation cycle.
+
+        :param busy_containers: IDs of containers being handled, left untouched.
+        :return: The IDs of the Jobs and containers fixed up, per action.
+        """
+        jobs = {
+            status: set(await self._job_repo.get_ids_by_status(status))
+            for status in _UNFINISHED
+        }
+        pending = set(await self._job_queue.get_pending())
+        pending |= set(await self._job_queue.get_retrying())
+        running = set(await self._job_queue.get_running())
+        # ? The Jobs of an unreachable Docker host would all look vanished.
+        containers = await self._fleet.list_containers(
+            all=True,
+            sparse=True,
+            filters={"label": Labels.JOB_ID},
+        )
+        if len(containers) < len(self._fleet.names):
+            self._logger.warning("Docker hosts unreachable. Reconciliation skipped.")
+            return {}
+        by_job = {
+            job_id: (self._fleet.get_client(host), container)
+            for host, listing in containers.items()
+            for container in listing
+            if (job_id := get_job_id(container))
+            and container.id not in (busy_containers or set())
+        }
+
+        suspects = {
+            "vanished": jobs[JobStatus.RUNNING] - by_job.keys(),
+            "unqueued": jobs[JobStatus.PENDING] - pending - running,
+            "leaked_slots": running - jobs[JobStatus.PENDING] - jobs[JobStatus.RUNNING],
+        }
+        confirmed = {
+            action: sorted(ids & self._suspects) for action, ids in suspects.items()
+        }
+        self._suspects = set().union(*suspects.values())
+
+        await asyncio.gather(
+            *[self._fail_vanished(job_id) for job_id in confirmed["vanished"]],
+            *[self._requeue(job_id) for job_id in confirmed["unqueued"]],
+            *[self._job_queue.release(job_id) for job_id in confirmed["leaked_slots"]],
+        )
+        confirmed["stale_containers"] = await self._remove_stale(
+            by_job,
+            jobs[JobStatus.RUNNING],
+        )
+        self._report(confirmed)
+        return confirmed
+
+    async def _fail_vanished(self, job_id: str) -> None:
+        await self._job_repo.update_status(job_id, JobStatus.FAILED)
+        await self._job_queue.release(job_id)
+
+    async def _requeue(self, job_id: str) -> None:
+        if not await self._job_queue.push(job_id, _container_settings.max_queue_depth):
+            self._suspects.add(job_id)
+
+    # ? Containers whose Job is gone or finished, and exited containers whose
+    # ? handling keeps failing, are removed once they are older than the TTL.
+    async def _remove_stale(
+        self,
+        by_job: Dict[str, Tuple[AsyncDockerClient, Container]],
+        running_jobs: Set[str],
+    ) -> List[str]:
+        expired_before = time.time() - _container_settings.orphan_container_ttl
+        stale = [
+            (job_id, docker, container)
+            for job_id, (docker, container) in by_job.items()
+            if container.attrs.get("Created", time.time()) < expired_before
+            and (
+                job_id not in running_jobs
+                or container.attrs.get("State") in (Status.EXITED, Status.DEAD)
+            )
+        ]
+        await asyncio.gather(
+            *[
+                self._remove_container(job_id, docker, container)
+                for job_id, docker, container in stale
+            ],
+        )
+        return sorted(job_id for job_id, _, _ in stale)
+
+    async def _remove_container(
+        self,
+        job_id: str,
+        docker: AsyncDockerClient,
+        container: Container,
+    ) -> None:
+        try:
+            await docker.remove_container(container, force=True)
+        except NotFound:
+            return
+        if (job := await self._job_repo.get(job_id)) and job.status in _UNFINISHED:
+            await self._job_repo.update_status(job_id, JobStatus.FAILED)
+        await self._job_queue.release(job_id)
+
+    def _report(self, confirmed: Dict[str, List[str]]) -> None:
+        fixed = {action: ids for action, ids in confirmed.items() if ids}
+        if not fixed:
+            self._logger.info("Reconciliation found no leaked Jobs or containers.")
+            return
+        for action, ids in fixed.items():
+            self._logger.warning(
+                f"Reconciliation fixed {len(ids)} {action.replace('_', ' ')}: "
+                f"{', '.join(ids)}",
+            )
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Callable, Dict, Optional
+
+import loguru
+from app.core.docker.client import AsyncDockerClient
+from app.core.docker.fleet import DockerFleet, get_docker_fleet
+from app.core.docker.utils import ContainerStatus as Status
+from app.core.docker.utils import Labels, get_job_id
+from app.core.settings import ContainerJobManagerSettings, settings
+from app.repository.job.schemas import JobUsage
+from docker.models.containers import Container
+
+_container_settings: ContainerJobManagerSettings = settings.job_manager_settings
+
+
+class UsageAccumulator:
+    """Aggregates the stats samples of a container into a JobUsage."""
+
+    def __init__(self) -> None:
+        self.usage = JobUsage()
+
+    # ? CPU, block I/O and network figures are cumulative counters, so the
+    # ? latest sample holds the totals. Memory is a gauge and keeps its peak,
+    # ? which the kernel tracks as `max_usage` on cgroup v1 only. On cgroup v2
+    # ? the peak is the highest `usage` sampled.
+    def add(self, stats: Dict[str, Any]) -> None:
+        """Adds a stats sample, unless it holds no figures."""
+        # ? Docker answers for a container that is not running with empty
+        # ? memory stats and zeroed counters, which must not count as a sample.
+        if not stats.get("memory_stats"):
+            return
+        usage = self.usage
+        cpu = stats.get("cpu_stats", {}).get("cpu_usage", {})
+        usage.cpu_seconds = max(
+            usage.cpu_seconds,
+            cpu.get("total_usage", 0) / 1_000_000_000,
+        )
+
+        memory = stats.get("memory_stats", {})
+        usage.peak_memory_bytes = max(
+            usage.peak_memory_bytes,
+            memory.get("max_usage", 0),
+            memory.get("usage", 0),
+        )
+
+        io = stats.get("blkio_stats", {}).get("io_service_bytes_recursive") or []
+        usage.block_read_bytes = max(usage.block_read_bytes, _sum_io(io, "read"))
+        usage.block_write_bytes = max(usage.block_write_bytes, _sum_io(io, "write"))
+
+        networks = (stats.get("networks") or {}).values()
+        usage.network_rx_bytes = max(
+            usage.network_rx_bytes,
+            sum(network.get("rx_bytes", 0) for network in networks),
+        )
+        usage.network_tx_bytes = max(
+            usage.network_tx_bytes,
+            sum(network.get("tx_bytes", 0) for network in networks),
+        )
+        usage.samples += 1
+
+
+def _sum_io(entries: list, op: str) -> int:
+    return sum(
+        entry.get("value", 0) for entry in entries if entry.get("op", "").lower() == op
+    )
+
+
+# ? Stats requests are made on the Docker thread pool and at most
+# ? `stats_concurrency` at a time, so sampling never crowds out Job handling.
+class ContainerStatsSampler:
+    """Samples the stats of running Job containers at a fixed interval."""
+
+    def __init__(
+        self,
+        fleet: DockerFleet = None,
+        owns: Optional[Callable[[str], bool]] = None,
+    ) -> None:
+        self._fleet = fleet or get_docker_fleet()
+        self._owns = owns or (lambda _: True)
+        self._logger = loguru.logger.bind(stats_sampler=type(self))
+        self._usage: Dict[str, UsageAccumulator] = {}
+        self._requests = asyncio.Semaphore(_container_settings.stats_concurrency)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Starts sampling running Job containers."""
+        if self._task is None and _container_settings.stats_interval > 0:
+            self._task = asyncio.create_task(self._run())
+            self._logger.info("Container stats sampler started.")
+
+    async def stop(self) -> None:
+        """Stops sampling."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._logger.info("Container stats sampler stopped.")
+
+    def pop(self, job_id: str) -> JobUsage:
+        """Returns the usage collected for a Job and stops tracking it."""
+        accumulator = self._usage.pop(job_id, None)
+        return accumulator.usage if accumulator else JobUsage()
+
+    async def sample(self) -> None:
+        """Takes one stats sample of every running Job container."""
+        containers = await self._fleet.list_containers(
+            sparse=True,
+            filters={"label": Labels.JOB_ID, "status": Status.RUNNING},
+        )
+        await asyncio.gather(
+            *[
+                self._sample_container(self._fleet.get_client(host), container)
+                for host, listing in containers.items()
+                for container in listing
+            ],
+        )
+
+    # ? Jobs shorter than `stats_interval` would never be sampled otherwise.
+    # ? Once a container has exited Docker has no stats left for it.
+    async def sample_started(
+        self,
+        docker: AsyncDockerClient,
+        container_id: str,
+    ) -> None:
+        """Takes a first stats sample of a Job container that just started."""
+        if _container_settings.stats_interval <= 0:
+            return
+        try:
+            container = await docker.get_container(container_id)
+        except Exception as e:
+            self._logger.debug(f"Could not sample container '{container_id}': {e}")
+            return
+        await self._sample_container(docker, container)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sample()
+            except Exception as e:
+                self._logger.error(f"Error sampling container stats: {e}")
+            await asyncio.sleep(_container_settings.stats_interval)
+
+    async def _sample_container(
+        self,
+        docker: AsyncDockerClient,
+        container: Container,
+    ) -> None:
+        job_id = get_job_id(container)
+        if not job_id or not self._owns(job_id):
+            return
+        try:
+            async with self._requests:
+                stats = await docker.stats(container)
+        except Exception as e:
+            self._logger.bind(job_id=job_id).debug(f"Could not sample stats: {e}")
+            return
+        self._usage.setdefault(job_id, UsageAccumulator()).add(stats)
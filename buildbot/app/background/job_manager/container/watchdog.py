@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+import loguru
+from app.core.docker.client import AsyncDockerClient
+from app.core.docker.fleet import DockerFleet, get_docker_fleet
+from app.core.docker.utils import ContainerStatus as Status
+from app.core.docker.utils import Labels, get_job_id
+from app.core.settings import ContainerJobManagerSettings, settings
+from app.repository.job.repository import JobRepository, get_job_repository
+from docker.errors import NotFound
+from docker.models.containers import Container
+
+_container_settings: ContainerJobManagerSettings = settings.job_manager_settings
+
+
+# ? The in-container `timeout` only holds as long as the script cannot escape
+# ? it, e.g. by detaching children or trapping signals. The watchdog kills Job
+# ? containers still running `watchdog_grace` seconds past their deadline, and
+# ? the resulting "die" event is handled like any other failed Job.
+class ContainerDeadlineWatchdog:
+    """Kills Job containers that run past their deadline."""
+
+    def __init__(
+        self,
+        fleet: DockerFleet = None,
+        job_repo: JobRepository = None,
+        owns: Optional[Callable[[str], bool]] = None,
+    ) -> None:
+        self._fleet = fleet or get_docker_fleet()
+        self._job_repo = job_repo or get_job_repository()
+        self._owns = owns or (lambda _: True)
+        self._logger = loguru.logger.bind(watchdog=type(self))
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Starts checking running Job containers periodically."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            self._logger.info("Container deadline watchdog started.")
+
+    async def stop(self) -> None:
+        """Stops the watchdog."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._logger.info("Container deadline watchdog stopped.")
+
+    async def check(self) -> int:
+        """Kills the overdue Job containers and returns how many were killed."""
+        containers = await self._fleet.list_containers(
+            sparse=True,
+            filters={"label": Labels.JOB_ID, "status": Status.RUNNING},
+        )
+        killed = await asyncio.gather(
+            *[
+                self._check_container(self._fleet.get_client(host), container)
+                for host, listing in containers.items()
+                for container in listing
+            ],
+        )
+        return sum(killed)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(_container_settings.watchdog_interval)
+            try:
+                await self.check()
+            except Exception as e:
+                self._logger.error(f"Error checking Job deadlines: {e}")
+
+    async def _check_container(
+        self,
+        docker: AsyncDockerClient,
+        container: Container,
+    ) -> bool:
+        job_id = get_job_id(container)
+        if not job_id or not self._owns(job_id):
+            return False
+        job = await self._job_repo.get(job_id)
+        if job is None or job.started_at is None:
+            return False
+
+        deadline = job.started_at + timedelta(
+            seconds=_container_settings.job_timeout
+            + _container_settings.watchdog_grace,
+        )
+        if datetime.now(timezone.utc) < deadline:
+            return False
+
+        job_logger = self._logger.bind(job_id=job_id)
+        job_logger.warning(f"Job '{job_id}' is past its deadline. Killing it.")
+        try:
+            await docker.kill_container(container)
+        except NotFound:
+            return False
+        return True
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import loguru
+from app.core.docker.client import AsyncDockerClient, get_async_docker_client
+from app.core.docker.utils import Labels
+from app.core.settings import ContainerJobManagerSettings, settings
+
+_container_settings: ContainerJobManagerSettings = settings.job_manager_settings
+
+# ? Docker emits "die" whenever a container's main process exits and "stop"
+# ? when it is stopped through the API; both mean the Job is over.
+_TERMINATION_EVENTS = ["die", "stop"]
+# ? A Job starts either with its container or, on a claimed warm container,
+# ? with the exec that releases its command.
+_START_EVENTS = ["start", "exec_start"]
+
+
+class ContainerEventWatcher:
+    """Watches the Docker events stream and reports started and ended Job containers."""
+
+    def __init__(
+        self,
+        on_terminated: Callable[[str], Awaitable[None]],
+        docker_client: AsyncDockerClient = None,
+        on_started: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> None:
+        self._docker = docker_client or get_async_docker_client()
+        self._on_terminated = on_terminated
+        self._on_started = on_started
+        self._logger = loguru.logger.bind(event_watcher=type(self))
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._events: Any = None
+        self._stopped = threading.Event()
+
+    @property
+    def filters(self) -> Dict[str, Any]:
+        """Returns the Docker events filters for the reported Job containers."""
+        events = list(_TERMINATION_EVENTS)
+        if self._on_started is not None:
+            events += _START_EVENTS
+        return {
+            "type": "container",
+            "event": events,
+            "label": [Labels.JOB_ID],
+        }
+
+    def start(self) -> None:
+        """Starts following the Docker events stream in a background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._watch,
+            name="buildbot-event-watcher",
+            daemon=True,
+        )
+        self._thread.start()
+        self._logger.info("Container event watcher started.")
+
+    async def stop(self) -> None:
+        """Stops following the Docker events stream."""
+        self._stopped.set()
+        if self._events is not None:
+            self._events.close()
+        if self._thread:
+            await asyncio.to_thread(self._thread.join, 5)
+        self._logger.info("Container event watcher stopped.")
+
+    # ? docker-py exposes the events stream as a blocking generator,
+    # ? so it is consumed in a thread and every event is handed back to the loop.
+    def _watch(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._events = self._docker.events(decode=True, filters=self.filters)
+                for event in self._events:
+                    self._dispatch(event)
+            except Exception as e:
+                if self._stopped.is_set():
+                    break
+                self._logger.error(f"Docker events stream interrupted: {e}")
+            self._stopped.wait(_container_settings.event_reconnect_delay)
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        container_id = event.get("id") or event.get("Actor", {}).get("ID")
+        if not container_id:
+            return
+        action = event.get("Action") or event.get("status") or ""
+        self._logger.debug(f"Container '{container_id}' emitted '{action}'.")
+        # ? Exec actions carry the command, e.g. "exec_start: sh -c ...".
+        if action.split(":", 1)[0] in _START_EVENTS:
+            if self._on_started is None:
+                return
+            handler = self._on_started(container_id)
+        else:
+            handler = self._on_terminated(container_id)
+        future = asyncio.run_coroutine_threadsafe(handler, self._loop)
+        future.add_done_callback(self._log_failure)
+
+    def _log_failure(self, future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception():
+            self._logger.error(
+                f"Error handling container event: {future.exception()}",
+            )
@@ -1,6 +1,5 @@
 from abc import ABC, abstractmethod
-from io import BytesIO
-from typing import Dict
+from typing import AsyncIterator, Dict
 
 from app.background.job_manager.utils import JobOutput
 from app.repository.job.repository import JobRepository
@@ -13,7 +12,7 @@ class JobArtifactHandler(ABC):
     _storage: StorageService
 
     @abstractmethod
-    async def save_artifact(self, job_id: str, stream: BytesIO) -> None:
+    async def save_artifact(self, job_id: str, stream: AsyncIterator[bytes]) -> None:
         """Handles the Job Artifact."""
 
     @abstractmethod
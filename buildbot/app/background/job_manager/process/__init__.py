@@ -0,0 +1,6 @@
+from app.background.job_manager.process.manager import (
+    ProcessJobManager,
+    get_process_manager,
+)
+
+__all__ = ["get_process_manager", "ProcessJobManager"]
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import resource
+import shutil
+import signal
+import subprocess
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import cache
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
+from typing import IO, AsyncIterator, Callable, Dict, Set
+
+import loguru
+from app.background.job_manager.container.handler import ContainerJobArtifactHandler
+from app.background.job_manager.manager_base import JobManager
+from app.background.job_manager.utils import JobOutput
+from app.core.settings import ProcessJobManagerSettings, settings
+from app.repository.job.queue import get_job_queue_repository
+from app.repository.job.repository import get_job_repository
+from app.repository.job.schemas import JobStatus, JobUsage
+from loguru import logger
+
+_process_settings: ProcessJobManagerSettings = settings.job_manager_settings
+
+# ? Only the end of stderr is logged when a Job fails.
+_ERROR_LOG_TAIL = 4096
+
+_ARCHIVE_CHUNK_SIZE = 1024 * 1024
+
+# ? Seconds to wait for the output pipes to close once a Job process exited.
+# ? A detached child still holding them open does not hold up its Job.
+_DRAIN_TIMEOUT = 5.0
+
+
+# ? A process can only be waited for by the process that started it, so the
+# ? runner hands every Job process over to the Job Manager living next to it,
+# ? which follows it to the end. manage_jobs only sweeps up the Jobs whose
+# ? process went away along with the worker that started it.
+class ProcessJobManager(JobManager):
+    """Process Job Manager."""
+
+    def __init__(self) -> None:
+        self._logger = logger.bind(job_manager=type(self))
+        # ? Artifact handling only depends on streams, so it is shared with
+        # ? container Jobs.
+        self._handler = ContainerJobArtifactHandler()
+        self._job_repo = get_job_repository()
+        self._job_queue = get_job_queue_repository()
+        self._processes: Dict[str, subprocess.Popen] = {}
+        self._supervisors: Set[asyncio.Task] = set()
+        # ? Every running Job blocks three threads: one waiting for the process
+        # ? and one draining each of its output pipes.
+        self._executor = ThreadPoolExecutor(
+            max_workers=3 * _process_settings.concurrent_jobs,
+            thread_name_prefix="buildbot-process",
+        )
+
+    async def start(self) -> None:
+        """Starts the Job Manager."""
+        self._logger.info("Process job manager started.")
+
+    async def stop(self) -> None:
+        """Kills the running Job processes and waits for them to be handled."""
+        for process in self._processes.values():
+            _kill(process)
+        await asyncio.gather(*self._supervisors, return_exceptions=True)
+        self._logger.info("Process job manager stopped.")
+
+    def track(self, job_id: str, process: subprocess.Popen, workdir: Path) -> None:
+        """
+        Follows a started Job process until it ends and handles its outputs.
+
+        :param job_id: The ID of the Job.
+        :param process: The Job process.
+        :param workdir: The Job workdir, removed once the Job is handled.
+        """
+        self._processes[job_id] = process
+        supervisor = asyncio.create_task(self._supervise(job_id, process, workdir))
+        self._supervisors.add(supervisor)
+        supervisor.add_done_callback(self._supervisors.discard)
+
+    async def manage_jobs(self) -> None:
+        """Fails the running Jobs past their deadline that no process runs anymore."""
+        self._logger.info("Starting process status check cycle.")
+        overdue_before = datetime.now(timezone.utc) - timedelta(
+            seconds=_process_settings.job_timeout + _process_settings.watchdog_grace,
+        )
+        for job_id in await self._job_repo.get_ids_by_status(JobStatus.RUNNING):
+            if job_id in self._processes:
+                continue
+            job = await self._job_repo.get(job_id)
+            if job is None or job.started_at is None or job.started_at > overdue_before:
+                continue
+            self._logger.bind(job_id=job_id).warning(
+                f"Job '{job_id}' lost its process. Marking it as failed.",
+            )
+            await self._job_repo.update_status(job_id, JobStatus.FAILED)
+            await self._job_queue.release(job_id)
+
+    async def _supervise(
+        self,
+        job_id: str,
+        process: subprocess.Popen,
+        workdir: Path,
+    ) -> None:
+        job_logger = self._logger.bind(job_id=job_id)
+        logs = JobOutput(job_id=job_id)
+        loop = asyncio.get_running_loop()
+        try:
+            drains = [
+                loop.run_in_executor(self._executor, _drain, pipe, buffer.write)
+                for pipe, buffer in [
+                    (process.stdout, logs.stdout),
+                    (process.stderr, logs.stderr),
+                ]
+            ]
+            # ? `os.wait4` reaps the process along with its resource usage,
+            # ? which `Popen.wait` does not report.
+            waiter = loop.run_in_executor(self._executor, os.wait4, process.pid, 0)
+            try:
+                _, wait_status, rusage = await asyncio.wait_for(
+                    asyncio.shield(waiter),
+                    _process_settings.job_timeout,
+                )
+            except asyncio.TimeoutError:
+                job_logger.warning(f"Job '{job_id}' timed out. Killing it.")
+                _kill(process)
+                _, wait_status, rusage = await waiter
+            process.returncode = os.waitstatus_to_exitcode(wait_status)
+            self._processes.pop(job_id, None)
+            _, still_open = await asyncio.wait(drains, timeout=_DRAIN_TIMEOUT)
+            if still_open:
+                job_logger.warning("Job outputs still open after exit. Truncated.")
+
+            await self._handle_process_termination(
+                job_id=job_id,
+                exit_code=process.returncode,
+                usage=_get_usage(rusage),
+                logs=logs,
+                workdir=workdir,
+                job_logger=job_logger,
+            )
+        except Exception as e:
+            job_logger.error(f"Error handling process termination: {e}")
+        finally:
+            self._processes.pop(job_id, None)
+            logs.close()
+            shutil.rmtree(workdir, ignore_errors=True)
+            # ? Frees the Job's running slot so the dispatcher can admit the next one.
+            await self._job_queue.release(job_id)
+
+    async def _handle_process_termination(
+        self,
+        job_id: str,
+        exit_code: int,
+        usage: JobUsage,
+        logs: JobOutput,
+        workdir: Path,
+        job_logger: loguru.Logger,
+    ) -> None:
+        """Updates the Job status and usage and saves its outputs."""
+        job_logger.info(f"Process of job '{job_id}' exited with code {exit_code}.")
+        await self._job_repo.update_usage(job_id, usage)
+        if exit_code != 0:
+            stderr_str = logs.stderr.tail(_ERROR_LOG_TAIL).decode(
+                "utf-8",
+                errors="replace",
+            )
+            job_logger.error(f"Job '{job_id}' failed. Logs: {stderr_str}")
+            await self._job_repo.update_status(job_id, JobStatus.FAILED)
+        else:
+            job_logger.info(f"Job '{job_id}' completed successfully.")
+            await self._job_repo.update_status(job_id, JobStatus.SUCCEEDED)
+
+        (workdir / _process_settings.script_path).unlink(missing_ok=True)
+        await asyncio.gather(
+            self._handler.save_artifact(job_id, self._stream_workdir(workdir)),
+            self._handler.handle_outputs(logs),
+        )
+
+    # ? The archive has the same layout as the one of a container workdir.
+    async def _stream_workdir(self, workdir: Path) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        archive = await loop.run_in_executor(self._executor, _build_archive, workdir)
+        try:
+            while chunk := await loop.run_in_executor(
+                self._executor,
+                archive.read,
+                _ARCHIVE_CHUNK_SIZE,
+            ):
+                yield chunk
+        finally:
+            archive.close()
+
+
+def _drain(pipe: IO[bytes], sink: Callable[[bytes], None]) -> None:
+    with pipe:
+        while chunk := pipe.read1(_ARCHIVE_CHUNK_SIZE):
+            sink(chunk)
+
+
+def _build_archive(workdir: Path) -> SpooledTemporaryFile:
+    archive = SpooledTemporaryFile(max_size=_process_settings.log_spool_size)
+    with tarfile.open(fileobj=archive, mode="w") as tar:
+        tar.add(workdir, arcname=_process_settings.workdir)
+    archive.seek(0)
+    return archive
+
+
+# ? Job processes lead their own session, so the whole process group goes.
+def _kill(process: subprocess.Popen) -> None:
+    with contextlib.suppress(ProcessLookupError):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+# ? The usage reported by `wait4` covers the process and every descendant it
+# ? waited for, with block counts in 512-byte units. Its peak RSS includes the
+# ? worker memory the process was forked from, so it is left out.
+def _get_usage(rusage: resource.struct_rusage) -> JobUsage:
+    return JobUsage(
+        cpu_seconds=rusage.ru_utime + rusage.ru_stime,
+        block_read_bytes=rusage.ru_inblock * 512,
+        block_write_bytes=rusage.ru_oublock * 512,
+        samples=1,
+    )
+
+
+@cache
+def get_process_manager() -> ProcessJobManager:
+    """Returns the ProcessJobManager, created on first use."""
+    return ProcessJobManager()
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import uuid
+from typing import List, Optional
+
+import loguru
+from app.core.settings import JobManagerSettings, settings
+from app.repository.job.lease import JobLeaseRepository, get_job_lease_repository
+
+_job_manager_settings: JobManagerSettings = settings.job_manager_settings
+
+# ? Cluster-wide duties, such as reconciliation, are owned like a Job with this ID.
+LEADER_KEY = "__leader__"
+
+
+# ? Every Job Manager process heartbeats into Redis and keeps a view of the
+# ? live managers. Jobs are split between them by rendezvous hashing, so when
+# ? a manager joins or dies only its share of the Jobs moves. Two managers
+# ? may briefly disagree on the live set, so the owner also takes a per-Job
+# ? lease before it handles a container.
+class JobOwnership:
+    """Shards Jobs across the live Job Managers."""
+
+    def __init__(self, lease_repo: JobLeaseRepository = None) -> None:
+        self.manager_id = uuid.uuid4().hex
+        self._lease_repo = lease_repo or get_job_lease_repository()
+        self._managers: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+        self._logger = loguru.logger.bind(ownership=type(self))
+
+    async def start(self) -> None:
+        """Joins the Job Managers and starts sending heartbeats."""
+        if self._task is None:
+            await self._refresh()
+            self._task = asyncio.create_task(self._run())
+            self._logger.info(f"Job Manager '{self.manager_id}' joined.")
+
+    async def stop(self) -> None:
+        """Stops sending heartbeats and leaves, handing its Jobs over."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            await self._lease_repo.leave(self.manager_id)
+            self._logger.info(f"Job Manager '{self.manager_id}' left.")
+
+    def owns(self, job_id: str) -> bool:
+        """Checks whether this Job Manager is responsible for a Job."""
+        if not self._managers:
+            return True
+        return self.manager_id == max(
+            self._managers,
+            key=lambda manager_id: _score(manager_id, job_id),
+        )
+
+    @property
+    def is_leader(self) -> bool:
+        """Checks whether this Job Manager runs the cluster-wide duties."""
+        return self.owns(LEADER_KEY)
+
+    async def acquire(self, job_id: str) -> bool:
+        """Takes the lease of a Job this Job Manager owns."""
+        return self.owns(job_id) and await self._lease_repo.acquire(
+            job_id,
+            self.manager_id,
+            _job_manager_settings.job_lease_ttl,
+        )
+
+    async def release(self, job_id: str) -> None:
+        """Gives the lease of a Job back."""
+        await self._lease_repo.release(job_id, self.manager_id)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(_job_manager_settings.heartbeat_interval)
+            try:
+                await self._refresh()
+            except Exception as e:
+                self._logger.error(f"Error sending Job Manager heartbeat: {e}")
+
+    async def _refresh(self) -> None:
+        await self._lease_repo.heartbeat(self.manager_id)
+        managers = await self._lease_repo.get_live_managers(
+            _job_manager_settings.heartbeat_ttl,
+        )
+        if sorted(managers) != sorted(self._managers):
+            self._logger.info(f"Live Job Managers: {len(managers)}.")
+        self._managers = managers
+
+
+def _score(manager_id: str, job_id: str) -> int:
+    digest = hashlib.blake2b(f"{manager_id}:{job_id}".encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), "big")
@@ -1,12 +1,69 @@
-from io import BytesIO
+from io import SEEK_END
+from tempfile import SpooledTemporaryFile
 from typing import Any, Generator, Optional, Union
 
+from app.core.settings import JobManagerSettings, settings
+
+_job_manager_settings: JobManagerSettings = settings.job_manager_settings
+
+_TRUNCATION_MARKER = "\n[buildbot] Log truncated after {max_size} bytes.\n"
+
+
+class LogBuffer:
+    """Job log stream buffer that spills to disk and caps its size."""
+
+    def __init__(
+        self,
+        max_memory_size: int = _job_manager_settings.log_spool_size,
+        max_size: int = _job_manager_settings.max_log_size,
+    ) -> None:
+        self._file = SpooledTemporaryFile(max_size=max_memory_size)
+        self._max_size = max_size
+        self.size = 0
+        self.truncated = False
+
+    def write(self, data: bytes) -> None:
+        """Appends data, dropping everything past the size cap."""
+        if self.truncated or not data:
+            return
+        remaining = self._max_size - self.size
+        if len(data) > remaining:
+            data = (
+                data[:remaining]
+                + _TRUNCATION_MARKER.format(
+                    max_size=self._max_size,
+                ).encode()
+            )
+            self.truncated = True
+        self._file.seek(0, SEEK_END)
+        self._file.write(data)
+        self.size += len(data)
+
+    def read(self, size: int = -1) -> bytes:
+        """Reads from the buffer."""
+        return self._file.read(size)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        """Moves the buffer position."""
+        return self._file.seek(offset, whence)
+
+    def tail(self, size: int) -> bytes:
+        """Returns the last bytes of the buffer and rewinds it."""
+        self._file.seek(max(self.size - size, 0))
+        data = self._file.read()
+        self._file.seek(0)
+        return data
+
+    def close(self) -> None:
+        """Closes the buffer, removing any spilled file."""
+        self._file.close()
+
 
 class JobOutput:
     """Class for job output."""
 
-    stderr: BytesIO
-    stdout: BytesIO
+    stderr: LogBuffer
+    stdout: LogBuffer
 
     def __init__(
         self,
@@ -15,15 +72,31 @@ class JobOutput:
         stdout: Optional[Union[bytes, Generator[bytes, Any, None]]] = None,
     ) -> None:
         self.job_id = job_id
-        self.stderr = self._to_bytesio(stderr)
-        self.stdout = self._to_bytesio(stdout)
+        self.stderr = self._to_buffer(stderr)
+        self.stdout = self._to_buffer(stdout)
+
+    def write(
+        self,
+        stdout: Optional[bytes] = None,
+        stderr: Optional[bytes] = None,
+    ) -> None:
+        """Appends a demultiplexed log frame."""
+        if stdout:
+            self.stdout.write(stdout)
+        if stderr:
+            self.stderr.write(stderr)
+
+    def close(self) -> None:
+        """Releases both buffers."""
+        self.stdout.close()
+        self.stderr.close()
 
-    def _to_bytesio(
+    def _to_buffer(
         self,
         output: Optional[Union[bytes, Generator[bytes, Any, None]]],
-    ) -> BytesIO:
-        """Converts bytes or a generator of bytes into a BytesIO stream."""
-        buffer = BytesIO()
+    ) -> LogBuffer:
+        """Converts bytes or a generator of bytes into a LogBuffer."""
+        buffer = LogBuffer()
         if output is None:
             return buffer
         if isinstance(output, bytes):
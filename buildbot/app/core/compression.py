@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import bz2
+import lzma
+import zlib
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from functools import cache, partial
+from typing import IO, Deque, Dict, Optional, Protocol
+
+from app.core.enums import CompressionCodec
+from app.core.settings import ArtifactStorageSettings, settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+_storage_settings: ArtifactStorageSettings = settings.artifact_storage_settings
+
+# ? wbits for a gzip container around the deflate stream
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+EXTENSIONS: Dict[CompressionCodec, str] = {
+    CompressionCodec.NONE: "",
+    CompressionCodec.GZIP: ".gz",
+    CompressionCodec.BZ2: ".bz2",
+    CompressionCodec.XZ: ".xz",
+    CompressionCodec.ZSTD: ".zst",
+}
+
+MEDIA_TYPES: Dict[CompressionCodec, str] = {
+    CompressionCodec.NONE: "application/x-tar",
+    CompressionCodec.GZIP: "application/gzip",
+    CompressionCodec.BZ2: "application/x-bzip2",
+    CompressionCodec.XZ: "application/x-xz",
+    CompressionCodec.ZSTD: "application/zstd",
+}
+
+
+class Compressor(Protocol):
+    """Incremental compressor, as returned by `zlib.compressobj`."""
+
+    def compress(self, data: bytes) -> bytes:
+        """Compresses a chunk, returning the compressed bytes ready so far."""
+
+    def flush(self) -> bytes:
+        """Ends the stream, returning the remaining compressed bytes."""
+
+
+class _NullCompressor:
+    """Passes the data through unchanged."""
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class _ZstdCompressor:
+    """Adapts a zstandard compression object to the Compressor protocol."""
+
+    def __init__(self, level: Optional[int]) -> None:
+        self._compressor = zstandard.ZstdCompressor(
+            level=3 if level is None else level,
+        ).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+def _create_serial_compressor(
+    codec: CompressionCodec,
+    level: Optional[int],
+) -> Compressor:
+    if codec == CompressionCodec.NONE:
+        return _NullCompressor()
+    if codec == CompressionCodec.GZIP:
+        return zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION if level is None else level,
+            wbits=_GZIP_WBITS,
+        )
+    if codec == CompressionCodec.BZ2:
+        return bz2.BZ2Compressor(9 if level is None else level)
+    if codec == CompressionCodec.XZ:
+        return lzma.LZMACompressor(
+            preset=lzma.PRESET_DEFAULT if level is None else level,
+        )
+    if zstandard is None:
+        raise RuntimeError("The zstd codec requires the 'zstandard' package.")
+    return _ZstdCompressor(level)
+
+
+def _compress_block(
+    codec: CompressionCodec,
+    level: Optional[int],
+    block: bytes,
+) -> bytes:
+    compressor = _create_serial_compressor(codec, level)
+    return compressor.compress(block) + compressor.flush()
+
+
+# ? gzip members, bzip2 and xz streams and zstd frames may all be concatenated
+# ? into a valid stream of the same format, which the standard tools and
+# ? libraries decompress as a whole. Blocks are thus compressed independently
+# ? on a thread pool, as the codecs release the GIL, and written out in order.
+# ? At most two blocks per worker are in flight, which bounds memory use.
+# ? Each block starts from an empty dictionary, which costs some ratio.
+class ParallelCompressor:
+    """Compresses fixed-size blocks of a stream concurrently."""
+
+    def __init__(
+        self,
+        codec: CompressionCodec,
+        level: Optional[int],
+        executor: Executor,
+        workers: int,
+        block_size: int,
+    ) -> None:
+        self._compress_block = partial(_compress_block, codec, level)
+        self._executor = executor
+        self._max_pending = 2 * workers
+        self._block_size = block_size
+        self._buffer = bytearray()
+        self._pending: Deque[Future] = deque()
+
+    def compress(self, data: bytes) -> bytes:
+        """Queues a chunk, returning the blocks compressed so far in order."""
+        self._buffer += data
+        while len(self._buffer) >= self._block_size:
+            self._submit(bytes(self._buffer[: self._block_size]))
+            del self._buffer[: self._block_size]
+        return self._collect(wait=False)
+
+    def flush(self) -> bytes:
+        """Compresses the buffered rest and waits for every block."""
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        return self._collect(wait=True)
+
+    def _submit(self, block: bytes) -> None:
+        self._pending.append(self._executor.submit(self._compress_block, block))
+
+    def _collect(self, wait: bool) -> bytes:
+        compressed = bytearray()
+        while self._pending and (
+            wait or self._pending[0].done() or len(self._pending) > self._max_pending
+        ):
+            compressed += self._pending.popleft().result()
+        return bytes(compressed)
+
+
+@cache
+def _get_executor(workers: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=workers,
+        thread_name_prefix="buildbot-compression",
+    )
+
+
+def create_compressor(
+    codec: Optional[CompressionCodec] = None,
+    level: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> Compressor:
+    """
+    Creates a compressor producing a standard stream of a codec.
+
+    :param codec: The codec. Defaults to the configured one.
+    :param level: The compression level. Defaults to the configured one.
+    :param workers: Blocks compressed at once, 1 for a serial compressor.
+        Defaults to the configured number.
+    :return: The compressor.
+    """
+    codec = codec or _storage_settings.codec
+    level = _storage_settings.compression_level if level is None else level
+    workers = workers or _storage_settings.compression_workers
+    if workers <= 1 or codec == CompressionCodec.NONE:
+        return _create_serial_compressor(codec, level)
+    return ParallelCompressor(
+        codec,
+        level,
+        _get_executor(workers),
+        workers,
+        _storage_settings.compression_block_size,
+    )
+
+
+# ? tarfile writes through `write` and reads the position through `tell`.
+class CompressedWriter:
+    """Write-only file object compressing everything written to it."""
+
+    def __init__(self, fileobj: IO[bytes], compressor: Compressor) -> None:
+        self._fileobj = fileobj
+        self._compressor = compressor
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        """Compresses `data` into the underlying file."""
+        self._fileobj.write(self._compressor.compress(bytes(data)))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        """Returns the number of uncompressed bytes written."""
+        return self._position
+
+    def finish(self) -> None:
+        """Ends the compressed stream."""
+        self._fileobj.write(self._compressor.flush())
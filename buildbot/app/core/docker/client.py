@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from app.core.docker.utils import ContainerStatus, get_docker_client
+from app.core.settings import DockerSettings, settings
+from app.core.streams import iterate_in_thread
+from docker import DockerClient
+from docker.models.containers import Container
+from docker.models.images import Image
+from docker.utils.socket import STDOUT, frames_iter
+
+_docker_settings: DockerSettings = settings.docker_settings
+
+T = TypeVar("T")
+
+
+# ? docker-py is a blocking HTTP client. Every call made from a coroutine goes
+# ? through this adapter, which runs it on a dedicated thread pool sized to the
+# ? client's own connection pool, so a slow daemon never blocks the event loop.
+class AsyncDockerClient:
+    """Asynchronous adapter over the blocking docker-py client."""
+
+    def __init__(
+        self,
+        docker_client: Optional[DockerClient] = None,
+        max_workers: int = _docker_settings.max_workers,
+    ) -> None:
+        self._client = docker_client
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="buildbot-docker",
+        )
+
+    @property
+    def client(self) -> DockerClient:
+        """Returns the underlying blocking Docker client, connecting on first use."""
+        if self._client is None:
+            self._client = get_docker_client()
+        return self._client
+
+    async def run_in_executor(
+        self,
+        fn: Callable[..., T],
+        *args: Any,
+        **kwargs: Any,
+    ) -> T:
+        """Runs a blocking Docker call on the Docker thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    async def ping(self) -> bool:
+        """Checks that the Docker daemon is reachable."""
+        return await self.run_in_executor(self.client.ping)
+
+    async def get_image(self, tag: str) -> Image:
+        """Returns an image by tag."""
+        return await self.run_in_executor(self.client.images.get, tag)
+
+    async def build_image(self, **config: Any) -> Tuple[Image, List[Dict[str, Any]]]:
+        """Builds an image and returns it along with its build logs."""
+
+        def _build() -> Tuple[Image, List[Dict[str, Any]]]:
+            image, build_logs = self.client.images.build(**config)
+            return image, list(build_logs)
+
+        return await self.run_in_executor(_build)
+
+    async def run_container(self, **config: Any) -> Container:
+        """Creates and starts a container."""
+        return await self.run_in_executor(self.client.containers.run, **config)
+
+    async def create_container(self, **config: Any) -> Container:
+        """Creates a container without starting it."""
+        return await self.run_in_executor(self.client.containers.create, **config)
+
+    async def start_container(self, container: Container) -> None:
+        """Starts a created container."""
+        await self.run_in_executor(container.start)
+
+    async def stats(self, container: Container) -> Dict[str, Any]:
+        """Returns a single stats sample of a running container."""
+        return await self.run_in_executor(
+            container.stats,
+            stream=False,
+            one_shot=True,
+        )
+
+    async def kill_container(self, container: Container) -> None:
+        """Kills a running container."""
+        await self.run_in_executor(container.kill)
+
+    async def rename_container(self, container: Container, name: str) -> None:
+        """Renames a container."""
+        await self.run_in_executor(container.rename, name)
+
+    async def exec_run(self, container: Container, command: List[str]) -> int:
+        """Runs a command inside a running container and returns its exit code."""
+        result = await self.run_in_executor(container.exec_run, command)
+        return result.exit_code
+
+    async def put_archive(self, container: Container, path: str, data: bytes) -> bool:
+        """Extracts a tar archive into a path inside a container."""
+        return await self.run_in_executor(container.put_archive, path, data)
+
+    async def list_containers(self, **filters: Any) -> List[Container]:
+        """Lists containers."""
+        return await self.run_in_executor(self.client.containers.list, **filters)
+
+    async def get_container(self, container_id: str) -> Container:
+        """Returns a container by ID or name."""
+        return await self.run_in_executor(self.client.containers.get, container_id)
+
+    async def logs(self, container: Container, **kwargs: Any) -> bytes:
+        """Returns a container's logs."""
+        return await self.run_in_executor(container.logs, **kwargs)
+
+    async def get_archive(
+        self,
+        container: Container,
+        path: str,
+    ) -> Tuple[Generator[bytes, None, None], Dict[str, Any]]:
+        """Returns a tar archive of a path inside a container."""
+        return await self.run_in_executor(
+            container.get_archive,
+            path,
+            chunk_size=_docker_settings.stream_chunk_size,
+        )
+
+    async def stream_archive(
+        self,
+        container: Container,
+        path: str,
+    ) -> AsyncIterator[bytes]:
+        """Streams a tar archive of a path inside a container in bounded chunks."""
+        chunks, _ = await self.get_archive(container, path)
+        async for chunk in iterate_in_thread(
+            chunks,
+            self._executor,
+            _docker_settings.stream_buffered_chunks,
+        ):
+            yield chunk
+
+    async def collect_logs(
+        self,
+        container: Container,
+        sink: Callable[[Optional[bytes], Optional[bytes]], None],
+    ) -> None:
+        """
+        Fetches a container's stdout and stderr in a single multiplexed request.
+
+        Frames are demultiplexed as they arrive and handed to `sink` as
+        `(stdout, stderr)` pairs from the Docker thread pool.
+        """
+
+        def _collect() -> None:
+            for stdout, stderr in self.demuxed_logs(container):
+                sink(stdout, stderr)
+
+        await self.run_in_executor(_collect)
+
+    # ? docker-py's `container.logs` merges both streams into one, so the
+    # ? container is attached to instead, replaying its logs, and the frames
+    # ? of the multiplexed stream are told apart by their stream number. Only
+    # ? a running container is followed, as the attach of a stopped one with
+    # ? `stream` set is not guaranteed to end.
+    def demuxed_logs(
+        self,
+        container: Container,
+        follow: bool = False,
+    ) -> Generator[Tuple[Optional[bytes], Optional[bytes]], None, None]:
+        """Returns a blocking generator of `(stdout, stderr)` log frames."""
+        state = container.attrs.get("State")
+        follow = follow and (
+            state.get("Running", False)
+            if isinstance(state, dict)
+            else state == ContainerStatus.RUNNING
+        )
+        socket = self.client.api.attach_socket(
+            container.id,
+            params={"stdout": 1, "stderr": 1, "logs": 1, "stream": int(follow)},
+        )
+        tty = container.attrs.get("Config", {}).get("Tty", False)
+        try:
+            for stream, data in frames_iter(socket, tty):
+                yield (data, None) if stream == STDOUT else (None, data)
+        finally:
+            socket.close()
+
+    async def remove_container(self, container: Container, **kwargs: Any) -> None:
+        """Removes a container."""
+        await self.run_in_executor(container.remove, **kwargs)
+
+    def events(self, **kwargs: Any) -> Generator[Dict[str, Any], None, None]:
+        """
+        Returns the Docker events stream.
+
+        The stream blocks while waiting for events, so it must be consumed
+        from a dedicated thread rather than from the Docker thread pool.
+        """
+        return self.client.events(**kwargs)
+
+    def close(self) -> None:
+        """Shuts down the Docker thread pool."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_async_docker = AsyncDockerClient()
+
+
+def get_async_docker_client() -> AsyncDockerClient:
+    """Returns the asynchronous Docker client."""
+    return _async_docker
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+import loguru
+from app.core.docker.client import AsyncDockerClient, get_async_docker_client
+from app.core.docker.utils import ContainerStatus as Status
+from app.core.docker.utils import Labels, create_docker_client, get_job_id
+from app.core.exceptions import DockerHostUnavailableError
+from app.core.settings import (
+    ContainerJobManagerSettings,
+    DockerSettings,
+    ResourceProfile,
+    settings,
+)
+from docker.models.containers import Container
+from docker.utils import parse_bytes
+
+_docker_settings: DockerSettings = settings.docker_settings
+_container_settings: ContainerJobManagerSettings = settings.job_manager_settings
+
+
+class DockerHost:
+    """A Docker daemon of the fleet along with its placement state."""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: Optional[str] = None,
+        capacity: Optional[int] = None,
+        docker_client: Optional[AsyncDockerClient] = None,
+    ) -> None:
+        self.name = name
+        self.base_url = base_url
+        self.capacity = capacity
+        self.client = docker_client
+        self.running = 0
+        self.available = docker_client is not None
+
+    @property
+    def free(self) -> int:
+        """Returns how many more Jobs the daemon may run."""
+        return (self.capacity or 0) - self.running
+
+    async def connect(self) -> None:
+        """Creates the daemon's client, which asks the daemon for its API version."""
+        if self.client is None:
+            self.client = AsyncDockerClient(
+                await asyncio.to_thread(create_docker_client, self.base_url),
+            )
+
+
+# ? A single daemon caps how many Jobs run at once, so Jobs are spread over a
+# ? fleet of them. Each Job goes to the reachable daemon with the most free
+# ? capacity: its Job limit minus the Job containers it runs. Counts are
+# ? refreshed from the daemons every `placement_refresh_interval` seconds and
+# ? bumped locally on every placement in between.
+class DockerFleet:
+    """Docker daemons Jobs are placed on."""
+
+    def __init__(self, hosts: Optional[List[DockerHost]] = None) -> None:
+        self._hosts: Dict[str, DockerHost] = {
+            host.name: host for host in hosts or _create_hosts()
+        }
+        self._refreshed_at: Optional[float] = None
+        self._placing = asyncio.Lock()
+        self._logger = loguru.logger.bind(docker_fleet=type(self))
+
+    @property
+    def names(self) -> List[str]:
+        """Returns the names of all the daemons, the default one first."""
+        return list(self._hosts)
+
+    @property
+    def default(self) -> str:
+        """Returns the name of the default daemon."""
+        return next(iter(self._hosts))
+
+    @property
+    def clients(self) -> Dict[str, AsyncDockerClient]:
+        """Returns the clients of the daemons connected to so far, by name."""
+        return {name: host.client for name, host in self._hosts.items() if host.client}
+
+    def get_client(self, name: Optional[str] = None) -> AsyncDockerClient:
+        """
+        Returns the client of a daemon.
+
+        :param name: The name of the daemon. Defaults to the default daemon.
+        :raises DockerHostUnavailableError: If the daemon is unknown or unreachable.
+        """
+        host = self._hosts.get(name or self.default)
+        if host is None or host.client is None:
+            raise DockerHostUnavailableError(name)
+        return host.client
+
+    async def connect(self) -> None:
+        """Connects to the daemons not connected to yet."""
+        await asyncio.gather(
+            *[self._connect(host) for host in self._hosts.values() if not host.client],
+        )
+
+    async def place(self) -> str:
+        """
+        Chooses the daemon with the most free capacity for a new Job.
+
+        :return: The name of the daemon.
+        :raises DockerHostUnavailableError: If no daemon is reachable.
+        """
+        async with self._placing:
+            if (
+                self._refreshed_at is None
+                or time.monotonic() - self._refreshed_at
+                >= _docker_settings.placement_refresh_interval
+            ):
+                await self.refresh()
+            candidates = [host for host in self._hosts.values() if host.available]
+            if not candidates:
+                raise DockerHostUnavailableError
+            host = max(candidates, key=lambda candidate: candidate.free)
+            host.running += 1
+            return host.name
+
+    async def refresh(self) -> None:
+        """Counts the Jobs running on every daemon and marks unreachable ones."""
+        await self.connect()
+        await asyncio.gather(*[self._refresh(host) for host in self._hosts.values()])
+        self._refreshed_at = time.monotonic()
+
+    async def list_containers(self, **filters: Any) -> Dict[str, List[Container]]:
+        """Lists containers on every reachable daemon, by daemon name."""
+        clients = self.clients
+        listings = await asyncio.gather(
+            *[client.list_containers(**filters) for client in clients.values()],
+            return_exceptions=True,
+        )
+        containers = {}
+        for name, listing in zip(clients, listings):
+            if isinstance(listing, Exception):
+                self._logger.warning(
+                    f"Could not list containers on '{name}': {listing}",
+                )
+                continue
+            containers[name] = listing
+        return containers
+
+    def close(self) -> None:
+        """Shuts down the Docker thread pools."""
+        for client in self.clients.values():
+            client.close()
+
+    async def _connect(self, host: DockerHost) -> None:
+        try:
+            await host.connect()
+        except Exception as e:
+            self._logger.warning(f"Could not connect to Docker host '{host.name}': {e}")
+
+    async def _refresh(self, host: DockerHost) -> None:
+        if host.client is None:
+            host.available = False
+            return
+        try:
+            containers = await host.client.list_containers(
+                sparse=True,
+                filters={"label": Labels.JOB_ID, "status": Status.RUNNING},
+            )
+            if host.capacity is None:
+                host.capacity = _get_capacity(
+                    await host.client.run_in_executor(host.client.client.info),
+                    _container_settings.get_resource_profile(),
+                )
+        except Exception as e:
+            if host.available:
+                self._logger.warning(f"Docker host '{host.name}' is unreachable: {e}")
+            host.available = False
+            return
+        # ? Idle warm containers carry an empty Job ID label and run no Job.
+        host.running = sum(1 for container in containers if get_job_id(container))
+        host.available = True
+
+
+# ? Without a configured limit a daemon takes as many Jobs of the default
+# ? resource profile as its CPUs and memory fit.
+def _get_capacity(info: Dict[str, Any], profile: ResourceProfile) -> int:
+    by_cpu = info.get("NCPU", 1) / profile.cpus
+    by_memory = info.get("MemTotal", 0) / parse_bytes(profile.memory)
+    return max(int(min(by_cpu, by_memory)), 1)
+
+
+def _create_hosts() -> List[DockerHost]:
+    return [
+        DockerHost(
+            _docker_settings.local_host_name,
+            _docker_settings.base_url,
+            _docker_settings.local_capacity,
+            get_async_docker_client(),
+        ),
+        *[
+            DockerHost(name, host.base_url, host.capacity)
+            for name, host in _docker_settings.hosts.items()
+        ],
+    ]
+
+
+_docker_fleet = DockerFleet()
+
+
+def get_docker_fleet() -> DockerFleet:
+    """Returns the DockerFleet."""
+    return _docker_fleet
@@ -1,6 +1,25 @@
+from functools import cache
+from typing import Optional
+
 import docker
+from app.core.settings import DockerSettings, settings
+from docker.models.containers import Container
+
+_docker_settings: DockerSettings = settings.docker_settings
+
 
-_docker = docker.from_env()
+def create_docker_client(base_url: Optional[str] = None) -> docker.DockerClient:
+    """Creates a Docker client with its own sized HTTP connection pool."""
+    if base_url:
+        return docker.DockerClient(
+            base_url=base_url,
+            timeout=_docker_settings.timeout,
+            max_pool_size=_docker_settings.max_pool_size,
+        )
+    return docker.from_env(
+        timeout=_docker_settings.timeout,
+        max_pool_size=_docker_settings.max_pool_size,
+    )
 
 
 class ContainerStatus:
@@ -9,14 +28,44 @@ class ContainerStatus:
     RUNNING = "running"
     STOPPED = "stopped"
     EXITED = "exited"
+    DEAD = "dead"
 
 
 class Labels:
     """Docker container labels."""
 
     JOB_ID = "job_id"
+    WARM_POOL = "buildbot_warm_pool"
+    POOL_OWNER = "buildbot_pool_owner"
+
+
+_CONTAINER_NAME_PREFIX = "buildbotjob-"
+
+
+def get_container_name(job_id: str) -> str:
+    """Returns the name of a Job's container."""
+    return f"{_CONTAINER_NAME_PREFIX}{job_id}"
+
+
+# ? Labels cannot change after a container is created, so a warm container
+# ? carries an empty Job ID label and is tied to its Job by being renamed.
+# ? Both inspected containers and sparse listings are supported.
+def get_job_id(container: Container) -> Optional[str]:
+    """Returns the ID of the Job a container runs, if any."""
+    attrs = container.attrs
+    labels = attrs.get("Labels") or attrs.get("Config", {}).get("Labels") or {}
+    if labels.get(Labels.JOB_ID):
+        return labels[Labels.JOB_ID]
+    for raw_name in [attrs.get("Name"), *attrs.get("Names", [])]:
+        name = (raw_name or "").lstrip("/")
+        if name.startswith(_CONTAINER_NAME_PREFIX):
+            return name.removeprefix(_CONTAINER_NAME_PREFIX)
+    return None
 
 
+# ? Creating a client already talks to the daemon, so it is only created once
+# ? something uses Docker. Deployments running Jobs as processes never do.
+@cache
 def get_docker_client() -> docker.DockerClient:
     """Returns a Docker client."""
-    return _docker
+    return create_docker_client(_docker_settings.base_url)
@@ -6,6 +6,7 @@ class JobManagerType(StrEnum):
 
     BASE = "base"
     CONTAINER = "container"
+    PROCESS = "process"
 
 
 class Environment(StrEnum):
@@ -13,3 +14,28 @@ class Environment(StrEnum):
 
     PROD = "production"
     DEV = "development"
+
+
+class StorageType(StrEnum):
+    """Artifact storage type."""
+
+    LOCAL = "local"
+    CONTENT_ADDRESSED = "content_addressed"
+    S3 = "s3"
+
+
+class CompressionCodec(StrEnum):
+    """Artifact compression codec."""
+
+    NONE = "none"
+    GZIP = "gzip"
+    BZ2 = "bz2"
+    XZ = "xz"
+    ZSTD = "zstd"
+
+
+class BrokerType(StrEnum):
+    """Taskiq broker type."""
+
+    MEMORY = "memory"
+    REDIS = "redis"
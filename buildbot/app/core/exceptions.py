@@ -61,6 +61,18 @@ class JobSchedulingError(BaseError):
         return f"Could not schedule the Job. {reason}"
 
 
+class JobQueueFullError(BaseError):
+    """Error raised when the pending Job queue is full."""
+
+    def __init__(self, retry_after: int, *args: object) -> None:
+        self.retry_after = retry_after
+        self.message = self._format_message(retry_after)
+        super().__init__(self.message, *args)
+
+    def _format_message(self, retry_after: int) -> str:
+        return f"The Job queue is full. Retry in {retry_after} seconds."
+
+
 class JobNotCompletedError(BaseError):
     """Error raised when a Job has not completed."""
 
@@ -72,6 +84,17 @@ class JobNotCompletedError(BaseError):
         return f"The Job(id={job_id}) has status '{job_status}'."
 
 
+class JobUsageNotFoundError(BaseError):
+    """Error raised when no resource usage was recorded for a Job."""
+
+    def __init__(self, job_id: str, *args: object) -> None:
+        self.message = self._format_message(job_id)
+        super().__init__(self.message, *args)
+
+    def _format_message(self, job_id: str) -> str:
+        return f"No resource usage was recorded for the Job(id={job_id})."
+
+
 class JobFailedError(BaseError):
     """Error raised when a Job has failed."""
 
@@ -97,6 +120,28 @@ class JobOutputNotFoundError(BaseError):
         )
 
 
+class ArtifactCorruptedError(BaseError):
+    """Error raised when a stored Job Output does not match its checksum."""
+
+    def __init__(self, job_id: str, path: Path, *args: object) -> None:
+        self.message = self._format_message(job_id, path)
+        super().__init__(self.message, *args)
+
+    def _format_message(self, job_id: str, path: Path) -> str:
+        return f"The output '{path}' of the Job(id={job_id}) is corrupted."
+
+
+class JobLogsNotAvailableError(BaseError):
+    """Error raised when a Job's live logs cannot be streamed."""
+
+    def __init__(self, job_id: str, *args: object) -> None:
+        self.message = self._format_message(job_id)
+        super().__init__(self.message, *args)
+
+    def _format_message(self, job_id: str) -> str:
+        return f"The Job(id={job_id}) has no running container to stream logs from."
+
+
 class TaskNotFoundError(BaseError):
     """Error raised when a Task is not found."""
 
@@ -128,3 +173,27 @@ class TaskNotUpdatedError(BaseError):
 
     def _format_message(self, task_id: str) -> str:
         return f"The Task(id={task_id}) was not updated."
+
+
+class ResourceProfileNotFoundError(BaseError):
+    """Error raised when a Task selects an unknown resource profile."""
+
+    def __init__(self, profile: str, *args: object) -> None:
+        self.message = self._format_message(profile)
+        super().__init__(self.message, *args)
+
+    def _format_message(self, profile: str) -> str:
+        return f"The resource profile '{profile}' does not exist."
+
+
+class DockerHostUnavailableError(BaseError):
+    """Error raised when no Docker host, or a given one, can run Jobs."""
+
+    def __init__(self, host: Optional[str] = None, *args: object) -> None:
+        self.message = self._format_message(host)
+        super().__init__(self.message, *args)
+
+    def _format_message(self, host: Optional[str]) -> str:
+        if not host:
+            return "No Docker host is available to run the Job."
+        return f"The Docker host '{host}' is not available."
@@ -1,11 +1,23 @@
-import base64
 import enum
-from datetime import datetime, timezone
+import hashlib
+from importlib.util import find_spec
 from pathlib import Path
-from typing import Annotated, Any, Union
-
-from app.core.enums import Environment, JobManagerType
-from pydantic import BaseModel, Discriminator, Tag
+from typing import Annotated, Any, Dict, List, Optional, Tuple, Union
+
+from app.core.enums import (
+    BrokerType,
+    CompressionCodec,
+    Environment,
+    JobManagerType,
+    StorageType,
+)
+from pydantic import (
+    BaseModel,
+    Discriminator,
+    Tag,
+    field_validator,
+    model_validator,
+)
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -31,6 +43,84 @@ class RedisSettings(BaseModel):
         return f"redis://{self.host}:{self.port}/0"
 
 
+class DockerHostSettings(BaseModel):
+    """A remote Docker daemon Jobs may be placed on."""
+
+    base_url: str
+    """Docker daemon URL"""
+
+    capacity: Optional[int] = None
+    """Jobs the daemon may run at once. Derived from its CPUs and memory if unset."""
+
+
+class DockerSettings(BaseModel):
+    """Docker client settings."""
+
+    base_url: Optional[str] = None
+    """Docker daemon URL. Defaults to the environment (DOCKER_HOST)."""
+
+    timeout: int = 60
+    """Docker API request timeout in seconds"""
+
+    max_pool_size: int = 10
+    """Docker API HTTP connection pool size"""
+
+    max_workers: int = 10
+    """Threads available for blocking Docker API calls"""
+
+    stream_chunk_size: int = 1024 * 1024
+    """Size in bytes of the chunks read from Docker response streams"""
+
+    stream_buffered_chunks: int = 4
+    """Chunks buffered in memory per stream before the reader blocks"""
+
+    local_host_name: str = "local"
+    """Name the local Docker daemon is recorded under on the Jobs it runs"""
+
+    local_capacity: Optional[int] = None
+    """Jobs the local daemon may run at once. Derived from its resources if unset"""
+
+    hosts: Dict[str, DockerHostSettings] = {}
+    """Remote Docker daemons Jobs may be placed on, by name"""
+
+    placement_refresh_interval: float = 5.0
+    """Seconds between counts of the Jobs running on each Docker daemon"""
+
+
+class ResourceProfile(BaseModel):
+    """Resource limits applied to a Job container."""
+
+    cpus: float = 1.0
+    """CPUs the Job may use"""
+
+    memory: str = "512m"
+    """Memory limit, swap included"""
+
+    pids_limit: int = 256
+    """Maximum number of processes"""
+
+    tmpfs_size: Optional[str] = None
+    """Size of an in-memory scratch mount, if any"""
+
+    tmpfs_path: str = "/scratch"
+    """Path of the in-memory scratch mount"""
+
+    @property
+    def config(self) -> dict:
+        """Returns the Docker container configuration for the limits."""
+        config = {
+            "nano_cpus": int(self.cpus * 1_000_000_000),
+            "mem_limit": self.memory,
+            "memswap_limit": self.memory,
+            "pids_limit": self.pids_limit,
+        }
+        if self.tmpfs_size:
+            config["tmpfs"] = {
+                self.tmpfs_path: f"rw,noexec,nosuid,mode=1777,size={self.tmpfs_size}",
+            }
+        return config
+
+
 class JobManagerSettings(BaseModel):
     """BuildBotJob settings."""
 
@@ -39,20 +129,110 @@ class JobManagerSettings(BaseModel):
     workdir: str = "workdir"
     """Job Base Workdir"""
 
-    schedule: str = "*/1 * * * *"
-    """Job Manager Schedule"""
+    schedule: str = "*/5 * * * *"
+    """Job Manager Safety Net Sweep Schedule"""
 
     job_timeout: int = 300
     """Job Maximum Time to Live in Seconds"""
 
+    watchdog_interval: float = 30.0
+    """Seconds between checks for Jobs running past their deadline"""
+
+    watchdog_grace: int = 30
+    """Seconds a Job may outlive its timeout before it is killed"""
+
     concurrent_jobs: int = 10
     """Concurrent Jobs"""
 
-    artifact_path_template: str = "{job_id}/artifact.tar.gz"
+    max_queue_depth: int = 1000
+    """Pending Jobs accepted before new Jobs are rejected"""
+
+    queue_retry_after: int = 5
+    """Seconds clients are asked to wait when the queue is full"""
+
+    dispatch_interval: float = 1.0
+    """Seconds between checks for free running slots"""
+
+    heartbeat_interval: float = 5.0
+    """Seconds between Job Manager heartbeats"""
+
+    heartbeat_ttl: float = 15.0
+    """Seconds without a heartbeat after which a Job Manager is considered dead"""
+
+    job_lease_ttl: int = 600
+    """Seconds a Job Manager holds a Job while handling its container"""
+
+    retry_max_attempts: int = 5
+    """Failed launches after which a Job is dead-lettered and marked as failed"""
+
+    retry_base_delay: float = 2.0
+    """Seconds before the first launch retry, doubled on every further failure"""
+
+    retry_max_delay: float = 300.0
+    """Upper bound in seconds of the launch retry delay"""
+
+    artifact_path_template: str = "{job_id}/artifact.tar"
     """Job Artifact Path Templates"""
 
-    log_path_template: str = "{job_id}/logs.tar.gz"
-    """Job Logs Path Templates"""
+    legacy_artifact_path_template: str = "{job_id}/artifact.tar.gz"
+    """Path Templates of Job Artifacts stored before they were indexed"""
+
+    artifact_index_path_template: str = "{job_id}/artifact.index.json"
+    """Job Artifact Index Path Templates"""
+
+    artifact_manifest_path_template: str = "{job_id}/artifact.manifest.json"
+    """Job Artifact Manifest Path Templates (content-addressed storage)"""
+
+    log_path_template: str = "{job_id}/logs.tar{extension}"
+    """Job Logs Path Templates, `extension` being the one of the codec"""
+
+    log_spool_size: int = 1024 * 1024
+    """Log bytes kept in memory per stream before spilling to disk"""
+
+    max_log_size: int = 64 * 1024 * 1024
+    """Maximum log bytes kept per stream. Anything past it is dropped."""
+
+    log_stream_buffer_lines: int = 10000
+    """Log lines kept in memory per Job for live log viewers"""
+
+    log_stream_max_line_length: int = 16 * 1024
+    """Maximum bytes of a live log line. Longer lines are split."""
+
+    log_stream_linger: float = 60.0
+    """Seconds a finished Job's live log buffer is kept for late viewers"""
+
+    resource_profiles: Dict[str, ResourceProfile] = {
+        "small": ResourceProfile(cpus=0.5, memory="256m", pids_limit=128),
+        "default": ResourceProfile(),
+        "large": ResourceProfile(
+            cpus=2.0,
+            memory="2g",
+            pids_limit=1024,
+            tmpfs_size="512m",
+        ),
+    }
+    """Resource profiles Tasks can select by name"""
+
+    default_resource_profile: str = "default"
+    """Resource profile of Tasks that do not select one"""
+
+    max_input_size: int = 8 * 1024 * 1024
+    """Total bytes of input files a Job may be created with"""
+
+    input_ttl: int = 24 * 60 * 60
+    """Seconds the input files of a Job are kept while it waits to be launched"""
+
+    _script_path: str = "run.sh"
+    """Name of the Job script within its workdir"""
+
+    @property
+    def script_path(self) -> str:
+        """Returns the name of the Job script within its workdir."""
+        return self._script_path
+
+    def get_resource_profile(self, name: Optional[str] = None) -> ResourceProfile:
+        """Returns a resource profile by name, or the default one."""
+        return self.resource_profiles[name or self.default_resource_profile]
 
     @staticmethod
     def discriminator(v: Any) -> JobManagerType:
@@ -67,14 +247,40 @@ class JobManagerSettings(BaseModel):
 class ContainerJobManagerSettings(JobManagerSettings):
     """Container Job Manager settings."""
 
-    # ? Docker Image Tag
-    image_tag: str = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    # ? Docker Image Tag (derived from the Dockerfile and build args if unset)
+    image_tag: Optional[str] = None
+
+    # ? Docker Image Repository
+    image_repository: str = "buildbot/runner"
 
     # ? Dockerfile Directory Path
     dockerfile_path: Path = Path("buildbot/app/background/job_manager/container")
 
-    # ? Script Path
-    _script_path: str = "run.sh"
+    # ? Handle terminated containers as soon as Docker reports them
+    watch_events: bool = True
+
+    # ? Seconds to wait before reconnecting to the Docker events stream
+    event_reconnect_delay: float = 5.0
+
+    # ? Idle containers kept started and waiting for a Job (0 disables the pool)
+    warm_pool_size: int = 2
+
+    # ? Start latency samples kept per start path for the percentiles
+    start_latency_samples: int = 1000
+
+    # ? Seconds after which a Job container nobody handles is removed
+    orphan_container_ttl: int = 3600
+
+    # ? Seconds between container stats samples of running Jobs (0 disables)
+    stats_interval: float = 10.0
+
+    # ? Container stats requests in flight at once
+    stats_concurrency: int = 4
+
+    # ? File delivered to a warm container along with the script, and the FIFO
+    # ? the container waits on until it is claimed
+    _env_path: str = ".buildbot-env"
+    _start_path: str = ".buildbot-start"
 
     # ? Docker Container Configuration
     @property
@@ -89,30 +295,183 @@ class ContainerJobManagerSettings(JobManagerSettings):
             "stdout": True,
         }
 
+    # ? `detach`, `stdout` and `stderr` only apply to containers started by `run`
+    @property
+    def create_config(self) -> dict:
+        """Returns the configuration of a container created before it is started."""
+        return {
+            key: value
+            for key, value in self.config.items()
+            if key not in ("detach", "stdout", "stderr")
+        }
+
     # ? Docker Image Configuration
     @property
     def image_config(self) -> dict:
         """Returns a Docker image configuration."""
-        _workdir = Path(f"/{self.workdir}")
         return {
-            "tag": self.image_tag,
+            "tag": self.get_image_tag(),
             "path": str(self.dockerfile_path),
-            "buildargs": {
-                "WORKDIR": str(_workdir),
-                "SCRIPT_PATH": f"{_workdir}/{self._script_path}",
-            },
+            "buildargs": self._image_buildargs,
         }
 
-    def get_command(self, script: str) -> str:
-        """Generates a Docker command, encodes the script, sets a timeout and deletes run.sh."""
-        encoded_script = base64.b64encode(script.encode()).decode()
+    @property
+    def _image_buildargs(self) -> dict:
+        _workdir = Path(f"/{self.workdir}")
+        return {
+            "WORKDIR": str(_workdir),
+            "SCRIPT_PATH": f"{_workdir}/{self._script_path}",
+        }
+
+    # ? The image only depends on its Dockerfile and build args, so hashing
+    # ? them gives the same tag across restarts and replicas and an unchanged
+    # ? image is never rebuilt.
+    def get_image_tag(self) -> str:
+        """Returns the Docker image tag, derived from the image inputs if unset."""
+        if self.image_tag:
+            return self.image_tag
+        digest = hashlib.sha256(
+            (self.dockerfile_path / "Dockerfile").read_bytes(),
+        )
+        for name, value in sorted(self._image_buildargs.items()):
+            digest.update(f"\0{name}={value}".encode())
+        return f"{self.image_repository}:{digest.hexdigest()[:16]}"
+
+    # ? The script is uploaded into the created container before it starts,
+    # ? so the command is the same for every Job and its size is not bound
+    # ? by the command line.
+    def get_command(self) -> str:
+        """Generates the Docker command, which runs run.sh with a timeout and deletes it."""
+        return f'"{self._get_run_script()}"'
+
+    # ? A warm container blocks reading its start FIFO, which is only opened
+    # ? for writing once the Job files are in place, so it does not poll.
+    def get_pool_command(self) -> str:
+        """Generates the command of a warm container, which waits for its Job files."""
+        return (
+            f'"mkfifo {self._start_path} || exit 1; read -r _ < {self._start_path}; '
+            f"rm -f {self._start_path}; set -a; . ./{self._env_path}; set +a; "
+            f'rm -f {self._env_path}; {self._get_run_script()}"'
+        )
+
+    def get_pool_start_command(self) -> List[str]:
+        """Generates the command run in a claimed warm container to start its Job."""
+        return ["sh", "-c", f": > {self._start_path}"]
 
+    def _get_run_script(self) -> str:
         return (
-            f'"echo {encoded_script} | base64 -d > {self._script_path} '
-            f"&& chmod +x {self._script_path} && timeout {self.job_timeout}s "
-            f'./{self._script_path}; rm -f {self._script_path}"'
+            f"timeout {self.job_timeout}s ./{self._script_path}; status=$?; "
+            f"rm -f {self._script_path}; exit $status"
         )
 
+    @property
+    def pool_files(self) -> Tuple[str, str]:
+        """Returns the script and environment file names of a warm container."""
+        return self._script_path, self._env_path
+
+
+class ProcessJobManagerSettings(JobManagerSettings):
+    """Process Job Manager settings."""
+
+    # ? Run Jobs in new user, PID, mount, network, IPC and UTS namespaces
+    # ? (falls back to plain subprocesses where `unshare` is not permitted)
+    isolate: bool = True
+
+    # ? Directory the per-Job workdirs are created in (system temp dir if unset)
+    workdir_root: Optional[Path] = None
+
+    # ? Shell the Job script is run with
+    shell: str = "/bin/sh"
+
+    # ? Environment every Job starts from, before its own variables
+    base_env: Dict[str, str] = {"PATH": "/usr/local/bin:/usr/bin:/bin"}
+
+    # ? Largest file in bytes a Job may write
+    max_file_size: int = 1024 * 1024 * 1024
+
+    # ? Files a Job may have open at once
+    max_open_files: int = 1024
+
+    # ? Namespaces unshared for an isolated Job
+    @property
+    def unshare_command(self) -> List[str]:
+        """Returns the `unshare` command prefix of an isolated Job."""
+        return [
+            "unshare",
+            "--user",
+            "--map-root-user",
+            "--pid",
+            "--fork",
+            "--mount-proc",
+            "--net",
+            "--ipc",
+            "--uts",
+            "--",
+        ]
+
+    def get_command(self) -> List[str]:
+        """Returns the command that runs the Job script in its workdir."""
+        return [self.shell, "-c", f"./{self._script_path}"]
+
+
+_MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class S3StorageSettings(BaseModel):
+    """S3-compatible object storage settings (requires the `s3` extra)."""
+
+    bucket: str = "buildbot"
+    """Bucket the artifacts are stored in"""
+
+    prefix: str = ""
+    """Prefix of the keys of every stored object"""
+
+    endpoint_url: Optional[str] = None
+    """Endpoint of S3-compatible services such as MinIO. AWS S3 if unset."""
+
+    region: Optional[str] = None
+    """Region of the bucket"""
+
+    access_key_id: Optional[str] = None
+    """Access key ID. Taken from the environment or instance profile if unset."""
+
+    secret_access_key: Optional[str] = None
+    """Secret access key. Taken from the environment or instance profile if unset."""
+
+    max_connections: int = 16
+    """HTTP connections of the API calls and uploads, on as many threads"""
+
+    download_concurrency: int = 16
+    """Downloads streamed at once, on threads and connections of their own"""
+
+    part_size: int = 8 * 1024 * 1024
+    """Size of the parts of multipart uploads (at least 5 MiB)"""
+
+    upload_concurrency: int = 4
+    """Parts of a multipart upload sent at once"""
+
+    # ? S3 rejects parts under 5 MiB, other than the last one, only when the
+    # ? upload is completed, after the whole artifact has been sent.
+    @field_validator("part_size")
+    @classmethod
+    def check_part_size(cls, part_size: int) -> int:
+        """Checks that the parts are as large as S3 requires."""
+        if part_size < _MIN_PART_SIZE:
+            raise ValueError(
+                f"Multipart upload parts must be at least {_MIN_PART_SIZE} bytes.",
+            )
+        return part_size
+
+
+# ? Levels each codec accepts, checked at start-up rather than when the first
+# ? archive of a Job is compressed.
+_COMPRESSION_LEVELS: Dict[CompressionCodec, range] = {
+    CompressionCodec.GZIP: range(10),
+    CompressionCodec.BZ2: range(1, 10),
+    CompressionCodec.XZ: range(10),
+    CompressionCodec.ZSTD: range(1, 23),
+}
+
 
 class ArtifactStorageSettings(BaseModel):
     """Job Artifact Storage settings."""
@@ -120,6 +479,59 @@ class ArtifactStorageSettings(BaseModel):
     volume_path: Path = Path("data")
     """Artifact Storage Volume Path"""
 
+    type: StorageType = StorageType.LOCAL
+    """Artifact Storage Type"""
+
+    blobs_path: Path = Path("blobs")
+    """Directory of the deduplicated file contents, relative to the volume"""
+
+    codec: CompressionCodec = CompressionCodec.GZIP
+    """Codec of the log archives and of the output files downloaded as archives"""
+
+    compression_level: Optional[int] = None
+    """Compression level of the codec (the codec's default if unset)"""
+
+    compression_workers: int = 1
+    """Blocks compressed at once on a thread pool (1 compresses serially)"""
+
+    compression_block_size: int = 4 * 1024 * 1024
+    """Size of the blocks compressed independently when compressing in parallel"""
+
+    s3: S3StorageSettings = S3StorageSettings()
+    """S3-compatible object storage settings (`type` set to `s3`)"""
+
+    @model_validator(mode="after")
+    def check_compression_level(self) -> "ArtifactStorageSettings":
+        """Checks that the compression level is valid for the codec."""
+        levels = _COMPRESSION_LEVELS.get(self.codec)
+        if self.compression_level is None or levels is None:
+            return self
+        if self.compression_level not in levels:
+            raise ValueError(
+                f"The {self.codec.value} codec takes compression levels "
+                f"{levels.start} to {levels.stop - 1}, "
+                f"not {self.compression_level}.",
+            )
+        return self
+
+    @model_validator(mode="after")
+    def check_zstd_codec(self) -> "ArtifactStorageSettings":
+        """Checks that zstandard is installed when the zstd codec is used."""
+        if self.codec == CompressionCodec.ZSTD and find_spec("zstandard") is None:
+            raise ValueError(
+                "The zstd codec requires zstandard, installed with the 'zstd' extra.",
+            )
+        return self
+
+    @model_validator(mode="after")
+    def check_s3_client(self) -> "ArtifactStorageSettings":
+        """Checks that the S3 client is installed when the S3 storage is used."""
+        if self.type == StorageType.S3 and find_spec("boto3") is None:
+            raise ValueError(
+                "The s3 storage requires boto3, installed with the 's3' extra.",
+            )
+        return self
+
 
 class Settings(BaseSettings):
     """
@@ -140,6 +552,15 @@ class Settings(BaseSettings):
     # ? Enable uvicorn reloading
     uvicorn_reload: bool = False
 
+    # ? Taskiq broker. With Redis, Jobs are launched and handled by workers
+    broker_type: BrokerType = BrokerType.MEMORY
+
+    # ? Redis list the taskiq workers read tasks from
+    broker_queue_name: str = "buildbot:tasks"
+
+    # ? Quantity of taskiq worker processes
+    taskiq_workers_count: int = 1
+
     # ? Current environment
     environment: Environment = Environment.PROD
 
@@ -150,10 +571,14 @@ class Settings(BaseSettings):
     # ? Redis
     redis_settings: RedisSettings
 
+    # ? Docker
+    docker_settings: DockerSettings = DockerSettings()
+
     # ? Job Manager
     job_manager_settings: Annotated[
         Union[
             Annotated[ContainerJobManagerSettings, Tag(JobManagerType.CONTAINER)],
+            Annotated[ProcessJobManagerSettings, Tag(JobManagerType.PROCESS)],
             Annotated[JobManagerSettings, Tag(JobManagerType.BASE)],
         ],
         Discriminator(JobManagerSettings.discriminator),
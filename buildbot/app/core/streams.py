@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import tarfile
+import threading
+import time
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, Optional, TypeVar
+
+if TYPE_CHECKING:
+    from app.core.compression import Compressor
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class _ThreadedProducer:
+    """Feeds the items of a blocking iterable into a bounded asyncio queue."""
+
+    def __init__(
+        self,
+        iterable: Iterable[T],
+        loop: asyncio.AbstractEventLoop,
+        queue: asyncio.Queue,
+    ) -> None:
+        self._iterable = iterable
+        self._loop = loop
+        self._queue = queue
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        """Consumes the iterable. Runs in a worker thread."""
+        iterator = iter(self._iterable)
+        try:
+            for item in iterator:
+                if self._stopped.is_set():
+                    return
+                self._put(item)
+            self._put(_DONE)
+        except Exception as e:
+            self._put(e)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+
+    def stop(self) -> None:
+        """Stops the producer and unblocks it if it is waiting on a full queue."""
+        self._stopped.set()
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+    def _put(self, item: object) -> None:
+        if self._stopped.is_set():
+            return
+        asyncio.run_coroutine_threadsafe(self._queue.put(item), self._loop).result()
+
+
+# ? The other way around: blocking readers such as tarfile's stream mode can
+# ? consume an async stream from a worker thread. Every read that runs out of
+# ? buffered bytes waits for the next chunk on the event loop.
+class AsyncIteratorReader(io.RawIOBase):
+    """Blocking file-like reader over an async iterator of bytes."""
+
+    def __init__(
+        self,
+        chunks: AsyncIterator[bytes],
+        loop: asyncio.AbstractEventLoop,
+    ) -> None:
+        self._chunks = chunks
+        self._loop = loop
+        self._chunk = memoryview(b"")
+        self._exhausted = False
+
+    def readable(self) -> bool:
+        """Returns whether the reader can be read from."""
+        return True
+
+    def readinto(self, buffer: bytearray) -> int:
+        """Reads up to `len(buffer)` bytes into `buffer`. Runs in a worker thread."""
+        while not self._chunk and not self._exhausted:
+            try:
+                self._chunk = memoryview(
+                    asyncio.run_coroutine_threadsafe(
+                        self._next_chunk(),
+                        self._loop,
+                    ).result(),
+                )
+            except StopAsyncIteration:
+                self._exhausted = True
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+    async def _next_chunk(self) -> bytes:
+        return await anext(self._chunks)
+
+
+# ? Blocking iterators (docker-py response streams, tarfile readers, etc.) are
+# ? drained by a worker thread into a bounded queue. When the consumer falls
+# ? behind, the queue fills up and the worker blocks, so at most `max_buffered`
+# ? items are ever held in memory regardless of the size of the stream.
+async def iterate_in_thread(
+    iterable: Iterable[T],
+    executor: Optional[Executor] = None,
+    max_buffered: int = 4,
+) -> AsyncIterator[T]:
+    """
+    Asynchronously iterates a blocking iterable with backpressure.
+
+    :param iterable: The blocking iterable to consume.
+    :param executor: The executor whose thread consumes the iterable.
+    :param max_buffered: The maximum number of items buffered in memory.
+    :return: An async iterator over the items of the iterable.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffered)
+    producer = _ThreadedProducer(iterable, loop, queue)
+    task = loop.run_in_executor(executor, producer.run)
+    try:
+        while (item := await queue.get()) is not _DONE:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.stop()
+        await task
+
+
+# ? Wraps a single file into a tar archive on the fly: the tar header, the file
+# ? chunks, the block padding and the end-of-archive marker are compressed as
+# ? they go, so only a few chunks are ever held in memory.
+async def stream_tar(
+    name: str,
+    size: int,
+    chunks: AsyncIterator[bytes],
+    compressor: Compressor,
+) -> AsyncIterator[bytes]:
+    """
+    Streams a file as a compressed tar archive holding only that file.
+
+    :param name: The name of the file within the archive.
+    :param size: The size of the file in bytes.
+    :param chunks: The content of the file.
+    :param compressor: The compressor of the archive.
+    :return: An async iterator over the compressed archive.
+    """
+    info = tarfile.TarInfo(name=name)
+    info.size = size
+    info.mode = 0o644
+    info.mtime = int(time.time())
+
+    yield compressor.compress(info.tobuf(format=tarfile.PAX_FORMAT))
+    async for chunk in chunks:
+        if compressed := await asyncio.to_thread(compressor.compress, chunk):
+            yield compressed
+    padding = -size % tarfile.BLOCKSIZE
+    yield await asyncio.to_thread(
+        compressor.compress,
+        tarfile.NUL * (padding + 2 * tarfile.BLOCKSIZE),
+    )
+    yield await asyncio.to_thread(compressor.flush)
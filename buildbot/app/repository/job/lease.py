@@ -0,0 +1,104 @@
+import time
+from abc import ABC, abstractmethod
+from typing import List
+
+from app.core.settings import settings
+from app.core.utils import AbstractSingletonMeta
+from redis import asyncio as aioredis
+
+# ? Deletes a lease only if it is still held by the given Job Manager.
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class JobLeaseRepository(ABC):
+    """Abstract registry of live Job Managers and of the Jobs they handle."""
+
+    @abstractmethod
+    async def heartbeat(self, manager_id: str) -> None:
+        """Records that a Job Manager is alive."""
+
+    @abstractmethod
+    async def get_live_managers(self, ttl: float) -> List[str]:
+        """Returns the Job Managers that sent a heartbeat in the last `ttl` seconds."""
+
+    @abstractmethod
+    async def leave(self, manager_id: str) -> None:
+        """Removes a Job Manager from the registry."""
+
+    @abstractmethod
+    async def acquire(self, job_id: str, manager_id: str, ttl: int) -> bool:
+        """Takes a Job's lease for `ttl` seconds unless another manager holds it."""
+
+    @abstractmethod
+    async def release(self, job_id: str, manager_id: str) -> None:
+        """Gives a Job's lease back if the manager still holds it."""
+
+
+class JobLeaseRedisRepository(JobLeaseRepository, metaclass=AbstractSingletonMeta):
+    """Redis-backed registry using a sorted set of heartbeats and SET NX leases."""
+
+    _pool = None
+
+    _managers_key = "managers:heartbeat"
+
+    @classmethod
+    def initialize(
+        cls,
+        redis_url: str = "redis://localhost:6379/0",
+    ) -> "JobLeaseRedisRepository":
+        """Initializes the connection pool."""
+        if cls._pool is None:
+            cls._pool = aioredis.ConnectionPool.from_url(
+                redis_url,
+                decode_responses=True,
+            )
+        return cls(cls._pool)
+
+    def __init__(self, pool: aioredis.ConnectionPool) -> None:
+        self._redis = aioredis.Redis(connection_pool=pool)
+        self._release = self._redis.register_script(_RELEASE_SCRIPT)
+
+    def _get_lease_key(self, job_id: str) -> str:
+        return f"job:lease:{job_id}"
+
+    async def heartbeat(self, manager_id: str) -> None:
+        """Records that a Job Manager is alive."""
+        await self._redis.zadd(self._managers_key, {manager_id: time.time()})
+
+    async def get_live_managers(self, ttl: float) -> List[str]:
+        """Returns the Job Managers that sent a heartbeat in the last `ttl` seconds."""
+        expired_before = time.time() - ttl
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(self._managers_key, "-inf", expired_before)
+            pipe.zrange(self._managers_key, 0, -1)
+            _, managers = await pipe.execute()
+        return managers
+
+    async def leave(self, manager_id: str) -> None:
+        """Removes a Job Manager from the registry."""
+        await self._redis.zrem(self._managers_key, manager_id)
+
+    async def acquire(self, job_id: str, manager_id: str, ttl: int) -> bool:
+        """Takes a Job's lease for `ttl` seconds unless another manager holds it."""
+        return bool(
+            await self._redis.set(
+                self._get_lease_key(job_id),
+                manager_id,
+                nx=True,
+                ex=ttl,
+            ),
+        )
+
+    async def release(self, job_id: str, manager_id: str) -> None:
+        """Gives a Job's lease back if the manager still holds it."""
+        await self._release(keys=[self._get_lease_key(job_id)], args=[manager_id])
+
+
+def get_job_lease_repository() -> JobLeaseRepository:
+    """Returns the singleton JobLeaseRedisRepository."""
+    return JobLeaseRedisRepository.initialize(settings.redis_settings.get_url())
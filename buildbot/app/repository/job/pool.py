@@ -0,0 +1,88 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+from app.core.settings import settings
+from app.core.utils import AbstractSingletonMeta
+from redis import asyncio as aioredis
+
+
+class PoolStatsRepository(ABC):
+    """Abstract registry of the warm pool statistics of every Job runner."""
+
+    @abstractmethod
+    async def save(self, owner: str, stats: Dict[str, Any]) -> None:
+        """Records the latest statistics of a Job runner's pool."""
+
+    @abstractmethod
+    async def get_all(self, ttl: float) -> Dict[str, Dict[str, Any]]:
+        """Returns the statistics recorded in the last `ttl` seconds, by runner."""
+
+    @abstractmethod
+    async def remove(self, owner: str) -> None:
+        """Removes the statistics of a Job runner's pool."""
+
+
+# ? Runners report into a hash along with a sorted set of report times, so
+# ? the reports of runners that went away are dropped like dead heartbeats.
+class PoolStatsRedisRepository(PoolStatsRepository, metaclass=AbstractSingletonMeta):
+    """Redis-backed registry of warm pool statistics."""
+
+    _pool = None
+
+    _stats_key = "pool:stats"
+    _reported_key = "pool:stats:reported"
+
+    @classmethod
+    def initialize(
+        cls,
+        redis_url: str = "redis://localhost:6379/0",
+    ) -> "PoolStatsRedisRepository":
+        """Initializes the connection pool."""
+        if cls._pool is None:
+            cls._pool = aioredis.ConnectionPool.from_url(
+                redis_url,
+                decode_responses=True,
+            )
+        return cls(cls._pool)
+
+    def __init__(self, pool: aioredis.ConnectionPool) -> None:
+        self._redis = aioredis.Redis(connection_pool=pool)
+
+    async def save(self, owner: str, stats: Dict[str, Any]) -> None:
+        """Records the latest statistics of a Job runner's pool."""
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._stats_key, owner, json.dumps(stats))
+            pipe.zadd(self._reported_key, {owner: time.time()})
+            await pipe.execute()
+
+    async def get_all(self, ttl: float) -> Dict[str, Dict[str, Any]]:
+        """Returns the statistics recorded in the last `ttl` seconds, by runner."""
+        expired_before = time.time() - ttl
+        expired: List[str] = await self._redis.zrangebyscore(
+            self._reported_key,
+            "-inf",
+            expired_before,
+        )
+        if expired:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.hdel(self._stats_key, *expired)
+                pipe.zremrangebyscore(self._reported_key, "-inf", expired_before)
+                await pipe.execute()
+        return {
+            owner: json.loads(stats)
+            for owner, stats in (await self._redis.hgetall(self._stats_key)).items()
+        }
+
+    async def remove(self, owner: str) -> None:
+        """Removes the statistics of a Job runner's pool."""
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hdel(self._stats_key, owner)
+            pipe.zrem(self._reported_key, owner)
+            await pipe.execute()
+
+
+def get_pool_stats_repository() -> PoolStatsRepository:
+    """Returns the singleton PoolStatsRedisRepository."""
+    return PoolStatsRedisRepository.initialize(settings.redis_settings.get_url())
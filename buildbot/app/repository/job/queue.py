@@ -0,0 +1,197 @@
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from app.core.settings import settings
+from app.core.utils import AbstractSingletonMeta
+from loguru import logger
+from redis import asyncio as aioredis
+
+# ? Pushes only while the queue is shorter than the maximum depth.
+_PUSH_SCRIPT = """
+if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[2]) then
+    return -1
+end
+return redis.call('RPUSH', KEYS[1], ARGV[1])
+"""
+
+# ? Pops the oldest pending Job only while fewer than `limit` Jobs hold a slot,
+# ? so API workers and replicas can dispatch concurrently without overshooting.
+_ADMIT_SCRIPT = """
+if redis.call('SCARD', KEYS[2]) >= tonumber(ARGV[1]) then
+    return false
+end
+local job_id = redis.call('LPOP', KEYS[1])
+if job_id then
+    redis.call('SADD', KEYS[2], job_id)
+end
+return job_id
+"""
+
+# ? Moves the retries that are due back to the end of the pending queue.
+_PROMOTE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)
+for _, job_id in ipairs(due) do
+    redis.call('ZREM', KEYS[1], job_id)
+    redis.call('RPUSH', KEYS[2], job_id)
+end
+return #due
+"""
+
+
+class JobQueueRepository(ABC):
+    """Abstract queue of pending Jobs with a bounded set of running slots."""
+
+    @abstractmethod
+    async def push(self, job_id: str, max_depth: int) -> bool:
+        """Enqueues a Job unless the queue already holds `max_depth` Jobs."""
+
+    @abstractmethod
+    async def admit(self, limit: int) -> Optional[str]:
+        """Dequeues the next Job if fewer than `limit` Jobs are running."""
+
+    @abstractmethod
+    async def release(self, job_id: str) -> None:
+        """Frees the running slot held by a Job."""
+
+    @abstractmethod
+    async def record_attempt(self, job_id: str) -> int:
+        """Counts a failed launch of a Job and returns its number of failures."""
+
+    @abstractmethod
+    async def clear_attempts(self, job_id: str) -> None:
+        """Forgets the failed launches of a Job."""
+
+    @abstractmethod
+    async def schedule_retry(self, job_id: str, delay: float) -> None:
+        """Enqueues a Job again once `delay` seconds have passed."""
+
+    @abstractmethod
+    async def promote_due_retries(self) -> int:
+        """Moves the due retries to the pending queue and returns how many."""
+
+    @abstractmethod
+    async def bury(self, job_id: str) -> None:
+        """Moves a Job that keeps failing to launch to the dead-letter set."""
+
+    @abstractmethod
+    async def get_retrying(self) -> List[str]:
+        """Returns the IDs of the Jobs waiting to be retried."""
+
+    @abstractmethod
+    async def get_pending(self) -> List[str]:
+        """Returns the IDs of the pending Jobs."""
+
+    @abstractmethod
+    async def get_running(self) -> List[str]:
+        """Returns the IDs of the Jobs holding a running slot."""
+
+    @abstractmethod
+    async def depth(self) -> int:
+        """Returns the number of pending Jobs."""
+
+    @abstractmethod
+    async def running(self) -> int:
+        """Returns the number of Jobs holding a running slot."""
+
+
+class JobQueueRedisRepository(JobQueueRepository, metaclass=AbstractSingletonMeta):
+    """Redis-backed Job queue using a list for pending Jobs and a set for slots."""
+
+    _pool = None
+
+    _pending_key = "jobs:pending"
+    _running_key = "jobs:running"
+    _retry_key = "jobs:retry"
+    _attempts_key = "jobs:attempts"
+    _dead_key = "jobs:dead"
+
+    @classmethod
+    def initialize(
+        cls,
+        redis_url: str = "redis://localhost:6379/0",
+    ) -> "JobQueueRedisRepository":
+        """Initializes the connection pool."""
+        if cls._pool is None:
+            cls._pool = aioredis.ConnectionPool.from_url(
+                redis_url,
+                decode_responses=True,
+            )
+        return cls(cls._pool)
+
+    def __init__(self, pool: aioredis.ConnectionPool) -> None:
+        self._redis = aioredis.Redis(connection_pool=pool)
+        self._push = self._redis.register_script(_PUSH_SCRIPT)
+        self._admit = self._redis.register_script(_ADMIT_SCRIPT)
+        self._promote = self._redis.register_script(_PROMOTE_SCRIPT)
+        self._logger = logger
+
+    async def push(self, job_id: str, max_depth: int) -> bool:
+        """Enqueues a Job unless the queue already holds `max_depth` Jobs."""
+        depth = await self._push(keys=[self._pending_key], args=[job_id, max_depth])
+        if depth < 0:
+            self._logger.warning(f"Job queue is full. Rejected Job(id={job_id}).")
+            return False
+        return True
+
+    async def admit(self, limit: int) -> Optional[str]:
+        """Dequeues the next Job if fewer than `limit` Jobs are running."""
+        return await self._admit(
+            keys=[self._pending_key, self._running_key],
+            args=[limit],
+        )
+
+    async def release(self, job_id: str) -> None:
+        """Frees the running slot held by a Job."""
+        await self._redis.srem(self._running_key, job_id)
+
+    async def record_attempt(self, job_id: str) -> int:
+        """Counts a failed launch of a Job and returns its number of failures."""
+        return await self._redis.hincrby(self._attempts_key, job_id, 1)
+
+    async def clear_attempts(self, job_id: str) -> None:
+        """Forgets the failed launches of a Job."""
+        await self._redis.hdel(self._attempts_key, job_id)
+
+    async def schedule_retry(self, job_id: str, delay: float) -> None:
+        """Enqueues a Job again once `delay` seconds have passed."""
+        await self._redis.zadd(self._retry_key, {job_id: time.time() + delay})
+
+    async def promote_due_retries(self) -> int:
+        """Moves the due retries to the pending queue and returns how many."""
+        return await self._promote(
+            keys=[self._retry_key, self._pending_key],
+            args=[time.time()],
+        )
+
+    async def bury(self, job_id: str) -> None:
+        """Moves a Job that keeps failing to launch to the dead-letter set."""
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(self._dead_key, job_id)
+            pipe.hdel(self._attempts_key, job_id)
+            await pipe.execute()
+
+    async def get_retrying(self) -> List[str]:
+        """Returns the IDs of the Jobs waiting to be retried."""
+        return await self._redis.zrange(self._retry_key, 0, -1)
+
+    async def get_pending(self) -> List[str]:
+        """Returns the IDs of the pending Jobs."""
+        return await self._redis.lrange(self._pending_key, 0, -1)
+
+    async def get_running(self) -> List[str]:
+        """Returns the IDs of the Jobs holding a running slot."""
+        return list(await self._redis.smembers(self._running_key))
+
+    async def depth(self) -> int:
+        """Returns the number of pending Jobs."""
+        return await self._redis.llen(self._pending_key)
+
+    async def running(self) -> int:
+        """Returns the number of Jobs holding a running slot."""
+        return await self._redis.scard(self._running_key)
+
+
+def get_job_queue_repository() -> JobQueueRepository:
+    """Returns the singleton JobQueueRedisRepository."""
+    return JobQueueRedisRepository.initialize(settings.redis_settings.get_url())
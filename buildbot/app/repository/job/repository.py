@@ -1,8 +1,9 @@
+import base64
 from abc import abstractmethod
-from typing import Optional
+from typing import Dict, List, Optional
 
 from app.core.settings import settings
-from app.repository.job.schemas import Job, JobStatus
+from app.repository.job.schemas import Job, JobStatus, JobUsage
 from app.repository.repository import BaseRedisRepository, BaseRepository
 
 
@@ -10,9 +11,21 @@ class JobRepository(BaseRepository):
     """Abstract Job Repository."""
 
     @abstractmethod
-    async def create(self, job: Job) -> Optional[str]:
+    async def create(
+        self,
+        job: Job,
+        inputs: Optional[Dict[str, str]] = None,
+    ) -> Optional[str]:
         """Creates a new Job in Redis."""
 
+    @abstractmethod
+    async def get_inputs(self, job_id: str) -> Optional[Dict[str, bytes]]:
+        """Retrieves the input files of a Job, if they are still kept."""
+
+    @abstractmethod
+    async def delete_inputs(self, job_id: str) -> None:
+        """Deletes the input files of a Job."""
+
     @abstractmethod
     async def get(self, id: str) -> Optional[Job]:
         """Retrieves a Job by ID."""
@@ -25,6 +38,14 @@ class JobRepository(BaseRepository):
     async def update_status(self, job_id: str, status: str) -> Optional[str]:
         """Updates the status of a Job."""
 
+    @abstractmethod
+    async def get_ids_by_status(self, status: JobStatus) -> List[str]:
+        """Retrieves the IDs of the Jobs with a given status."""
+
+    @abstractmethod
+    async def update_usage(self, job_id: str, usage: JobUsage) -> Optional[str]:
+        """Updates the resource usage of a Job."""
+
     @abstractmethod
     async def delete(self, id: str) -> None:
         """Deletes a Job by ID."""
@@ -45,11 +66,54 @@ class JobRedisRepository(JobRepository, BaseRedisRepository):
     def _get_task_key(self, id: str) -> str:
         return f"task:{id}"
 
-    async def create(self, job: Job) -> Optional[str]:
-        """Creates a new Job in Redis."""
-        await self._redis.set(self._get_key(job.id), job.model_dump_json())
+    # ? Input files are only needed until the Job is launched, so they are
+    # ? kept apart from the Job, which is read and written on every status
+    # ? and usage update, and expire if the Job is never launched.
+    def _get_inputs_key(self, id: str) -> str:
+        return f"job:{id}:inputs"
+
+    # ? Jobs are also indexed by status, so unfinished Jobs can be listed
+    # ? without scanning the whole keyspace.
+    def _get_status_key(self, status: JobStatus) -> str:
+        return f"jobs:status:{status}"
+
+    async def create(
+        self,
+        job: Job,
+        inputs: Optional[Dict[str, str]] = None,
+    ) -> Optional[str]:
+        """
+        Creates a new Job in Redis.
+
+        :param job: The Job.
+        :param inputs: The Base64-encoded input files, by path relative to the
+            Job workdir, kept for `input_ttl` seconds.
+        :return: The ID of the Job.
+        """
+        job.has_inputs = bool(inputs)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._get_key(job.id), job.model_dump_json())
+            pipe.sadd(self._get_status_key(job.status), job.id)
+            if inputs:
+                pipe.hset(self._get_inputs_key(job.id), mapping=inputs)
+                pipe.expire(
+                    self._get_inputs_key(job.id),
+                    settings.job_manager_settings.input_ttl,
+                )
+            await pipe.execute()
         return job.id
 
+    async def get_inputs(self, job_id: str) -> Optional[Dict[str, bytes]]:
+        """Retrieves the input files of a Job, if they are still kept."""
+        inputs = await self._redis.hgetall(self._get_inputs_key(job_id))
+        if not inputs:
+            return None
+        return {path: base64.b64decode(data) for path, data in inputs.items()}
+
+    async def delete_inputs(self, job_id: str) -> None:
+        """Deletes the input files of a Job."""
+        await self._redis.delete(self._get_inputs_key(job_id))
+
     async def get(self, id: str) -> Optional[Job]:
         """Retrieves a Job by ID."""
         job_data = await self._redis.get(self._get_key(id))
@@ -76,7 +140,13 @@ class JobRedisRepository(JobRepository, BaseRedisRepository):
             },
         )
 
-        await self._redis.set(job_key, updated_job.model_dump_json())
+        old_status = Job.model_validate_json(job_data).status
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(job_key, updated_job.model_dump_json())
+            if old_status != updated_job.status:
+                pipe.srem(self._get_status_key(old_status), new_job.id)
+                pipe.sadd(self._get_status_key(updated_job.status), new_job.id)
+            await pipe.execute()
         return new_job.id
 
     async def update_status(self, job_id: str, status: JobStatus) -> Optional[str]:
@@ -87,9 +157,25 @@ class JobRedisRepository(JobRepository, BaseRedisRepository):
         job.status = status
         return await self.update(job)
 
+    async def get_ids_by_status(self, status: JobStatus) -> List[str]:
+        """Retrieves the IDs of the Jobs with a given status."""
+        return list(await self._redis.smembers(self._get_status_key(status)))
+
+    async def update_usage(self, job_id: str, usage: JobUsage) -> Optional[str]:
+        """Updates the resource usage of a Job."""
+        job = await self.get(job_id)
+        if not job:
+            return None
+        job.usage = usage
+        return await self.update(job)
+
     async def delete(self, id: str) -> None:
         """Deletes a Job by ID."""
-        await self._redis.delete(self._get_key(id))
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._get_key(id), self._get_inputs_key(id))
+            for status in JobStatus:
+                pipe.srem(self._get_status_key(status), id)
+            await pipe.execute()
 
 
 # ? A RepositoryType enum and a factory function
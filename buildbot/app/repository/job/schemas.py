@@ -1,9 +1,11 @@
+from datetime import datetime
 from enum import StrEnum
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
 from app.core import settings
 from app.repository.schemas import RepositoryBaseModel
+from pydantic import BaseModel
 
 
 class JobStatus(StrEnum):
@@ -15,12 +17,31 @@ class JobStatus(StrEnum):
     FAILED = "failed"
 
 
+class JobUsage(BaseModel):
+    """Resource usage of a Job, aggregated from its container stats."""
+
+    cpu_seconds: float = 0.0
+    # ? Docker reports the peak memory use only on cgroup v1 hosts. On cgroup
+    # ? v2 hosts this is the highest usage sampled, which misses short spikes
+    # ? between samples.
+    peak_memory_bytes: int = 0
+    block_read_bytes: int = 0
+    block_write_bytes: int = 0
+    network_rx_bytes: int = 0
+    network_tx_bytes: int = 0
+    samples: int = 0
+
+
 class Job(RepositoryBaseModel):
     """Simple Job model."""
 
     env_vars: Dict[str, str]
+    has_inputs: bool = False
     task_id: str
     status: JobStatus = JobStatus.PENDING
+    started_at: Optional[datetime] = None
+    docker_host: Optional[str] = None
+    usage: Optional[JobUsage] = None
 
     @property
     def output_path(self) -> Path:
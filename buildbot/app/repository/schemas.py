@@ -1,13 +1,18 @@
 import uuid
 from datetime import datetime, timezone
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+
+def _generate_id() -> str:
+    """Generates a time-ordered unique ID."""
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex}"
 
 
 class RepositoryBaseModel(BaseModel):
     """Base model for repository classes."""
 
-    id: str = f"{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex}"
+    id: str = Field(default_factory=_generate_id)
 
     class Config:
         ignore_extra = True
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from app.repository.schemas import RepositoryBaseModel
 
 
@@ -5,8 +7,12 @@ class Task(RepositoryBaseModel):
     """Simple Task model."""
 
     script: str
+    resource_profile: Optional[str] = None
 
     def __eq__(self, other: object) -> bool:
         if isinstance(other, Task):
-            return self.__super__().__eq__(other) and self.script == other.script
+            return self.__super__().__eq__(other) and (
+                self.script == other.script
+                and self.resource_profile == other.resource_profile
+            )
         return False
@@ -0,0 +1,47 @@
+import io
+import tarfile
+import time
+from pathlib import PurePosixPath
+from typing import Dict, List, Optional, Tuple
+
+
+# ? Docker creates missing parent directories as root, so they are added
+# ? explicitly and left writable for the Job user. The extra files go last.
+def build_job_archive(
+    script: str,
+    inputs: Dict[str, bytes],
+    script_path: str,
+    extra_files: Optional[List[Tuple[str, bytes]]] = None,
+) -> bytes:
+    """
+    Builds the tar archive delivered into a Job's workdir.
+
+    :param script: The Job script.
+    :param inputs: The Job input files, by path relative to the workdir.
+    :param script_path: The path of the script relative to the workdir.
+    :param extra_files: Further files written after the script, in order.
+    :return: The tar archive.
+    """
+    directories = sorted(
+        {str(parent) for path in inputs for parent in PurePosixPath(path).parents}
+        - {"."},
+    )
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode="w") as tar:
+        for directory in directories:
+            info = tarfile.TarInfo(name=directory)
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o777
+            info.mtime = int(time.time())
+            tar.addfile(info)
+        for name, data, mode in [
+            *[(path, data, 0o644) for path, data in inputs.items()],
+            (script_path, script.encode(), 0o755),
+            *[(path, data, 0o644) for path, data in extra_files or []],
+        ]:
+            info = tarfile.TarInfo(name=name)
+            info.size = len(data)
+            info.mode = mode
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(data))
+    return archive.getvalue()
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import random
+from datetime import datetime, timezone
+from functools import cache
+from typing import Optional, Set
+
+import loguru
+from app.background.broker import broker
+from app.core.exceptions import JobSchedulingError
+from app.core.settings import JobManagerSettings, settings
+from app.repository.job.queue import JobQueueRepository, get_job_queue_repository
+from app.repository.job.repository import JobRepository, get_job_repository
+from app.repository.job.schemas import JobStatus
+from app.repository.task.repository import TaskRepository, get_task_repository
+from app.services.job.runner import JobRunner, get_job_runner
+
+_job_manager_settings: JobManagerSettings = settings.job_manager_settings
+
+
+# ? Jobs wait in the pending queue until a slot frees up. A slot is taken when
+# ? a Job is admitted and released by the Job Manager once the Job is over,
+# ? so no more than `concurrent_jobs` Jobs run on the Docker hosts at once.
+class JobDispatcher:
+    """Starts pending Jobs while running slots are available."""
+
+    def __init__(
+        self,
+        job_runner: JobRunner = None,
+        job_repo: JobRepository = None,
+        task_repo: TaskRepository = None,
+        job_queue: JobQueueRepository = None,
+    ) -> None:
+        self._runner = job_runner or get_job_runner()
+        self._job_repo = job_repo or get_job_repository()
+        self._task_repo = task_repo or get_task_repository()
+        self._job_queue = job_queue or get_job_queue_repository()
+        self._logger = loguru.logger.bind(dispatcher=type(self))
+        self._wakeup = asyncio.Event()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._launches: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """Starts the dispatch loop."""
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run())
+            self._logger.info("Job dispatcher started.")
+
+    async def stop(self) -> None:
+        """Stops the dispatch loop and waits for in-flight launches."""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        await asyncio.gather(*self._launches, return_exceptions=True)
+        self._logger.info("Job dispatcher stopped.")
+
+    def notify(self) -> None:
+        """Wakes up the dispatch loop, e.g. after a Job was enqueued."""
+        self._wakeup.set()
+
+    async def request_dispatch(self) -> None:
+        """Asks a worker's dispatch loop to run now instead of on its next poll."""
+        await dispatch_jobs.kiq()
+
+    async def dispatch(self) -> int:
+        """Admits and launches pending Jobs while slots are available."""
+        await self._job_queue.promote_due_retries()
+        admitted = 0
+        while job_id := await self._job_queue.admit(
+            _job_manager_settings.concurrent_jobs,
+        ):
+            task = asyncio.create_task(self._launch(job_id))
+            self._launches.add(task)
+            task.add_done_callback(self._launches.discard)
+            admitted += 1
+        return admitted
+
+    # ? Slots are released by another process, so the queue is also polled.
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.dispatch()
+            except Exception as e:
+                self._logger.error(f"Error dispatching Jobs: {e}")
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    self._wakeup.wait(),
+                    _job_manager_settings.dispatch_interval,
+                )
+            self._wakeup.clear()
+
+    async def _launch(self, job_id: str) -> None:
+        job_logger = self._logger.bind(job_id=job_id)
+        try:
+            launched = await self._schedule_job(job_id)
+        except JobSchedulingError as e:
+            job_logger.error(str(e))
+            await self._job_queue.release(job_id)
+            await self._retry(job_id, job_logger)
+            return
+        if not launched:
+            await self._job_queue.release(job_id)
+            return
+        await self._job_queue.clear_attempts(job_id)
+        job_logger.info(f"Job '{job_id}' processed successfully.")
+
+    # ? Launches mostly fail while the Docker daemon is unavailable, so retries
+    # ? back off exponentially. The jitter spreads a burst of failed Jobs out
+    # ? so they do not all hit the daemon again at the same time.
+    async def _retry(self, job_id: str, job_logger: loguru.Logger) -> None:
+        attempt = await self._job_queue.record_attempt(job_id)
+        if attempt >= _job_manager_settings.retry_max_attempts:
+            await self._job_queue.bury(job_id)
+            await self._job_repo.update_status(job_id, JobStatus.FAILED)
+            job_logger.error(
+                f"Job '{job_id}' failed to launch {attempt} times. Giving up.",
+            )
+            return
+        backoff = min(
+            _job_manager_settings.retry_base_delay * 2 ** (attempt - 1),
+            _job_manager_settings.retry_max_delay,
+        )
+        delay = backoff * random.uniform(0.5, 1.0)  # noqa: S311
+        await self._job_queue.schedule_retry(job_id, delay)
+        job_logger.warning(
+            f"Retrying Job '{job_id}' in {delay:.1f}s (attempt {attempt + 1}).",
+        )
+
+    # ? Jobs that no longer exist or are not pending are dropped, and Jobs
+    # ? whose Task is gone cannot ever run, so none of them are retried.
+    async def _schedule_job(self, job_id: str) -> bool:
+        try:
+            job = await self._job_repo.get(job_id)
+            if not job or job.status != JobStatus.PENDING:
+                self._logger.warning(f"Job(id={job_id}) is not pending. Skipped.")
+                return False
+            task = await self._task_repo.get(job.task_id)
+            if not task:
+                self._logger.error(f"Task(id={job.task_id}) not found.")
+                await self._job_repo.update_status(job.id, JobStatus.FAILED)
+                return False
+
+            inputs = {}
+            if job.has_inputs:
+                inputs = await self._job_repo.get_inputs(job.id)
+                if inputs is None:
+                    self._logger.error(f"Inputs of Job(id={job.id}) expired.")
+                    await self._job_repo.update_status(job.id, JobStatus.FAILED)
+                    return False
+
+            # ? The Job is marked running first so a container that ends right
+            # ? away is never overwritten back to running, and so the watchdog
+            # ? deadline counts from the launch.
+            # ? The chosen Docker host is recorded along with it, so the Job
+            # ? Manager and the log streamer know which daemon to ask.
+            job.status = JobStatus.RUNNING
+            job.started_at = datetime.now(timezone.utc)
+            job.docker_host = await self._runner.place(task.resource_profile)
+            await self._job_repo.update(job)
+            try:
+                await self._runner.run(
+                    job.id,
+                    task.script,
+                    job.env_vars,
+                    task.resource_profile,
+                    job.docker_host,
+                    inputs,
+                )
+            except Exception:
+                await self._job_repo.update_status(job.id, JobStatus.PENDING)
+                raise
+            await self._job_repo.delete_inputs(job.id)
+            return True
+        except Exception as e:
+            raise JobSchedulingError(f"Job(id={job_id}): {e}") from e
+
+
+@broker.task
+async def dispatch_jobs() -> None:
+    """Wakes up the Job dispatcher of the worker running the task."""
+    get_job_dispatcher().notify()
+
+
+@cache
+def get_job_dispatcher() -> JobDispatcher:
+    """Returns the JobDispatcher, created on first use."""
+    return JobDispatcher()
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, Optional
+
+import loguru
+from app.core.docker.client import AsyncDockerClient
+from app.core.docker.fleet import DockerFleet, get_docker_fleet
+from app.core.docker.utils import get_container_name
+from app.core.exceptions import DockerHostUnavailableError, JobLogsNotAvailableError
+from app.core.settings import JobManagerSettings, settings
+from app.services.job.schema import LogEntry
+from docker.errors import DockerException
+from docker.models.containers import Container
+
+_job_manager_settings: JobManagerSettings = settings.job_manager_settings
+
+_STDOUT = "stdout"
+_STDERR = "stderr"
+
+
+class LogRingBuffer:
+    """Bounded in-memory buffer of a Job's log lines, addressed by offset."""
+
+    def __init__(self, max_lines: int) -> None:
+        self._entries: Deque[LogEntry] = deque(maxlen=max_lines)
+        self._next_offset = 0
+        self._changed = asyncio.Condition()
+        self.closed = False
+
+    async def append(self, stream: str, data: str) -> None:
+        """Appends a line and wakes up the readers."""
+        async with self._changed:
+            self._entries.append(
+                LogEntry(offset=self._next_offset, stream=stream, data=data),
+            )
+            self._next_offset += 1
+            self._changed.notify_all()
+
+    async def close(self) -> None:
+        """Marks the end of the log and wakes up the readers."""
+        async with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+    async def read(self, offset: int = 0) -> AsyncIterator[LogEntry]:
+        """
+        Yields lines from `offset` onwards until the log is closed.
+
+        Lines that already fell out of the buffer are skipped, so a reader
+        asking for an old offset resumes from the oldest line still kept.
+        """
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(
+                    lambda start=offset: self.closed or self._next_offset > start,
+                )
+                pending = [entry for entry in self._entries if entry.offset >= offset]
+                closed = self.closed
+            for entry in pending:
+                yield entry
+            if pending:
+                offset = pending[-1].offset + 1
+            if closed and not pending:
+                return
+
+
+class JobLogFollower:
+    """Follows a Job container's logs into a ring buffer shared by all viewers."""
+
+    def __init__(
+        self,
+        job_id: str,
+        container: Container,
+        docker_client: AsyncDockerClient,
+        on_closed: Callable[[JobLogFollower], None],
+    ) -> None:
+        self.job_id = job_id
+        self.buffer = LogRingBuffer(_job_manager_settings.log_stream_buffer_lines)
+        self.viewers = 0
+        self._container = container
+        self._docker = docker_client
+        self._on_closed = on_closed
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._partial: Dict[str, bytearray] = {
+            _STDOUT: bytearray(),
+            _STDERR: bytearray(),
+        }
+        self._logger = loguru.logger.bind(log_follower=type(self), job_id=job_id)
+
+    def start(self) -> None:
+        """Starts following the container logs in a background thread."""
+        self._loop = asyncio.get_running_loop()
+        threading.Thread(
+            target=self._follow,
+            name=f"buildbot-logs-{self.job_id}",
+            daemon=True,
+        ).start()
+
+    # ? The follow request blocks until the container exits, so it runs in
+    # ? its own thread instead of holding a slot of the Docker thread pool.
+    def _follow(self) -> None:
+        try:
+            for stdout, stderr in self._docker.demuxed_logs(
+                self._container,
+                follow=True,
+            ):
+                self._publish(_STDOUT, stdout)
+                self._publish(_STDERR, stderr)
+        except Exception as e:
+            self._logger.warning(f"Live log stream interrupted: {e}")
+        finally:
+            for stream, rest in self._partial.items():
+                if rest:
+                    self._emit(stream, bytes(rest))
+            asyncio.run_coroutine_threadsafe(self._close(), self._loop)
+
+    async def _close(self) -> None:
+        await self.buffer.close()
+        self._on_closed(self)
+
+    # ? The ring buffer bounds the number of lines, not their size, so output
+    # ? without newlines is cut into lines of at most `log_stream_max_line_length`.
+    # ? Only the unterminated rest of a line is kept between frames.
+    def _publish(self, stream: str, data: Optional[bytes]) -> None:
+        if not data:
+            return
+        partial = self._partial[stream]
+        *lines, rest = data.split(b"\n")
+        for line in lines:
+            partial += line
+            self._emit_split(stream, bytes(partial).removesuffix(b"\r"))
+            partial.clear()
+        partial += rest
+        max_length = _job_manager_settings.log_stream_max_line_length
+        if len(partial) >= max_length:
+            cut = len(partial) - len(partial) % max_length
+            self._emit_split(stream, bytes(partial[:cut]))
+            del partial[:cut]
+
+    def _emit_split(self, stream: str, line: bytes) -> None:
+        max_length = _job_manager_settings.log_stream_max_line_length
+        for start in range(0, max(len(line), 1), max_length):
+            self._emit(stream, line[start : start + max_length])
+
+    def _emit(self, stream: str, line: bytes) -> None:
+        asyncio.run_coroutine_threadsafe(
+            self.buffer.append(stream, line.decode("utf-8", errors="replace")),
+            self._loop,
+        ).result()
+
+
+# ? N viewers of the same Job share a single Docker log follower. Finished
+# ? followers are kept for `log_stream_linger` seconds so late viewers can
+# ? still replay the buffered lines.
+class JobLogStreamer:
+    """Serves live Job logs from per-Job ring buffers."""
+
+    def __init__(self, fleet: DockerFleet = None) -> None:
+        self._fleet = fleet or get_docker_fleet()
+        self._followers: Dict[str, JobLogFollower] = {}
+        self._lock = asyncio.Lock()
+        self._logger = loguru.logger.bind(log_streamer=type(self))
+
+    async def subscribe(
+        self,
+        job_id: str,
+        offset: int = 0,
+        host: Optional[str] = None,
+    ) -> AsyncIterator[LogEntry]:
+        """
+        Subscribes to a Job's live logs.
+
+        :param job_id: The ID of the Job.
+        :param offset: The offset of the first line to replay.
+        :param host: The Docker host running the Job.
+        :return: An async iterator over the Job's log lines.
+        :raises JobLogsNotAvailableError: If the Job has no container.
+        """
+        follower = await self._acquire(job_id, host)
+        return self._read(follower, offset)
+
+    async def _acquire(self, job_id: str, host: Optional[str]) -> JobLogFollower:
+        async with self._lock:
+            follower = self._followers.get(job_id)
+            if follower is None:
+                try:
+                    docker = await self._get_client(host)
+                    container = await docker.get_container(
+                        get_container_name(job_id),
+                    )
+                except (DockerException, DockerHostUnavailableError) as e:
+                    raise JobLogsNotAvailableError(job_id) from e
+                follower = JobLogFollower(
+                    job_id,
+                    container,
+                    docker,
+                    self._schedule_release,
+                )
+                follower.start()
+                self._followers[job_id] = follower
+                self._logger.info(f"Following live logs of Job '{job_id}'.")
+            follower.viewers += 1
+            return follower
+
+    # ? Daemons unreachable when the process started are connected on demand.
+    async def _get_client(self, host: Optional[str]) -> AsyncDockerClient:
+        try:
+            return self._fleet.get_client(host)
+        except DockerHostUnavailableError:
+            await self._fleet.connect()
+            return self._fleet.get_client(host)
+
+    async def _read(
+        self,
+        follower: JobLogFollower,
+        offset: int,
+    ) -> AsyncIterator[LogEntry]:
+        try:
+            async for entry in follower.buffer.read(offset):
+                yield entry
+        finally:
+            follower.viewers -= 1
+            self._schedule_release(follower)
+
+    def _schedule_release(self, follower: JobLogFollower) -> None:
+        if follower.buffer.closed and not follower.viewers:
+            asyncio.get_running_loop().call_later(
+                _job_manager_settings.log_stream_linger,
+                self._release,
+                follower,
+            )
+
+    def _release(self, follower: JobLogFollower) -> None:
+        if follower.viewers or self._followers.get(follower.job_id) is not follower:
+            return
+        del self._followers[follower.job_id]
+        self._logger.info(f"Released live logs of Job '{follower.job_id}'.")
+
+
+_log_streamer = JobLogStreamer()
+
+
+def get_log_streamer() -> JobLogStreamer:
+    """Returns the JobLogStreamer."""
+    return _log_streamer
@@ -0,0 +1,343 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import shlex
+import socket
+import uuid
+from collections import deque
+from functools import cache
+from typing import Any, Deque, Dict, List, Optional
+
+import loguru
+from app.core.docker.client import AsyncDockerClient, get_async_docker_client
+from app.core.docker.utils import Labels, get_container_name, get_job_id
+from app.core.settings import ContainerJobManagerSettings, ResourceProfile, settings
+from app.repository.job.pool import PoolStatsRepository, get_pool_stats_repository
+from app.services.job.archive import build_job_archive
+from docker.models.containers import Container
+from docker.models.images import Image
+
+_container_settings: ContainerJobManagerSettings = settings.job_manager_settings
+
+_ENV_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# ? Identifies the process filling a pool, as several workers and replicas
+# ? may share a Docker daemon.
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LatencyStats:
+    """Keeps the most recent latency samples and reports their percentiles."""
+
+    def __init__(self, max_samples: int) -> None:
+        self._samples: Deque[float] = deque(maxlen=max_samples)
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        """Records a latency sample."""
+        self._samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Returns the nearest-rank percentile of the kept samples, in seconds."""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = max(round(percent / 100 * len(ordered)) - 1, 0)
+        return ordered[min(rank, len(ordered) - 1)]
+
+    def dump(self) -> Dict[str, Any]:
+        """Returns the sample count and the kept samples, to be merged elsewhere."""
+        return {"count": self.count, "samples": list(self._samples)}
+
+    @classmethod
+    def merge(cls, dumps: List[Dict[str, Any]]) -> LatencyStats:
+        """Combines the dumped samples of several runners."""
+        stats = cls(max(sum(len(dump["samples"]) for dump in dumps), 1))
+        for dump in dumps:
+            for sample in dump["samples"]:
+                stats.add(sample)
+        stats.count = sum(dump["count"] for dump in dumps)
+        return stats
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """Returns the sample count with the p50 and p99 latencies in milliseconds."""
+        p50, p99 = self.percentile(50), self.percentile(99)
+        return {
+            "count": self.count,
+            "p50_ms": None if p50 is None else p50 * 1000,
+            "p99_ms": None if p99 is None else p99 * 1000,
+        }
+
+
+# ? A cold start pays for container creation, network setup and the shell
+# ? start-up. Warm containers are already running the pool command, so
+# ? claiming one only renames it and copies the Job files into its workdir.
+class WarmContainerPool:
+    """Keeps idle, started Job containers ready to be claimed by new Jobs."""
+
+    def __init__(
+        self,
+        docker_client: AsyncDockerClient = None,
+        size: Optional[int] = None,
+        stats_repo: PoolStatsRepository = None,
+    ) -> None:
+        self._docker = docker_client or get_async_docker_client()
+        self._stats_repo = stats_repo or get_pool_stats_repository()
+        self._report_task: Optional[asyncio.Task] = None
+        self._size = _container_settings.warm_pool_size if size is None else size
+        self._idle: Deque[Container] = deque()
+        self._creating = 0
+        self._image: Optional[Image] = None
+        # ? Mounts cannot change once a container exists, so warm containers
+        # ? only serve Jobs that use the default resource profile.
+        self._profile = _container_settings.get_resource_profile()
+        self._refill_task: Optional[asyncio.Task] = None
+        self._refill = asyncio.Event()
+        self._logger = loguru.logger.bind(warm_pool=type(self))
+        self.hits = 0
+        self.misses = 0
+        self.warm_starts = LatencyStats(_container_settings.start_latency_samples)
+        self.cold_starts = LatencyStats(_container_settings.start_latency_samples)
+
+    def report(self) -> Dict[str, Any]:
+        """Returns the pool counters and the start latency samples per start path."""
+        return {
+            "size": self._size,
+            "idle": len(self._idle),
+            "hits": self.hits,
+            "misses": self.misses,
+            "warm_start": self.warm_starts.dump(),
+            "cold_start": self.cold_starts.dump(),
+        }
+
+    # ? Jobs are started by the workers, while the statistics are served by
+    # ? the API, so every runner reports its pool to Redis periodically.
+    async def start_reporting(self) -> None:
+        """Starts reporting the pool statistics."""
+        if self._report_task is None:
+            self._report_task = asyncio.create_task(self._report())
+
+    async def stop_reporting(self) -> None:
+        """Stops reporting the pool statistics and withdraws the last report."""
+        if self._report_task is None:
+            return
+        self._report_task.cancel()
+        await asyncio.gather(self._report_task, return_exceptions=True)
+        self._report_task = None
+        try:
+            await self._stats_repo.remove(_OWNER)
+        except Exception as e:
+            self._logger.warning(f"Could not withdraw warm pool statistics: {e}")
+
+    @property
+    def reporting(self) -> bool:
+        """Whether this process runs Jobs and reports its pool."""
+        return self._report_task is not None
+
+    async def start(self, image: Image) -> None:
+        """Removes leftovers from a previous run and starts filling the pool."""
+        if self._size <= 0 or self._refill_task is not None:
+            return
+        self._image = image
+        await self._remove_all(
+            [
+                container
+                for container in await self._docker.list_containers(
+                    all=True,
+                    filters={"label": Labels.WARM_POOL},
+                )
+                if _is_leftover(container)
+            ],
+        )
+        self._refill_task = asyncio.create_task(self._run())
+        self._refill.set()
+        self._logger.info(f"Warm pool started with {self._size} containers.")
+
+    async def stop(self) -> None:
+        """Stops refilling the pool and removes the idle containers."""
+        if self._refill_task is None:
+            return
+        self._refill_task.cancel()
+        await asyncio.gather(self._refill_task, return_exceptions=True)
+        self._refill_task = None
+        idle = list(self._idle)
+        self._idle.clear()
+        await self._remove_all(idle)
+        self._logger.info("Warm pool stopped.")
+
+    async def claim(
+        self,
+        job_id: str,
+        script: str,
+        env_vars: Dict[str, str],
+        profile: ResourceProfile,
+        inputs: Optional[Dict[str, bytes]] = None,
+    ) -> Optional[Container]:
+        """
+        Hands an idle container over to a Job.
+
+        :param job_id: The ID of the Job.
+        :param script: The script to run.
+        :param env_vars: The Job environment variables.
+        :param profile: The resource profile the Job must run with.
+        :param inputs: The Job input files, by path relative to the workdir.
+        :return: The claimed container, or None if the Job needs a cold start.
+        """
+        if (
+            not self._idle
+            or profile != self._profile
+            or not all(_ENV_NAME.match(name) for name in env_vars)
+        ):
+            self.misses += 1
+            return None
+        container = self._idle.popleft()
+        self._refill.set()
+        try:
+            await self._docker.rename_container(container, get_container_name(job_id))
+            await self._docker.put_archive(
+                container,
+                f"/{_container_settings.workdir}",
+                self._build_job_archive(script, env_vars, inputs or {}),
+            )
+            exit_code = await self._docker.exec_run(
+                container,
+                _container_settings.get_pool_start_command(),
+            )
+            if exit_code != 0:
+                raise RuntimeError(f"start command exited with code {exit_code}")
+        except Exception as e:
+            self._logger.bind(job_id=job_id).warning(
+                f"Could not claim warm container '{container.name}': {e}",
+            )
+            self.misses += 1
+            await self._remove_all([container])
+            return None
+        self.hits += 1
+        return container
+
+    async def _report(self) -> None:
+        while True:
+            try:
+                await self._stats_repo.save(_OWNER, self.report())
+            except Exception as e:
+                self._logger.error(f"Error reporting warm pool statistics: {e}")
+            await asyncio.sleep(_container_settings.heartbeat_interval)
+
+    async def _run(self) -> None:
+        while True:
+            await self._refill.wait()
+            self._refill.clear()
+            missing = self._size - len(self._idle) - self._creating
+            if missing > 0:
+                await asyncio.gather(*[self._add() for _ in range(missing)])
+
+    async def _add(self) -> None:
+        self._creating += 1
+        try:
+            container = await self._docker.run_container(
+                name=f"buildbotpool-{uuid.uuid4().hex}",
+                image=self._image,
+                command=_container_settings.get_pool_command(),
+                labels={
+                    Labels.JOB_ID: "",
+                    Labels.WARM_POOL: "true",
+                    Labels.POOL_OWNER: _OWNER,
+                },
+                **_container_settings.config,
+                **self._profile.config,
+            )
+            self._idle.append(container)
+        except Exception as e:
+            self._logger.error(f"Error starting warm container: {e}")
+        finally:
+            self._creating -= 1
+
+    async def _remove_all(self, containers: List[Container]) -> None:
+        await asyncio.gather(
+            *[
+                self._docker.remove_container(container, force=True)
+                for container in containers
+            ],
+            return_exceptions=True,
+        )
+
+    # ? The Job only runs once its start FIFO is opened, after the archive is
+    # ? extracted, so the script, its inputs and its environment are in place.
+    def _build_job_archive(
+        self,
+        script: str,
+        env_vars: Dict[str, str],
+        inputs: Dict[str, bytes],
+    ) -> bytes:
+        script_path, env_path = _container_settings.pool_files
+        env = "".join(
+            f"{name}={shlex.quote(value)}\n" for name, value in env_vars.items()
+        )
+        return build_job_archive(
+            script,
+            inputs,
+            script_path,
+            [(env_path, env.encode())],
+        )
+
+
+# ? A claimed container keeps its labels and is only renamed after its Job,
+# ? so it is running that Job and must be left alone. Idle containers are
+# ? only removed when the process that started them is gone, as other
+# ? workers and replicas keep their own pools on the same daemon.
+def _is_leftover(container: Container) -> bool:
+    if get_job_id(container) is not None:
+        return False
+    attrs = container.attrs
+    labels = attrs.get("Labels") or attrs.get("Config", {}).get("Labels") or {}
+    host, _, pid = (labels.get(Labels.POOL_OWNER) or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    return int(pid) == os.getpid() or not _is_alive(int(pid))
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@cache
+def get_warm_pool() -> WarmContainerPool:
+    """Returns the WarmContainerPool, created on first use."""
+    return WarmContainerPool()
+
+
+async def get_pool_stats() -> Dict[str, Any]:
+    """
+    Returns the warm pool statistics of every runner that reported lately.
+
+    Counters are summed and the latency percentiles are computed over the
+    samples kept by all the runners. The pool of this process, if it runs
+    Jobs, is counted as it is now rather than as last reported.
+    """
+    pool = get_warm_pool()
+    reports = await get_pool_stats_repository().get_all(
+        _container_settings.heartbeat_ttl,
+    )
+    if pool.reporting:
+        reports[_OWNER] = pool.report()
+    return {
+        **{
+            name: sum(report[name] for report in reports.values())
+            for name in ["size", "idle", "hits", "misses"]
+        },
+        **{
+            name: LatencyStats.merge(
+                [report[name] for report in reports.values()],
+            ).summary()
+            for name in ["warm_start", "cold_start"]
+        },
+    }
@@ -1,78 +1,226 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import math
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
 from abc import ABC, abstractmethod
-from typing import Dict
+from functools import cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
 import loguru
-from app.core.docker.utils import Labels, get_docker_client
-from app.core.settings import ContainerJobManagerSettings, settings
-from docker import DockerClient
+from app.background.job_manager.process import (
+    ProcessJobManager,
+    get_process_manager,
+)
+from app.core.docker.client import AsyncDockerClient
+from app.core.docker.fleet import DockerFleet, get_docker_fleet
+from app.core.docker.utils import Labels, get_container_name
+from app.core.enums import JobManagerType
+from app.core.settings import (
+    ContainerJobManagerSettings,
+    ProcessJobManagerSettings,
+    ResourceProfile,
+    settings,
+)
+from app.services.job.archive import build_job_archive
+from app.services.job.pool import WarmContainerPool, get_warm_pool
 from docker.errors import ImageNotFound
 from docker.models.images import Image
-
-from buildbot.app.core.enums import JobManagerType
+from docker.utils import parse_bytes
 
 _container_settings: ContainerJobManagerSettings = settings.job_manager_settings
+_process_settings: ProcessJobManagerSettings = settings.job_manager_settings
+
+# ? A Job process first waits for a line on stdin, which is only written once
+# ? its resource limits are set, and then runs its command without stdin.
+_GATE_SCRIPT = 'read -r _; exec "$@" < /dev/null'
 
 
 class JobRunner(ABC):
     """Job Runner interface."""
 
     @abstractmethod
-    async def run(self, job_id: str, script: str, env_vars: Dict[str, str]) -> None:
+    async def run(
+        self,
+        job_id: str,
+        script: str,
+        env_vars: Dict[str, str],
+        resource_profile: Optional[str] = None,
+        host: Optional[str] = None,
+        inputs: Optional[Dict[str, bytes]] = None,
+    ) -> None:
         """Runs a Job."""
 
+    @abstractmethod
+    async def place(self, resource_profile: Optional[str] = None) -> Optional[str]:
+        """Chooses the host a Job runs on."""
+
     @abstractmethod
     async def startup(self) -> None:
         """Starts the Job Runner."""
 
+    @abstractmethod
+    async def shutdown(self) -> None:
+        """Stops the Job Runner."""
+
 
 class ContainerJobRunner(JobRunner):
     """Runs Jobs in Docker containers asynchronously."""
 
-    def __init__(self, docker_client: DockerClient = None) -> None:
-        self._client = docker_client or get_docker_client()
+    def __init__(
+        self,
+        fleet: DockerFleet = None,
+        warm_pool: WarmContainerPool = None,
+    ) -> None:
+        self._fleet = fleet or get_docker_fleet()
+        self._pool = warm_pool or get_warm_pool()
+        self._images: Dict[str, asyncio.Task] = {}
+        self._prepare_task: Optional[asyncio.Task] = None
         self._logger = loguru.logger.bind(job_runner=type(self))
 
-    async def run(self, job_id: str, script: str, env_vars: dict) -> str:
-        """Runs a Task in a Docker container asynchronously."""
+    async def run(
+        self,
+        job_id: str,
+        script: str,
+        env_vars: dict,
+        resource_profile: Optional[str] = None,
+        host: Optional[str] = None,
+        inputs: Optional[Dict[str, bytes]] = None,
+    ) -> str:
+        """Runs a Task in a warm container, or in a new one if none is idle."""
         try:
             job_logger = self._logger.bind(job_id=job_id)
-            job_logger.info(f"Running job '{job_id}' in Docker container.")
-            command = _container_settings.get_command(
+            started_at = time.monotonic()
+            host = host or self._fleet.default
+            inputs = inputs or {}
+            profile = _container_settings.get_resource_profile(resource_profile)
+            # ? The warm pool lives on the default host only.
+            if host == self._fleet.default and await self._pool.claim(
+                job_id,
                 script,
+                env_vars,
+                profile,
+                inputs,
+            ):
+                self._pool.warm_starts.add(time.monotonic() - started_at)
+                job_logger.info(f"Running job '{job_id}' in a warm Docker container.")
+                return job_id
+
+            job_logger.info(f"Running job '{job_id}' in Docker container on '{host}'.")
+            await self._run_container(
+                self._fleet.get_client(host),
+                job_id,
+                await self._get_image(host),
+                build_job_archive(script, inputs, _container_settings.script_path),
+                env_vars,
+                profile,
             )
-            _ = self._client.containers.run(
-                name=f"buildbotjob-{job_id}",
-                image=self._get_image(),
-                command=command,
-                hostname=job_id,
-                environment=env_vars,
-                labels={Labels.JOB_ID: job_id},
-                **_container_settings.config,
-            )
+            self._pool.cold_starts.add(time.monotonic() - started_at)
             return job_id
         except Exception as e:
             job_logger.error(f"Error starting job '{job_id}': {e}")
             raise
 
-    def startup(self) -> None:
+    # ? The script and inputs are uploaded into the created container before
+    # ? it starts, so they never go through the command line. A container
+    # ? that could not be started is removed so a retry can reuse its name.
+    async def _run_container(
+        self,
+        docker: AsyncDockerClient,
+        job_id: str,
+        image: Image,
+        archive: bytes,
+        env_vars: Dict[str, str],
+        profile: ResourceProfile,
+    ) -> None:
+        container = await docker.create_container(
+            name=get_container_name(job_id),
+            image=image,
+            command=_container_settings.get_command(),
+            hostname=job_id,
+            environment=env_vars,
+            labels={Labels.JOB_ID: job_id},
+            **_container_settings.create_config,
+            **profile.config,
+        )
+        try:
+            await docker.put_archive(
+                container,
+                f"/{_container_settings.workdir}",
+                archive,
+            )
+            await docker.start_container(container)
+        except Exception:
+            with contextlib.suppress(Exception):
+                await docker.remove_container(container, force=True)
+            raise
+
+    async def place(self, resource_profile: Optional[str] = None) -> str:
+        """Chooses the Docker host with the most free capacity."""
+        return await self._fleet.place()
+
+    async def startup(self) -> None:
         """Starts the Job Runner."""
         self._logger.info("Starting job runner...")
-        self._client.ping()
+        await self._fleet.get_client().ping()
+        await self._fleet.connect()
         self._logger.info("Docker API is ready.")
-        self._logger.info("Building Runner Container Image...")
-        _ = self._get_image()
+        await self._pool.start_reporting()
+        self._prepare_task = asyncio.create_task(self._prepare())
         self._logger.info("Job runner started.")
 
-    def _get_image(self) -> Image:
+    async def shutdown(self) -> None:
+        """Stops the Job Runner, removing its idle warm containers."""
+        for task in (self._prepare_task, *self._images.values()):
+            if task is not None and not task.done():
+                task.cancel()
+        await self._pool.stop()
+        await self._pool.stop_reporting()
+        self._logger.info("Job runner stopped.")
+
+    # ? The image is built in the background so the API does not wait on
+    # ? `docker build`. Jobs dispatched meanwhile wait for the same build.
+    # ? Every host needs its own copy of the image.
+    async def _prepare(self) -> None:
+        try:
+            self._logger.info("Building Runner Container Image...")
+            hosts = list(self._fleet.clients)
+            images = await asyncio.gather(
+                *[self._get_image(host) for host in hosts],
+                return_exceptions=True,
+            )
+            for host, image in zip(hosts, images):
+                if isinstance(image, Exception):
+                    self._logger.error(f"Error preparing image on '{host}': {image}")
+                elif host == self._fleet.default:
+                    await self._pool.start(image)
+        except Exception as e:
+            self._logger.error(f"Error preparing job runner: {e}")
+
+    async def _get_image(self, host: str) -> Image:
+        image = self._images.get(host)
+        if image is None or (image.done() and (image.cancelled() or image.exception())):
+            image = asyncio.create_task(
+                self._get_or_build_image(self._fleet.get_client(host)),
+            )
+            self._images[host] = image
+        return await asyncio.shield(image)
+
+    async def _get_or_build_image(self, docker: AsyncDockerClient) -> Image:
+        tag = _container_settings.get_image_tag()
         try:
-            self._logger.info("Checking for existing Docker image.")
-            return self._client.images.get(_container_settings.image_tag)
+            self._logger.info(f"Checking for existing Docker image '{tag}'.")
+            return await docker.get_image(tag)
         except ImageNotFound:
             self._logger.warning("Image not found. Building new image.")
             try:
-                image, build_logs = self._client.images.build(
+                image, build_logs = await docker.build_image(
                     **_container_settings.image_config,
                 )
                 for line in build_logs:
@@ -83,13 +231,181 @@ class ContainerJobRunner(JobRunner):
                 raise
 
 
-_container_runner = ContainerJobRunner()
+# ? Starting a container dominates the runtime of small scripts. Trusted Jobs
+# ? can instead run as local processes, in their own temporary workdir, with
+# ? a minimal environment and resource limits. Where unprivileged user
+# ? namespaces are allowed, they also get their own PID, mount, network, IPC
+# ? and UTS namespaces. Resource limits cannot bound a process tree's CPU share
+# ? or process count, so a profile's CPUs become a CPU time budget over the Job
+# ? timeout and its process limit is not enforced.
+class ProcessJobRunner(JobRunner):
+    """Runs Jobs as local subprocesses."""
+
+    def __init__(self, job_manager: ProcessJobManager = None) -> None:
+        self._manager = job_manager or get_process_manager()
+        self._isolated = False
+        self._logger = loguru.logger.bind(job_runner=type(self))
+
+    async def run(
+        self,
+        job_id: str,
+        script: str,
+        env_vars: dict,
+        resource_profile: Optional[str] = None,
+        host: Optional[str] = None,
+        inputs: Optional[Dict[str, bytes]] = None,
+    ) -> str:
+        """Runs a Task in a new subprocess."""
+        job_logger = self._logger.bind(job_id=job_id)
+        started_at = time.monotonic()
+        workdir = Path(
+            tempfile.mkdtemp(
+                prefix=f"buildbot-{job_id}-",
+                dir=_process_settings.workdir_root,
+            ),
+        )
+        try:
+            for path, content in (inputs or {}).items():
+                input_path = workdir / path
+                input_path.parent.mkdir(parents=True, exist_ok=True)
+                input_path.write_bytes(content)
+            script_path = workdir / _process_settings.script_path
+            script_path.write_text(script)
+            script_path.chmod(0o700)
+            limits = _get_rlimits(
+                _process_settings.get_resource_profile(resource_profile),
+            )
+            command = _process_settings.get_command()
+            if self._isolated:
+                command = [*_process_settings.unshare_command, *command]
+            process = await asyncio.to_thread(
+                _spawn,
+                [
+                    _process_settings.shell,
+                    "-c",
+                    _GATE_SCRIPT,
+                    _process_settings.shell,
+                    *command,
+                ],
+                limits,
+                cwd=workdir,
+                env={
+                    **_process_settings.base_env,
+                    "HOME": str(workdir),
+                    **env_vars,
+                },
+            )
+        except Exception as e:
+            shutil.rmtree(workdir, ignore_errors=True)
+            job_logger.error(f"Error starting job '{job_id}': {e}")
+            raise
+        self._manager.track(job_id, process, workdir)
+        job_logger.info(
+            f"Running job '{job_id}' as process {process.pid} "
+            f"(started in {(time.monotonic() - started_at) * 1000:.1f}ms).",
+        )
+        return job_id
+
+    async def place(self, resource_profile: Optional[str] = None) -> None:
+        """Jobs always run on the local machine."""
+        return
+
+    async def startup(self) -> None:
+        """Starts the Job Runner, checking whether Jobs can be isolated."""
+        self._logger.info("Starting job runner...")
+        self._isolated = _process_settings.isolate and await self._can_unshare()
+        if _process_settings.isolate and not self._isolated:
+            self._logger.warning(
+                "Namespaces are not available. Jobs will run unisolated.",
+            )
+        await self._manager.start()
+        self._logger.info("Job runner started.")
+
+    async def shutdown(self) -> None:
+        """Stops the Job Runner, killing the running Jobs."""
+        await self._manager.stop()
+        self._logger.info("Job runner stopped.")
+
+    async def _can_unshare(self) -> bool:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *_process_settings.unshare_command,
+                "true",
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError:
+            return False
+        return await process.wait() == 0
+
+
+def _get_rlimits(profile: ResourceProfile) -> List[Tuple[int, int]]:
+    limits = [
+        (resource.RLIMIT_AS, parse_bytes(profile.memory)),
+        (
+            resource.RLIMIT_CPU,
+            math.ceil(profile.cpus * _process_settings.job_timeout),
+        ),
+        (resource.RLIMIT_FSIZE, _process_settings.max_file_size),
+        (resource.RLIMIT_NOFILE, _process_settings.max_open_files),
+        (resource.RLIMIT_CORE, 0),
+    ]
+    # ? Limits can only be lowered, so they are capped to the current hard limits.
+    return [
+        (
+            limit,
+            (
+                value
+                if (hard := resource.getrlimit(limit)[1]) == resource.RLIM_INFINITY
+                else min(value, hard)
+            ),
+        )
+        for limit, value in limits
+    ]
+
+
+# ? `preexec_fn` may deadlock the child of a process running threads, so
+# ? the limits are set from the outside while the child waits at its gate.
+# ? They are inherited by everything it runs.
+def _spawn(
+    command: List[str],
+    limits: List[Tuple[int, int]],
+    **kwargs: Any,
+) -> subprocess.Popen:
+    process = subprocess.Popen(  # noqa: S603
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+        **kwargs,
+    )
+    try:
+        for limit, value in limits:
+            resource.prlimit(process.pid, limit, (value, value))
+        process.stdin.write(b"\n")
+        process.stdin.close()
+        process.stdin = None
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    return process
+
+
+# ? Runners are created on first use, so a deployment never sets up the
+# ? runners, Docker clients and settings of the types it does not use.
+@cache
+def _create_job_runner(job_manager_type: JobManagerType) -> JobRunner:
+    if job_manager_type == JobManagerType.CONTAINER:
+        return ContainerJobRunner()
+    if job_manager_type == JobManagerType.PROCESS:
+        return ProcessJobRunner()
+    raise NotImplementedError(f"Unsupported job manager type: {job_manager_type}")
 
 
 def get_job_runner(
     job_manager_type: JobManagerType = _container_settings.type,
 ) -> JobRunner:
     """Returns a JobRunner instance."""
-    if job_manager_type == JobManagerType.CONTAINER:
-        return _container_runner
-    raise NotImplementedError(f"Unsupported job manager type: {job_manager_type}")
+    return _create_job_runner(job_manager_type)
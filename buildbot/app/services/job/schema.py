@@ -1,11 +1,50 @@
+import base64
+import binascii
+from pathlib import PurePosixPath
 from typing import Dict
 
+from app.core.settings import settings
 from pydantic import BaseModel, field_validator
 
 
-@field_validator("task_id", mode="before")
 class JobDTO(BaseModel):
     """Job request model."""
 
     task_id: str
     env_vars: Dict[str, str] = {}
+    inputs: Dict[str, str] = {}
+    """Base64-encoded input files, by path relative to the Job workdir"""
+
+    @field_validator("inputs")
+    @classmethod
+    def validate_inputs(cls, inputs: Dict[str, str]) -> Dict[str, str]:
+        """Checks the input paths and the total size of the input files."""
+        job_manager_settings = settings.job_manager_settings
+        size = 0
+        for path, data in inputs.items():
+            parts = PurePosixPath(path).parts
+            if (
+                not parts
+                or PurePosixPath(path).is_absolute()
+                or ".." in parts
+                or parts[0] == job_manager_settings.script_path
+                or parts[0].startswith(".buildbot")
+            ):
+                raise ValueError(f"Invalid input path '{path}'.")
+            try:
+                size += len(base64.b64decode(data, validate=True))
+            except binascii.Error as e:
+                raise ValueError(f"Input '{path}' is not valid base64.") from e
+        if size > job_manager_settings.max_input_size:
+            raise ValueError(
+                f"Inputs exceed {job_manager_settings.max_input_size} bytes.",
+            )
+        return inputs
+
+
+class LogEntry(BaseModel):
+    """A line of a Job's live log stream."""
+
+    offset: int
+    stream: str
+    data: str
@@ -1,25 +1,34 @@
-from io import BytesIO
 from pathlib import Path
+from typing import AsyncIterator
 
+from app.core.compression import EXTENSIONS, MEDIA_TYPES, create_compressor
 from app.core.exceptions import (
     JobCreationError,
     JobFailedError,
+    JobNotCompletedError,
     JobNotFoundError,
     JobOutputNotFoundError,
-    JobSchedulingError,
+    JobQueueFullError,
+    JobUsageNotFoundError,
     TaskNotFoundError,
 )
+from app.core.settings import ArtifactStorageSettings, JobManagerSettings, settings
+from app.core.streams import stream_tar
+from app.repository.job.queue import JobQueueRepository, get_job_queue_repository
 from app.repository.job.repository import JobRepository, get_job_repository
-from app.repository.job.schemas import Job, JobStatus
-from app.repository.task.schemas import Task
-from app.services.job.runner import JobRunner, get_job_runner
-from app.services.job.schema import JobDTO
-from app.services.storage import StorageService, get_storage_service
+from app.repository.job.schemas import Job, JobStatus, JobUsage
+from app.services.job.dispatcher import JobDispatcher, get_job_dispatcher
+from app.services.job.logs import JobLogStreamer, get_log_streamer
+from app.services.job.schema import JobDTO, LogEntry
+from app.services.storage import StorageService, StoredFile, get_storage_service
 from app.services.task.service import TaskService
 from fastapi import Depends
 from fastapi.responses import StreamingResponse
 from loguru import logger
 
+_job_manager_settings: JobManagerSettings = settings.job_manager_settings
+_storage_settings: ArtifactStorageSettings = settings.artifact_storage_settings
+
 
 class JobService:
     """Service for Job operations."""
@@ -28,13 +37,17 @@ class JobService:
         self,
         task_svc: TaskService = Depends(),
         job_repo: JobRepository = Depends(get_job_repository),
-        job_runner: JobRunner = Depends(get_job_runner),
+        job_queue: JobQueueRepository = Depends(get_job_queue_repository),
+        dispatcher: JobDispatcher = Depends(get_job_dispatcher),
         storage_service: StorageService = Depends(get_storage_service),
+        log_streamer: JobLogStreamer = Depends(get_log_streamer),
     ) -> None:
         self._logger = logger
+        self._log_streamer = log_streamer
         self._storage_svc = storage_service
         self._job_repo = job_repo
-        self._runner = job_runner
+        self._job_queue = job_queue
+        self._dispatcher = dispatcher
         self._task_svc = task_svc
 
     async def create(self, job_dto: JobDTO) -> str:
@@ -44,17 +57,30 @@ class JobService:
         :param job_dto: The JobDTO
         :return: The ID of the created Job
         :raises JobCreationError: If the Job cannot be created
+        :raises JobQueueFullError: If the pending Job queue is full
         :raises UnexpectedException: If an unexpected error occurs
         """
         try:
-            task = await self._task_svc.get(job_dto.task_id)
-            job = Job(task_id=job_dto.task_id, env_vars=job_dto.env_vars)
-            job_id = await self._job_repo.create(job)
-            await self._schedule_job(job, task)
-            return job_id
+            await self._task_svc.get(job_dto.task_id)
         except TaskNotFoundError as e:
             raise JobCreationError(job_dto.task_id) from e
 
+        job = Job(
+            task_id=job_dto.task_id,
+            env_vars=job_dto.env_vars,
+        )
+        job_id = await self._job_repo.create(job, job_dto.inputs)
+        if not await self._job_queue.push(
+            job_id,
+            _job_manager_settings.max_queue_depth,
+        ):
+            await self._job_repo.delete(job_id)
+            raise JobQueueFullError(_job_manager_settings.queue_retry_after)
+
+        self._logger.info(f"Job '{job_id}' queued.")
+        await self._dispatcher.request_dispatch()
+        return job_id
+
     async def get_status(self, job_id: str) -> JobStatus:
         """
         Retrieve the status of a Job.
@@ -68,15 +94,40 @@ class JobService:
             raise JobNotFoundError(job_id)
         return job.status
 
-    async def get_output(self, job_id: str, file_path: str) -> StreamingResponse:
+    async def get_usage(self, job_id: str) -> JobUsage:
+        """
+        Retrieve the resource usage of a Job.
+
+        :param job_id: The ID of the Job
+        :return: The resource usage of the Job
+        :raises JobNotFoundError: If the Job is not found.
+        :raises JobNotCompletedError: If the Job has not ended yet.
+        :raises JobUsageNotFoundError: If no usage sample was taken of the Job.
+        """
+        job = await self._job_repo.get(job_id)
+        if not job:
+            raise JobNotFoundError(job_id)
+        if job.usage is None:
+            raise JobNotCompletedError(job_id, job.status)
+        if job.usage.samples == 0:
+            raise JobUsageNotFoundError(job_id)
+        return job.usage
+
+    async def get_output(
+        self,
+        job_id: str,
+        file_path: str,
+        archive: bool = False,
+    ) -> StreamingResponse:
         """
         Retrieve a file from a Job's output.
 
         :param job_id: The ID of the Job
         :param file_path: The path to the file within the Job's output
-        :return: The contents of the file
+        :param archive: Whether to wrap the file into a .tar.gz archive
+        :return: The contents of the file, streamed from storage
         :raises JobNotFoundError: If the Job was not found.
-        :raises JobNotCompletedError: If the Job has failed.
+        :raises JobFailedError: If the Job has failed.
         :raises JobNotCompletedError: If the Job is not completed.
         """
         job = await self._job_repo.get(job_id)
@@ -86,35 +137,61 @@ class JobService:
 
         if job.status != JobStatus.SUCCEEDED:
             if job.status == JobStatus.FAILED:
-                raise Job(job_id)
-            raise JobFailedError(job_id, job.status)
-
-        tar_stream = self._get_job_output(job_id, file_path)
+                raise JobFailedError(job_id)
+            raise JobNotCompletedError(job_id, job.status)
+
+        output = await self._get_job_output(job_id, file_path)
+        if archive:
+            extension = EXTENSIONS[_storage_settings.codec]
+            return StreamingResponse(
+                stream_tar(
+                    output.name,
+                    output.size,
+                    output.chunks,
+                    create_compressor(),
+                ),
+                media_type=MEDIA_TYPES[_storage_settings.codec],
+                headers={
+                    "Content-Disposition": (
+                        f"attachment; filename={job_id}.tar{extension}"
+                    ),
+                },
+            )
         return StreamingResponse(
-            tar_stream,
-            media_type="application/gzip",
-            headers={"Content-Disposition": f"attachment; filename={job_id}.tar.gz"},
+            output,
+            media_type="application/octet-stream",
+            headers={
+                "Content-Disposition": f'attachment; filename="{output.name}"',
+                "Content-Length": str(output.size),
+            },
         )
 
-    def _get_job_output(self, job_id: str, file_path: Path) -> BytesIO:
+    async def stream_logs(
+        self,
+        job_id: str,
+        offset: int = 0,
+    ) -> AsyncIterator[LogEntry]:
+        """
+        Stream a Job's live logs.
+
+        :param job_id: The ID of the Job
+        :param offset: The offset of the first log line to replay
+        :return: An async iterator over the Job's log lines
+        :raises JobNotFoundError: If the Job was not found.
+        :raises JobLogsNotAvailableError: If the Job is not running.
+        """
+        job = await self._job_repo.get(job_id)
+        if not job:
+            raise JobNotFoundError(job_id)
+        return await self._log_streamer.subscribe(job_id, offset, job.docker_host)
+
+    async def _get_job_output(self, job_id: str, file_path: Path) -> StoredFile:
         try:
             target = Path(file_path)
-            return self._storage_svc.download(job_id, target)
+            return await self._storage_svc.download(job_id, target)
         except FileNotFoundError as e:
             raise JobOutputNotFoundError(job_id, file_path) from e
 
-    async def _schedule_job(self, job: Job, task: Task) -> None:
-        try:
-            self._logger.info(f"Processing job '{job.id}'.")
-
-            await self._runner.run(job.id, task.script, job.env_vars)
-            await self._job_repo.update_status(job.id, JobStatus.RUNNING)
-
-            self._logger.info(f"Job '{job.id}' processed successfully.")
-
-        except Exception as e:
-            raise JobSchedulingError from e
-
 
 async def get_job_service() -> JobService:
     """Get the JobService."""
@@ -1,17 +1,91 @@
+import asyncio
+import contextlib
+import gzip
+import hashlib
+import os
+import shutil
 import tarfile
+import tempfile
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from io import BytesIO
-from pathlib import Path
-from typing import Generator, Union
+from pathlib import Path, PurePosixPath
+from typing import (
+    IO,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    NoReturn,
+    Optional,
+    Union,
+)
 
 import aiofiles
+import aiofiles.os
+from app.core.enums import StorageType
+from app.core.exceptions import ArtifactCorruptedError
 from app.core.settings import JobManagerSettings, settings
+from app.core.streams import AsyncIteratorReader, iterate_in_thread
 from app.core.utils import AbstractSingletonMeta
 from loguru import logger
+from pydantic import BaseModel
+
+try:
+    import boto3
+    from botocore.config import Config
+    from botocore.exceptions import ClientError
+except ImportError:  # pragma: no cover
+    boto3 = None
 
 _CHUNK_SIZE = 1024 * 1024
+_MAX_HEADER_SIZE = 8**11
+_GZIP_MAGIC = b"\x1f\x8b"
 _job_manager_settings: JobManagerSettings = settings.job_manager_settings
 _artifact_path_template: str = _job_manager_settings.artifact_path_template
+_legacy_artifact_path_template: str = (
+    _job_manager_settings.legacy_artifact_path_template
+)
+_artifact_index_path_template: str = _job_manager_settings.artifact_index_path_template
+_artifact_manifest_path_template: str = (
+    _job_manager_settings.artifact_manifest_path_template
+)
+_objects_path_template: str = "{job_id}/objects"
+
+
+class ArtifactMember(BaseModel):
+    """Location of a file within a Job artifact."""
+
+    offset: int
+    """Offset of the file content within the stored object"""
+
+    size: int
+    """Size of the file in bytes"""
+
+    sha256: str
+    """SHA-256 checksum of the file content"""
+
+
+class StoredFile:
+    """A stored file, read in chunks as it is iterated."""
+
+    def __init__(self, name: str, size: int, chunks: AsyncIterator[bytes]) -> None:
+        self.name = name
+        self.size = size
+        self.chunks = chunks
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self.chunks
+
+
+class ArtifactIndex(BaseModel):
+    """Index of the files of a Job artifact, by path relative to the workdir."""
+
+    members: Dict[str, ArtifactMember] = {}
 
 
 class StorageService(ABC):
@@ -21,27 +95,55 @@ class StorageService(ABC):
     async def upload(
         self,
         file_path: str,
-        stream: Union[bytes, BytesIO, Generator[bytes, None, None]],
+        stream: Union[
+            bytes,
+            BytesIO,
+            Generator[bytes, None, None],
+            AsyncIterator[bytes],
+        ],
     ) -> str:
         """Uploads a file to the storage service."""
 
+    @abstractmethod
+    async def upload_artifact(
+        self,
+        job_id: str,
+        stream: Union[
+            bytes,
+            BytesIO,
+            Generator[bytes, None, None],
+            AsyncIterator[bytes],
+        ],
+    ) -> str:
+        """
+        Uploads a Job's workdir archive along with the index of its files.
+
+        :param job_id: The job ID.
+        :param stream: The uncompressed tar archive of the Job workdir.
+        :return: The location of the stored artifact.
+        """
+
     @abstractmethod
     async def download(
         self,
         job_id: str,
         file_path: Path,
-    ) -> Union[bytes, BytesIO, Generator[bytes, None, None]]:
+    ) -> StoredFile:
         """
-        Downloads a file as a .tar.gz from the storage service..
+        Downloads a file of a Job's artifact from the storage service.
 
         :param job_id: The job ID.
-        :param file_path: The path to the file.
-        :return: A BytesIO object containing the file content.
+        :param file_path: The path to the file within the Job workdir.
+        :return: The file, streamed in chunks as it is iterated.
         :raises FileNotFoundError: If the file is not found.
         """
 
     @abstractmethod
-    async def exists(self, job_id: str, file_path: Path) -> bool:
+    async def delete_artifact(self, job_id: str) -> None:
+        """Deletes a Job's artifact from the storage service."""
+
+    @abstractmethod
+    async def exists(self, file_path: Path) -> bool:
         """Checks if a file exists in the storage service."""
 
 
@@ -55,9 +157,19 @@ class LocalStorageService(StorageService, metaclass=AbstractSingletonMeta):
     async def upload(
         self,
         file_path: Path,
-        stream: Union[bytes, BytesIO, Generator[bytes, None, None]],
+        stream: Union[
+            bytes,
+            BytesIO,
+            Generator[bytes, None, None],
+            AsyncIterator[bytes],
+        ],
     ) -> str:
-        """Uploads a file to the local storage, supporting bytes, BytesIO, and generators of bytes."""
+        """
+        Uploads a file to the local storage.
+
+        Supports bytes, file objects, and sync or async iterators of bytes. Chunks are
+        written as they arrive, so memory use does not depend on the file size.
+        """
         try:
             full_path = self._volume / file_path
             self._logger.debug(
@@ -65,17 +177,11 @@ class LocalStorageService(StorageService, metaclass=AbstractSingletonMeta):
             )
             self._logger.info(f"Uploading '{full_path}' to local storage.")
 
-            full_path.parent.mkdir(parents=True, exist_ok=True)
+            await aiofiles.os.makedirs(full_path.parent, exist_ok=True)
 
             async with aiofiles.open(full_path, "wb") as f:
-                if isinstance(stream, bytes):
-                    await f.write(stream)
-                elif isinstance(stream, BytesIO):
-                    while chunk := stream.read(_CHUNK_SIZE):
-                        await f.write(chunk)
-                else:
-                    for chunk in stream:
-                        await f.write(chunk)
+                async for chunk in _iterate_chunks(stream):
+                    await f.write(chunk)
 
             self._logger.info(f"File '{file_path}' uploaded to local storage.")
             return str(full_path)
@@ -84,55 +190,880 @@ class LocalStorageService(StorageService, metaclass=AbstractSingletonMeta):
             self._logger.error(f"Error uploading file: {e}", exc_info=True)
             raise e
 
-    def exists(self, file_path: Path) -> bool:
+    # ? The workdir archive is kept as an uncompressed tar, so each file sits
+    # ? at a fixed offset. It is indexed by a worker thread from the same
+    # ? chunks that are being written, so it is read once, and a download
+    # ? seeks straight to the file instead of scanning every member header.
+    # ? The tar is written aside and only moved into place once its index is,
+    # ? so a download never finds, and indexes, a partial archive.
+    async def upload_artifact(
+        self,
+        job_id: str,
+        stream: Union[
+            bytes,
+            BytesIO,
+            Generator[bytes, None, None],
+            AsyncIterator[bytes],
+        ],
+    ) -> str:
+        """Uploads a Job's workdir archive along with the index of its files."""
+        artifact_path = self._volume / _artifact_path_template.format(job_id=job_id)
+        self._logger.info(f"Uploading '{artifact_path}' to local storage.")
+        partial_path = artifact_path.with_name(f".{artifact_path.name}.partial")
+        try:
+            await aiofiles.os.makedirs(artifact_path.parent, exist_ok=True)
+            async with aiofiles.open(partial_path, "wb") as artifact:
+                chunks = _tee(_iterate_chunks(stream), artifact.write)
+                try:
+                    index = await asyncio.to_thread(
+                        _index_stream,
+                        AsyncIteratorReader(chunks, asyncio.get_running_loop()),
+                    )
+                    # ? tarfile stops at the end-of-archive marker, before the padding.
+                    async for _ in chunks:
+                        pass
+                finally:
+                    await chunks.aclose()
+            await asyncio.to_thread(
+                _write_atomically,
+                self._volume / _artifact_index_path_template.format(job_id=job_id),
+                index.model_dump_json(),
+            )
+            await aiofiles.os.replace(partial_path, artifact_path)
+        except Exception as e:
+            self._logger.error(f"Error uploading artifact: {e}", exc_info=True)
+            with contextlib.suppress(FileNotFoundError):
+                await aiofiles.os.remove(partial_path)
+            raise
+        self._logger.info(
+            f"Artifact '{artifact_path}' uploaded with {len(index.members)} files.",
+        )
+        return str(artifact_path)
+
+    async def delete_artifact(self, job_id: str) -> None:
+        """Deletes a Job's workdir archive along with its index."""
+        for path_template in [
+            _artifact_path_template,
+            _artifact_index_path_template,
+            _legacy_artifact_path_template,
+        ]:
+            with contextlib.suppress(FileNotFoundError):
+                await aiofiles.os.remove(
+                    self._volume / path_template.format(job_id=job_id),
+                )
+        self._logger.info(f"Artifact of job '{job_id}' deleted.")
+
+    async def exists(self, file_path: Path) -> bool:
         """Checks if a file exists in the local storage."""
-        return (self._volume / file_path).exists()
+        return await aiofiles.os.path.exists(self._volume / file_path)
 
-    def download(
+    async def download(
         self,
         job_id: str,
         file_path: Path,
-    ) -> BytesIO:
+    ) -> StoredFile:
         """
         Downloads a file from the local storage.
 
         :param job_id: The job ID.
-        :param file_path: The path to the file.
-        :return: A BytesIO object containing the file content.
+        :param file_path: The path to the file within the Job workdir.
+        :return: The file, streamed in chunks as it is iterated.
         :raises FileNotFoundError: If the file is not found.
         """
-        artifact_path = _artifact_path_template.format(job_id=job_id)
+        await self._raise_if_not_exists(Path(job_id))
 
-        workdir = Path(_job_manager_settings.workdir)
-        workdir = workdir.relative_to("/") if workdir.is_absolute() else workdir
+        artifact_path = await asyncio.to_thread(self._get_artifact_path, job_id)
+        if await asyncio.to_thread(_is_gzipped, artifact_path):
+            return await _open_compressed_member(artifact_path, file_path)
 
-        self._raise_if_not_exists(Path(job_id))
+        index = await asyncio.to_thread(
+            self._get_artifact_index,
+            job_id,
+            artifact_path,
+        )
+        member = index.members.get(PurePosixPath(file_path).as_posix())
+        if member is None:
+            raise FileNotFoundError(f"File {file_path} not found.")
 
-        with tarfile.open(self._volume / artifact_path, mode="r:*") as tar:
-            for member in tar.getmembers():
-                member_path = Path(member.path).relative_to(workdir)
-                if member_path == file_path:
-                    return self._get_tar_stream(
-                        tar.extractfile(member).read(),
-                        member_path.name,
-                    )
+        await asyncio.to_thread(
+            _check_member,
+            artifact_path,
+            member,
+            job_id,
+            file_path,
+        )
+        return StoredFile(
+            PurePosixPath(file_path).name,
+            member.size,
+            _read_file(artifact_path, member),
+        )
 
-        raise FileNotFoundError(f"File {file_path} not found.")
+    # ? Artifacts stored before they were indexed were named after the legacy
+    # ? template, and some were gzipped. They are moved to the current path on
+    # ? first read, decompressed if needed, so they can be indexed. Where the
+    # ? volume is read-only they are read in place.
+    def _get_artifact_path(self, job_id: str) -> Path:
+        artifact_path = self._volume / _artifact_path_template.format(job_id=job_id)
+        legacy_path = self._volume / _legacy_artifact_path_template.format(
+            job_id=job_id,
+        )
+        if artifact_path.exists() or not legacy_path.exists():
+            return artifact_path
+        try:
+            if _is_gzipped(legacy_path):
+                with (
+                    gzip.open(legacy_path) as legacy,
+                    tempfile.NamedTemporaryFile(
+                        dir=artifact_path.parent,
+                        prefix=".partial-",
+                        delete=False,
+                    ) as partial,
+                ):
+                    shutil.copyfileobj(legacy, partial, _CHUNK_SIZE)
+                Path(partial.name).replace(artifact_path)
+                legacy_path.unlink(missing_ok=True)
+            else:
+                legacy_path.replace(artifact_path)
+        except PermissionError:
+            return legacy_path
+        except FileNotFoundError:
+            # ? Migrated meanwhile by a concurrent download.
+            return artifact_path
+        self._logger.info(f"Migrated legacy artifact '{legacy_path}'.")
+        return artifact_path
+
+    # ? Artifacts stored before they were indexed get their index on first read.
+    def _get_artifact_index(self, job_id: str, artifact_path: Path) -> ArtifactIndex:
+        index_path = self._volume / _artifact_index_path_template.format(
+            job_id=job_id,
+        )
+        if index_path.exists():
+            return ArtifactIndex.model_validate_json(index_path.read_bytes())
+        try:
+            return self._write_artifact_index(artifact_path, index_path)
+        except PermissionError:
+            # ? The API may only have read access to the volume.
+            return _index_artifact(artifact_path)
+
+    def _write_artifact_index(
+        self,
+        artifact_path: Path,
+        index_path: Path,
+    ) -> ArtifactIndex:
+        index = _index_artifact(artifact_path)
+        _write_atomically(index_path, index.model_dump_json())
+        self._logger.info(f"Indexed {len(index.members)} files of '{artifact_path}'.")
+        return index
 
-    def _raise_if_not_exists(self, file_path: Path) -> None:
-        if not self.exists(file_path):
+    async def _raise_if_not_exists(self, file_path: Path) -> None:
+        if not await self.exists(file_path):
             raise FileNotFoundError(f"File {file_path} not found")
 
-    def _get_tar_stream(self, file_content: bytes, filename: str) -> BytesIO:
-        tar_stream = BytesIO()
-        with tarfile.open(fileobj=tar_stream, mode="w:gz") as tar:
-            tar_info = tarfile.TarInfo(name=filename)
-            tar_info.size = len(file_content)
-            tar.addfile(tar_info, BytesIO(file_content))
-        tar_stream.seek(0)
-        return tar_stream
+
+# ? Jobs of the same Task mostly leave the same files behind. Each file of an
+# ? artifact is stored once, as a blob named after its SHA-256 checksum, and
+# ? every Job keeps a manifest of its files plus a hard link to each blob it
+# ? uses. The link count of a blob is thus its reference count: deleting an
+# ? artifact unlinks its blobs and removes those no other Job links to.
+class ContentAddressedStorageService(LocalStorageService):
+    """A service for handling local artifacts deduplicated by file content."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._blobs = self._volume / settings.artifact_storage_settings.blobs_path
+
+    async def upload_artifact(
+        self,
+        job_id: str,
+        stream: Union[
+            bytes,
+            BytesIO,
+            Generator[bytes, None, None],
+            AsyncIterator[bytes],
+        ],
+    ) -> str:
+        """Stores the files of a Job's workdir archive that are not stored yet."""
+        manifest_path = self._volume / _artifact_manifest_path_template.format(
+            job_id=job_id,
+        )
+        self._logger.info(f"Uploading artifact of job '{job_id}' by content.")
+        chunks = _iterate_chunks(stream)
+        try:
+            manifest = await asyncio.to_thread(
+                self._store_archive,
+                job_id,
+                AsyncIteratorReader(chunks, asyncio.get_running_loop()),
+            )
+            await asyncio.to_thread(
+                _write_atomically,
+                manifest_path,
+                manifest.model_dump_json(),
+            )
+        except Exception as e:
+            self._logger.error(f"Error uploading artifact: {e}", exc_info=True)
+            raise
+        finally:
+            await chunks.aclose()
+        self._logger.info(
+            f"Artifact of job '{job_id}' uploaded with {len(manifest.members)} files.",
+        )
+        return str(manifest_path)
+
+    async def download(
+        self,
+        job_id: str,
+        file_path: Path,
+    ) -> StoredFile:
+        """
+        Downloads a file from the local storage.
+
+        :param job_id: The job ID.
+        :param file_path: The path to the file within the Job workdir.
+        :return: The file, streamed in chunks as it is iterated.
+        :raises FileNotFoundError: If the file is not found.
+        """
+        await self._raise_if_not_exists(Path(job_id))
+
+        manifest_path = self._volume / _artifact_manifest_path_template.format(
+            job_id=job_id,
+        )
+        async with aiofiles.open(manifest_path, "rb") as manifest_file:
+            manifest = ArtifactIndex.model_validate_json(await manifest_file.read())
+        member = manifest.members.get(PurePosixPath(file_path).as_posix())
+        if member is None:
+            raise FileNotFoundError(f"File {file_path} not found.")
+
+        blob_path = (
+            self._volume / _objects_path_template.format(job_id=job_id) / member.sha256
+        )
+        if (await aiofiles.os.stat(blob_path)).st_size != member.size:
+            _raise_corrupted(job_id, file_path)
+        return StoredFile(
+            PurePosixPath(file_path).name,
+            member.size,
+            _read_file(blob_path, member),
+        )
+
+    async def delete_artifact(self, job_id: str) -> None:
+        """Deletes a Job's manifest and the blobs no other Job references."""
+        await asyncio.to_thread(self._delete_artifact, job_id)
+        self._logger.info(f"Artifact of job '{job_id}' deleted.")
+
+    def _store_archive(self, job_id: str, archive: IO[bytes]) -> ArtifactIndex:
+        objects_path = self._volume / _objects_path_template.format(job_id=job_id)
+        objects_path.mkdir(parents=True, exist_ok=True)
+        manifest = ArtifactIndex()
+        with tarfile.open(fileobj=archive, mode="r|") as tar:
+            for member in tar:
+                member_path = _get_workdir_path(member)
+                if member_path is None:
+                    continue
+                with tar.extractfile(member) as member_file:
+                    checksum = self._store_blob(member_file, member.size, objects_path)
+                manifest.members[member_path] = ArtifactMember(
+                    offset=0,
+                    size=member.size,
+                    sha256=checksum,
+                )
+        return manifest
+
+    # ? Files that fit in a chunk are hashed in memory, so storing one that is
+    # ? already stored costs no write at all. Larger ones are hashed while they
+    # ? are written next to the Job's links and dropped if found to be known.
+    def _store_blob(self, content: IO[bytes], size: int, objects_path: Path) -> str:
+        checksum = hashlib.sha256()
+        if size <= _CHUNK_SIZE:
+            data = content.read()
+            checksum.update(data)
+            if self._link_blob(checksum.hexdigest(), objects_path):
+                return checksum.hexdigest()
+        with tempfile.NamedTemporaryFile(
+            dir=objects_path,
+            prefix=".partial-",
+            delete=False,
+        ) as partial:
+            if size <= _CHUNK_SIZE:
+                partial.write(data)
+            else:
+                while chunk := content.read(_CHUNK_SIZE):
+                    checksum.update(chunk)
+                    partial.write(chunk)
+        partial_path = Path(partial.name)
+        partial_path.chmod(0o444)
+        self._add_blob(partial_path, checksum.hexdigest(), objects_path)
+        return checksum.hexdigest()
+
+    def _link_blob(self, checksum: str, objects_path: Path) -> bool:
+        try:
+            (objects_path / checksum).hardlink_to(self._get_blob_path(checksum))
+        except FileExistsError:
+            return True
+        except FileNotFoundError:
+            return False
+        return True
+
+    # ? A hard link is only created if its path is free, so concurrent uploads
+    # ? of the same content agree on a single blob.
+    def _add_blob(self, partial_path: Path, checksum: str, objects_path: Path) -> None:
+        blob_path = self._get_blob_path(checksum)
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        while True:
+            try:
+                blob_path.hardlink_to(partial_path)
+            except FileExistsError:
+                if self._link_blob(checksum, objects_path):
+                    partial_path.unlink()
+                    return
+                continue
+            partial_path.replace(objects_path / checksum)
+            return
+
+    # ? A blob linked again while it is being removed keeps its content under
+    # ? the new link; only its deduplication with later uploads is lost.
+    def _delete_artifact(self, job_id: str) -> None:
+        manifest_path = self._volume / _artifact_manifest_path_template.format(
+            job_id=job_id,
+        )
+        objects_path = self._volume / _objects_path_template.format(job_id=job_id)
+        manifest_path.unlink(missing_ok=True)
+        if not objects_path.exists():
+            return
+        for link_path in objects_path.iterdir():
+            link_path.unlink()
+            blob_path = self._get_blob_path(link_path.name)
+            try:
+                if blob_path.stat().st_nlink == 1:
+                    blob_path.unlink()
+            except FileNotFoundError:
+                continue
+        shutil.rmtree(objects_path, ignore_errors=True)
+
+    def _get_blob_path(self, checksum: str) -> Path:
+        return self._blobs / checksum[:2] / checksum
+
+
+# ? Artifacts live in an S3-compatible bucket, so API replicas and Job
+# ? Managers share them without a common volume. boto3 is blocking, so its
+# ? calls run on a thread pool. A download holds its thread and connection
+# ? for as long as the client reads, so response bodies are streamed on a
+# ? pool of their own, and slow clients never hold up the other calls. The
+# ? connection pool has room for both. The workdir archive is indexed as it
+# ? streams through, and single files are then fetched with ranged GETs.
+class S3StorageService(StorageService, metaclass=AbstractSingletonMeta):
+    """A service for handling Job artifacts in an S3-compatible bucket."""
+
+    def __init__(self) -> None:
+        if boto3 is None:
+            raise RuntimeError("The S3 storage requires the 'boto3' package.")
+        s3_settings = settings.artifact_storage_settings.s3
+        self._logger = logger
+        self._bucket = s3_settings.bucket
+        self._prefix = s3_settings.prefix
+        self._part_size = s3_settings.part_size
+        self._upload_concurrency = s3_settings.upload_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=s3_settings.max_connections,
+            thread_name_prefix="buildbot-s3",
+        )
+        self._download_executor = ThreadPoolExecutor(
+            max_workers=s3_settings.download_concurrency,
+            thread_name_prefix="buildbot-s3-download",
+        )
+        self._client = boto3.session.Session().client(
+            "s3",
+            endpoint_url=s3_settings.endpoint_url,
+            region_name=s3_settings.region,
+            aws_access_key_id=s3_settings.access_key_id,
+            aws_secret_access_key=s3_settings.secret_access_key,
+            config=Config(
+                max_pool_connections=(
+                    s3_settings.max_connections + s3_settings.download_concurrency
+                ),
+                retries={"mode": "standard"},
+            ),
+        )
+
+    async def upload(
+        self,
+        file_path: Path,
+        stream: Union[
+            bytes,
+            BytesIO,
+            Generator[bytes, None, None],
+            AsyncIterator[bytes],
+        ],
+    ) -> str:
+        """Uploads a file to the bucket as it streams in."""
+        key = self._get_key(file_path)
+        self._logger.info(f"Uploading '{key}' to S3.")
+        upload = self._create_upload(key)
+        try:
+            async for chunk in _iterate_chunks(stream):
+                await upload.write(chunk)
+            await upload.complete()
+        except BaseException as e:
+            self._logger.error(f"Error uploading file: {e}", exc_info=True)
+            await upload.abort()
+            raise
+        self._logger.info(f"File '{key}' uploaded to S3.")
+        return f"s3://{self._bucket}/{key}"
+
+    # ? The archive is parsed by a worker thread from the same chunks that are
+    # ? being uploaded, so it is read once and never held whole.
+    async def upload_artifact(
+        self,
+        job_id: str,
+        stream: Union[
+            bytes,
+            BytesIO,
+            Generator[bytes, None, None],
+            AsyncIterator[bytes],
+        ],
+    ) -> str:
+        """Uploads a Job's workdir archive along with the index of its files."""
+        key = self._get_key(Path(_artifact_path_template.format(job_id=job_id)))
+        self._logger.info(f"Uploading artifact '{key}' to S3.")
+        upload = self._create_upload(key)
+        chunks = _tee(_iterate_chunks(stream), upload.write)
+        try:
+            index = await asyncio.to_thread(
+                _index_stream,
+                AsyncIteratorReader(chunks, asyncio.get_running_loop()),
+            )
+            # ? tarfile stops at the end-of-archive marker, before the padding.
+            async for _ in chunks:
+                pass
+            await upload.complete()
+        except BaseException as e:
+            self._logger.error(f"Error uploading artifact: {e}", exc_info=True)
+            await upload.abort()
+            raise
+        finally:
+            await chunks.aclose()
+
+        await self._call(
+            self._client.put_object,
+            Bucket=self._bucket,
+            Key=self._get_key(
+                Path(_artifact_index_path_template.format(job_id=job_id)),
+            ),
+            Body=index.model_dump_json().encode(),
+            ContentType="application/json",
+        )
+        self._logger.info(f"Artifact '{key}' uploaded to S3.")
+        return f"s3://{self._bucket}/{key}"
+
+    async def download(
+        self,
+        job_id: str,
+        file_path: Path,
+    ) -> StoredFile:
+        """
+        Downloads a file of a Job's artifact from the bucket.
+
+        :param job_id: The job ID.
+        :param file_path: The path to the file within the Job workdir.
+        :return: The file, streamed in chunks as it is iterated.
+        :raises FileNotFoundError: If the file is not found.
+        """
+        index = ArtifactIndex.model_validate_json(
+            await self._get_object(
+                self._get_key(
+                    Path(_artifact_index_path_template.format(job_id=job_id)),
+                ),
+            ),
+        )
+        member = index.members.get(PurePosixPath(file_path).as_posix())
+        if member is None:
+            raise FileNotFoundError(f"File {file_path} not found.")
+
+        body = await self._get_range(
+            self._get_key(Path(_artifact_path_template.format(job_id=job_id))),
+            member,
+            job_id,
+            file_path,
+        )
+        return StoredFile(
+            PurePosixPath(file_path).name,
+            member.size,
+            self._read_body(body),
+        )
+
+    async def delete_artifact(self, job_id: str) -> None:
+        """Deletes a Job's workdir archive along with its index."""
+        await self._call(
+            self._client.delete_objects,
+            Bucket=self._bucket,
+            Delete={
+                "Objects": [
+                    {"Key": self._get_key(Path(template.format(job_id=job_id)))}
+                    for template in [
+                        _artifact_path_template,
+                        _artifact_index_path_template,
+                    ]
+                ],
+                "Quiet": True,
+            },
+        )
+        self._logger.info(f"Artifact of job '{job_id}' deleted.")
+
+    async def exists(self, file_path: Path) -> bool:
+        """Checks if an object, or any object under a path, is in the bucket."""
+        key = self._get_key(file_path)
+        try:
+            await self._call(self._client.head_object, Bucket=self._bucket, Key=key)
+            return True
+        except ClientError as e:
+            if not _is_not_found(e):
+                raise
+        response = await self._call(
+            self._client.list_objects_v2,
+            Bucket=self._bucket,
+            Prefix=f"{key}/",
+            MaxKeys=1,
+        )
+        return response.get("KeyCount", 0) > 0
+
+    def _create_upload(self, key: str) -> "_MultipartUpload":
+        return _MultipartUpload(
+            self._client,
+            self._bucket,
+            key,
+            self._call,
+            self._part_size,
+            self._upload_concurrency,
+        )
+
+    async def _get_object(self, key: str) -> bytes:
+        try:
+            response = await self._call(
+                self._client.get_object,
+                Bucket=self._bucket,
+                Key=key,
+            )
+        except ClientError as e:
+            if _is_not_found(e):
+                raise FileNotFoundError(f"File {key} not found.") from e
+            raise
+        with contextlib.closing(response["Body"]) as body:
+            return await self._call(body.read)
+
+    # ? The range is requested before the response starts, so an artifact
+    # ? shorter than its index says is reported instead of sent truncated.
+    async def _get_range(
+        self,
+        key: str,
+        member: ArtifactMember,
+        job_id: str,
+        file_path: Path,
+    ) -> Optional[Any]:
+        if not member.size:
+            return None
+        try:
+            response = await self._call(
+                self._client.get_object,
+                Bucket=self._bucket,
+                Key=key,
+                Range=f"bytes={member.offset}-{member.offset + member.size - 1}",
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "InvalidRange":
+                _raise_corrupted(job_id, file_path)
+            raise
+        if response["ContentLength"] != member.size:
+            response["Body"].close()
+            _raise_corrupted(job_id, file_path)
+        return response["Body"]
+
+    async def _read_body(self, body: Optional[Any]) -> AsyncIterator[bytes]:
+        if body is None:
+            return
+        with contextlib.closing(body):
+            async for chunk in iterate_in_thread(
+                body.iter_chunks(_CHUNK_SIZE),
+                self._download_executor,
+            ):
+                yield chunk
+
+    async def _call(self, method: Callable[..., Any], **kwargs: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            partial(method, **kwargs),
+        )
+
+    def _get_key(self, file_path: Path) -> str:
+        return f"{self._prefix}{PurePosixPath(file_path).as_posix()}"
+
+
+# ? Parts are sent as soon as they fill up, at most `concurrency` at a time,
+# ? so memory use is bounded by the part size times the concurrency. Objects
+# ? smaller than a part are sent with a single PUT instead.
+class _MultipartUpload:
+    """Uploads an object in parts as its content streams in."""
+
+    def __init__(
+        self,
+        client: Any,
+        bucket: str,
+        key: str,
+        call: Callable[..., Any],
+        part_size: int,
+        concurrency: int,
+    ) -> None:
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._call = call
+        self._part_size = part_size
+        self._concurrency = concurrency
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[asyncio.Future] = []
+
+    async def write(self, chunk: bytes) -> None:
+        """Buffers a chunk, sending every part it fills."""
+        self._buffer += chunk
+        while len(self._buffer) >= self._part_size:
+            part = bytes(self._buffer[: self._part_size])
+            del self._buffer[: self._part_size]
+            await self._send(part)
+
+    async def complete(self) -> None:
+        """Sends the rest and completes the upload."""
+        if self._upload_id is None:
+            await self._call(
+                self._client.put_object,
+                Bucket=self._bucket,
+                Key=self._key,
+                Body=bytes(self._buffer),
+            )
+            return
+        if self._buffer:
+            await self._send(bytes(self._buffer))
+            self._buffer.clear()
+        responses = await asyncio.gather(*self._parts)
+        await self._call(
+            self._client.complete_multipart_upload,
+            Bucket=self._bucket,
+            Key=self._key,
+            UploadId=self._upload_id,
+            MultipartUpload={
+                "Parts": [
+                    {"ETag": response["ETag"], "PartNumber": number}
+                    for number, response in enumerate(responses, start=1)
+                ],
+            },
+        )
+
+    async def abort(self) -> None:
+        """Stops sending parts and discards the ones already sent."""
+        for part in self._parts:
+            part.cancel()
+        await asyncio.gather(*self._parts, return_exceptions=True)
+        if self._upload_id is not None:
+            with contextlib.suppress(Exception):
+                await self._call(
+                    self._client.abort_multipart_upload,
+                    Bucket=self._bucket,
+                    Key=self._key,
+                    UploadId=self._upload_id,
+                )
+
+    async def _send(self, part: bytes) -> None:
+        if self._upload_id is None:
+            response = await self._call(
+                self._client.create_multipart_upload,
+                Bucket=self._bucket,
+                Key=self._key,
+            )
+            self._upload_id = response["UploadId"]
+        while sending := [part for part in self._parts if not part.done()]:
+            if len(sending) < self._concurrency:
+                break
+            await asyncio.wait(sending, return_when=asyncio.FIRST_COMPLETED)
+        for sent in self._parts:
+            if sent.done():
+                sent.result()
+        self._parts.append(
+            asyncio.ensure_future(
+                self._call(
+                    self._client.upload_part,
+                    Bucket=self._bucket,
+                    Key=self._key,
+                    UploadId=self._upload_id,
+                    PartNumber=len(self._parts) + 1,
+                    Body=part,
+                ),
+            ),
+        )
+
+
+async def _tee(
+    chunks: AsyncIterator[bytes],
+    write: Callable[[bytes], Awaitable[Any]],
+) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        await write(chunk)
+        yield chunk
+
+
+def _is_not_found(error: "ClientError") -> bool:
+    return error.response.get("Error", {}).get("Code") in {"404", "NoSuchKey"}
+
+
+async def _iterate_chunks(
+    stream: Union[
+        bytes,
+        BytesIO,
+        Generator[bytes, None, None],
+        AsyncIterator[bytes],
+    ],
+) -> AsyncIterator[bytes]:
+    if isinstance(stream, bytes):
+        yield stream
+    elif hasattr(stream, "__aiter__"):
+        async for chunk in stream:
+            yield chunk
+    else:
+        # ? Blocking sources (spooled files, generators) are read off the loop.
+        if hasattr(stream, "read"):
+            stream = iter(partial(stream.read, _CHUNK_SIZE), b"")
+        async for chunk in iterate_in_thread(stream):
+            yield chunk
+
+
+async def _read_file(path: Path, member: ArtifactMember) -> AsyncIterator[bytes]:
+    remaining = member.size
+    async with aiofiles.open(path, "rb") as stored_file:
+        await stored_file.seek(member.offset)
+        while remaining and (
+            chunk := await stored_file.read(min(_CHUNK_SIZE, remaining))
+        ):
+            remaining -= len(chunk)
+            yield chunk
+
+
+# ? A file is checked when it is opened, before anything is sent under its
+# ? Content-Length, and its content is not hashed again on every download.
+# ? The artifact must still hold the whole file, right after a valid tar
+# ? header of the same size, which catches truncated or rewritten artifacts.
+def _check_member(
+    artifact_path: Path,
+    member: ArtifactMember,
+    job_id: str,
+    file_path: Path,
+) -> None:
+    with artifact_path.open("rb") as artifact:
+        artifact_size = artifact.seek(0, os.SEEK_END)
+        artifact.seek(max(member.offset - tarfile.BLOCKSIZE, 0))
+        header = artifact.read(tarfile.BLOCKSIZE)
+    try:
+        header_size = tarfile.TarInfo.frombuf(
+            header,
+            tarfile.ENCODING,
+            "surrogateescape",
+        ).size
+    except tarfile.HeaderError:
+        _raise_corrupted(job_id, file_path)
+    # ? pax archives store sizes too large for the header in an extended one.
+    if artifact_size < member.offset + member.size or (
+        header_size != member.size
+        and not (header_size == 0 and member.size >= _MAX_HEADER_SIZE)
+    ):
+        _raise_corrupted(job_id, file_path)
+
+
+def _is_gzipped(path: Path) -> bool:
+    with path.open("rb") as stored_file:
+        return stored_file.read(len(_GZIP_MAGIC)) == _GZIP_MAGIC
+
+
+# ? A gzipped legacy artifact on a read-only volume cannot be seeked into,
+# ? so it is scanned once for the file's size and once more to send it.
+async def _open_compressed_member(artifact_path: Path, file_path: Path) -> StoredFile:
+    member_path = PurePosixPath(file_path).as_posix()
+
+    def _find_member(tar: tarfile.TarFile) -> tarfile.TarInfo:
+        for member in tar:
+            if _get_workdir_path(member) == member_path:
+                return member
+        raise FileNotFoundError(f"File {file_path} not found.")
+
+    def _get_size() -> int:
+        with tarfile.open(artifact_path, mode="r|gz") as tar:
+            return _find_member(tar).size
+
+    def _read() -> Generator[bytes, None, None]:
+        with (
+            tarfile.open(artifact_path, mode="r|gz") as tar,
+            tar.extractfile(_find_member(tar)) as member_file,
+        ):
+            while chunk := member_file.read(_CHUNK_SIZE):
+                yield chunk
+
+    return StoredFile(
+        PurePosixPath(file_path).name,
+        await asyncio.to_thread(_get_size),
+        iterate_in_thread(_read()),
+    )
+
+
+def _raise_corrupted(job_id: str, file_path: Path) -> NoReturn:
+    logger.error(f"Output '{file_path}' of job '{job_id}' is corrupted.")
+    raise ArtifactCorruptedError(job_id, file_path)
+
+
+# ? Only the regular files of the workdir are indexed, by their path in it.
+def _get_workdir_path(member: tarfile.TarInfo) -> Optional[str]:
+    if not member.isreg() or member.issparse():
+        return None
+    workdir = PurePosixPath(_job_manager_settings.workdir)
+    workdir = workdir.relative_to("/") if workdir.is_absolute() else workdir
+    member_path = PurePosixPath(member.name)
+    if not member_path.is_relative_to(workdir):
+        return None
+    return member_path.relative_to(workdir).as_posix()
+
+
+def _index_artifact(artifact_path: Path) -> ArtifactIndex:
+    with tarfile.open(artifact_path, mode="r:") as tar:
+        return _index_tar(tar)
+
+
+def _index_stream(archive: IO[bytes]) -> ArtifactIndex:
+    with tarfile.open(fileobj=archive, mode="r|") as tar:
+        return _index_tar(tar)
+
+
+def _index_tar(tar: tarfile.TarFile) -> ArtifactIndex:
+    index = ArtifactIndex()
+    for member in tar:
+        member_path = _get_workdir_path(member)
+        if member_path is None:
+            continue
+        checksum = hashlib.sha256()
+        with tar.extractfile(member) as member_file:
+            while chunk := member_file.read(_CHUNK_SIZE):
+                checksum.update(chunk)
+        index.members[member_path] = ArtifactMember(
+            offset=member.offset_data,
+            size=member.size,
+            sha256=checksum.hexdigest(),
+        )
+    return index
+
+
+# ? Files are swapped in whole, so readers never see a partial one.
+def _write_atomically(path: Path, content: str) -> None:
+    partial_path = path.with_name(f".{path.name}.partial")
+    partial_path.write_text(content)
+    partial_path.replace(path)
 
 
 def get_storage_service() -> StorageService:
     """Returns the storage service."""
+    if settings.artifact_storage_settings.type == StorageType.CONTENT_ADDRESSED:
+        return ContentAddressedStorageService()
+    if settings.artifact_storage_settings.type == StorageType.S3:
+        return S3StorageService()
     return LocalStorageService()
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, field_validator
 
 
@@ -6,3 +8,4 @@ class TaskDTO(BaseModel):
     """Task DTO."""
 
     script: str
+    resource_profile: Optional[str] = None
@@ -2,10 +2,12 @@ from abc import ABC, abstractmethod
 from typing import Optional
 
 from app.core.exceptions import (
+    ResourceProfileNotFoundError,
     TaskCreationError,
     TaskNotFoundError,
     TaskNotUpdatedError,
 )
+from app.core.settings import settings
 from app.repository.task.repository import TaskRepository, get_task_repository
 from app.repository.task.schemas import Task
 from app.services.task.schema import TaskDTO
@@ -38,9 +40,14 @@ class TaskService(TaskQueryService):
         :param task_dto: The CreateTaskRequest
         :return: The ID of the Task
         :raises TaskCreationError: If the Task cannot be created
+        :raises ResourceProfileNotFoundError: If the resource profile does not exist
         """
+        self._validate_resource_profile(task_dto.resource_profile)
         try:
-            task = Task(script=self._sanitize_bash_script(task_dto.script))
+            task = Task(
+                script=self._sanitize_bash_script(task_dto.script),
+                resource_profile=task_dto.resource_profile,
+            )
             await self._task_repo.create(task)
             return task.id
         except Exception as e:
@@ -53,10 +60,16 @@ class TaskService(TaskQueryService):
         :param task_id: The ID of the Task
         :return: The ID of the Task
         :raises TaskNotFoundError: If the Task cannot be updated
+        :raises ResourceProfileNotFoundError: If the resource profile does not exist
         """
+        self._validate_resource_profile(task_dto.resource_profile)
         was_updated = (
             await self._task_repo.update(
-                Task(id=task_id, script=task_dto.script),
+                Task(
+                    id=task_id,
+                    script=task_dto.script,
+                    resource_profile=task_dto.resource_profile,
+                ),
             )
         ) or False
 
@@ -77,6 +90,11 @@ class TaskService(TaskQueryService):
             raise TaskNotFoundError(task_id)
         return task
 
+    def _validate_resource_profile(self, profile: Optional[str]) -> None:
+        """Checks that a Task's resource profile exists."""
+        if profile and profile not in settings.job_manager_settings.resource_profiles:
+            raise ResourceProfileNotFoundError(profile)
+
     def _sanitize_bash_script(self, script: str) -> str:
         """Sanitizes a bash script."""
         shebang = "#!/bin/bash"
@@ -0,0 +1,76 @@
+"""
+Artifact streaming benchmark.
+
+Streams a synthetic multi-GB workdir archive through the same pipeline used for
+Docker archives (a blocking chunk generator drained by a worker thread into a
+bounded queue) into the local storage service, and reports the throughput and
+the peak memory held by Python objects.
+
+Run from the repository root:
+
+    PYTHONPATH=buildbot python -m benchmarks.artifact_streaming --size-gb 4
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Generator
+
+from app.core.settings import settings
+from app.core.streams import iterate_in_thread
+from app.services.storage import LocalStorageService
+
+_MIB = 1024 * 1024
+
+
+def _archive_chunks(size: int, chunk_size: int) -> Generator[bytes, None, None]:
+    """Mimics the chunk generator returned by docker-py's get_archive."""
+    for _ in range(size // chunk_size):
+        yield b"\0" * chunk_size
+
+
+async def _run(size: int, chunk_size: int, buffered: int) -> None:
+    with tempfile.TemporaryDirectory() as volume:
+        settings.artifact_storage_settings.volume_path = Path(volume)
+        storage = LocalStorageService()
+
+        tracemalloc.start()
+        started_at = time.perf_counter()
+        await storage.upload(
+            Path("bench/artifact.tar"),
+            iterate_in_thread(_archive_chunks(size, chunk_size), None, buffered),
+        )
+        elapsed = time.perf_counter() - started_at
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print(  # noqa: T201
+        f"archive={size / _MIB:.0f} MiB chunk={chunk_size / _MIB:.0f} MiB "
+        f"buffered={buffered} time={elapsed:.2f}s "
+        f"throughput={size / _MIB / elapsed:.0f} MiB/s "
+        f"peak_python_memory={peak / _MIB:.1f} MiB",
+    )
+
+
+def main() -> None:
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-gb", type=float, default=2.0)
+    parser.add_argument("--chunk-mb", type=int, default=1)
+    parser.add_argument("--buffered", type=int, default=4)
+    args = parser.parse_args()
+
+    asyncio.run(
+        _run(
+            int(args.size_gb * 1024 * _MIB),
+            args.chunk_mb * _MIB,
+            args.buffered,
+        ),
+    )
+
+
+if __name__ == "__main__":
+    main()
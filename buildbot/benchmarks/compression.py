@@ -0,0 +1,161 @@
+"""
+Compression benchmark.
+
+Builds synthetic workdir archives of a few representative kinds, compresses
+them with every available codec at a fast, the default and a high level,
+serially and in parallel blocks, and reports the compression ratio against
+the throughput. Every compressed stream is decompressed again to check that
+the standard library reads it back as a whole.
+
+Run from the repository root:
+
+    PYTHONPATH=buildbot python -m benchmarks.compression --size-mb 64 --workers 4
+"""
+
+import argparse
+import bz2
+import gzip
+import io
+import lzma
+import os
+import random
+import tarfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from app.core import compression
+from app.core.compression import create_compressor
+from app.core.enums import CompressionCodec
+
+_MIB = 1024 * 1024
+_SOURCE_ROOT = Path(__file__).resolve().parents[1] / "app"
+
+_LEVELS: Dict[CompressionCodec, List[Optional[int]]] = {
+    CompressionCodec.NONE: [None],
+    CompressionCodec.GZIP: [1, None, 9],
+    CompressionCodec.BZ2: [1, None],
+    CompressionCodec.XZ: [0, None],
+    CompressionCodec.ZSTD: [1, None, 19],
+}
+
+_DECOMPRESSORS: Dict[CompressionCodec, Callable[[bytes], bytes]] = {
+    CompressionCodec.NONE: lambda data: data,
+    CompressionCodec.GZIP: gzip.decompress,
+    CompressionCodec.BZ2: bz2.decompress,
+    CompressionCodec.XZ: lzma.decompress,
+    CompressionCodec.ZSTD: lambda data: b"".join(
+        compression.zstandard.ZstdDecompressor().read_to_iter(io.BytesIO(data)),
+    ),
+}
+
+
+def _source_files(size: int) -> Dict[str, bytes]:
+    """Source code, as in a checked-out repository."""
+    sources = [path.read_bytes() for path in sorted(_SOURCE_ROOT.rglob("*.py"))]
+    files, total = {}, 0
+    while total < size:
+        data = sources[len(files) % len(sources)]
+        files[f"src/module_{len(files)}.py"] = data
+        total += len(data)
+    return files
+
+
+def _log_files(size: int) -> Dict[str, bytes]:
+    """Build logs, repetitive lines with changing numbers."""
+    rng = random.Random(0)  # noqa: S311
+    lines, total = [], 0
+    while total < size:
+        line = (
+            f"2025-01-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:"
+            f"{rng.randint(0, 59):02d} | INFO | step {rng.randint(0, 999)} "
+            f"compiled target_{rng.randint(0, 99)}.o in {rng.random():.3f}s\n"
+        ).encode()
+        lines.append(line)
+        total += len(line)
+    return {"logs/build.log": b"".join(lines)}
+
+
+def _binary_files(size: int) -> Dict[str, bytes]:
+    """Build outputs, half incompressible and half sparse."""
+    rng = random.Random(0)  # noqa: S311
+    files = {}
+    for index in range(max(size // (4 * _MIB), 1)):
+        data = bytearray(rng.randbytes(2 * _MIB))
+        data += bytes(2 * _MIB)
+        files[f"bin/object_{index}.o"] = bytes(data)
+    return files
+
+
+_WORKDIRS: Dict[str, Callable[[int], Dict[str, bytes]]] = {
+    "source": _source_files,
+    "logs": _log_files,
+    "binary": _binary_files,
+}
+
+
+def _build_archive(files: Dict[str, bytes]) -> bytes:
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode="w") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name=f"workdir/{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return archive.getvalue()
+
+
+def _compress(
+    archive: bytes,
+    codec: CompressionCodec,
+    level: Optional[int],
+    workers: int,
+) -> bytes:
+    compressor = create_compressor(codec, level, workers)
+    view = memoryview(archive)
+    chunks = [
+        compressor.compress(bytes(view[offset : offset + _MIB]))
+        for offset in range(0, len(archive), _MIB)
+    ]
+    chunks.append(compressor.flush())
+    return b"".join(chunks)
+
+
+def _run(size: int, workers: int) -> None:
+    codecs = [
+        codec
+        for codec in CompressionCodec
+        if codec != CompressionCodec.ZSTD or compression.zstandard is not None
+    ]
+    print(  # noqa: T201
+        f"{'workdir':<8} {'codec':<5} {'level':>5} {'workers':>7} "
+        f"{'ratio':>6} {'MiB/s':>8}",
+    )
+    for workdir, build_files in _WORKDIRS.items():
+        archive = _build_archive(build_files(size))
+        for codec in codecs:
+            for level in _LEVELS[codec]:
+                for pool_size in sorted({1, workers}):
+                    started_at = time.perf_counter()
+                    compressed = _compress(archive, codec, level, pool_size)
+                    elapsed = time.perf_counter() - started_at
+                    assert _DECOMPRESSORS[codec](compressed) == archive
+                    print(  # noqa: T201
+                        f"{workdir:<8} {codec:<5} "
+                        f"{'default' if level is None else level:>5} "
+                        f"{pool_size:>7} {len(archive) / len(compressed):>6.2f} "
+                        f"{len(archive) / _MIB / elapsed:>8.0f}",
+                    )
+
+
+def main() -> None:
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    _run(args.size_mb * _MIB, args.workers)
+
+
+if __name__ == "__main__":
+    main()
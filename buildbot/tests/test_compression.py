@@ -0,0 +1,86 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import pytest
+import zstandard
+from app.core import settings as settings_module
+from app.core.compression import ParallelCompressor, _compress_block
+from app.core.enums import CompressionCodec
+from app.core.settings import ArtifactStorageSettings
+from pydantic import ValidationError
+
+
+def _decompress_zstd(data: bytes) -> bytes:
+    reader = zstandard.ZstdDecompressor().stream_reader(
+        io.BytesIO(data),
+        read_across_frames=True,
+    )
+    return reader.read()
+
+
+@pytest.mark.parametrize(
+    ("codec", "decompress"),
+    [
+        (CompressionCodec.GZIP, gzip.decompress),
+        (CompressionCodec.BZ2, bz2.decompress),
+        (CompressionCodec.XZ, lzma.decompress),
+        (CompressionCodec.ZSTD, _decompress_zstd),
+    ],
+)
+def test_parallel_compression_produces_standard_streams(
+    codec: CompressionCodec,
+    decompress: Callable[[bytes], bytes],
+) -> None:
+    """Tests that blocks compressed in parallel decompress as a single stream."""
+    block_size = 4096
+    data = os.urandom(3000) + b"log line\n" * 5000
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        compressor = ParallelCompressor(codec, None, executor, 2, block_size)
+        compressed = b"".join(
+            [
+                compressor.compress(data[offset : offset + 1000])
+                for offset in range(0, len(data), 1000)
+            ],
+        )
+        compressed += compressor.flush()
+
+    blocks = [
+        _compress_block(codec, None, data[offset : offset + block_size])
+        for offset in range(0, len(data), block_size)
+    ]
+    assert len(blocks) > 1
+    assert compressed == b"".join(blocks)
+    assert decompress(compressed) == data
+
+
+@pytest.mark.parametrize(
+    ("codec", "level"),
+    [
+        (CompressionCodec.GZIP, 10),
+        (CompressionCodec.BZ2, 0),
+        (CompressionCodec.XZ, -1),
+        (CompressionCodec.ZSTD, 23),
+    ],
+)
+def test_rejects_compression_levels_of_other_codecs(
+    codec: CompressionCodec,
+    level: int,
+) -> None:
+    """Tests that a compression level the codec does not take fails validation."""
+    with pytest.raises(ValidationError):
+        ArtifactStorageSettings(codec=codec, compression_level=level)
+
+    assert ArtifactStorageSettings(codec=codec, compression_level=1)
+
+
+def test_rejects_zstd_without_zstandard(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Tests that the zstd codec fails validation when zstandard is missing."""
+    monkeypatch.setattr(settings_module, "find_spec", lambda name: None)
+
+    with pytest.raises(ValidationError, match="'zstd' extra"):
+        ArtifactStorageSettings(codec=CompressionCodec.ZSTD)
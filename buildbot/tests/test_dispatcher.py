@@ -0,0 +1,271 @@
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import fakeredis
+import pytest
+from app.api.job.views import create_job
+from app.core.settings import settings
+from app.repository.job.queue import JobQueueRedisRepository
+from app.repository.job.schemas import Job, JobStatus
+from app.repository.task.schemas import Task
+from app.services.job import JobService
+from app.services.job.dispatcher import JobDispatcher
+from app.services.job.schema import JobDTO
+from fastapi import HTTPException, status
+
+
+class FakeJobRepository:
+    """Keeps Jobs in memory."""
+
+    def __init__(self) -> None:
+        self.jobs: Dict[str, Job] = {}
+
+    async def create(self, job: Job, inputs: Optional[Dict[str, str]] = None) -> str:
+        """Stores a Job."""
+        self.jobs[job.id] = job
+        return job.id
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """Returns a Job."""
+        return self.jobs.get(job_id)
+
+    async def update(self, job: Job) -> None:
+        """Stores a Job again."""
+        self.jobs[job.id] = job
+
+    async def update_status(self, job_id: str, job_status: JobStatus) -> None:
+        """Sets the status of a Job."""
+        self.jobs[job_id].status = job_status
+
+    async def delete_inputs(self, job_id: str) -> None:
+        """Deletes the inputs of a Job."""
+
+    async def delete(self, job_id: str) -> None:
+        """Deletes a Job."""
+        del self.jobs[job_id]
+
+
+class FakeTaskService:
+    """Returns the same Task for every ID."""
+
+    async def get(self, task_id: str) -> Task:
+        """Returns a Task."""
+        return Task(id=task_id, script="true")
+
+
+class FailingJobRunner:
+    """Fails to launch every Job, as when the Docker daemon is down."""
+
+    def __init__(self) -> None:
+        self.runs = 0
+
+    async def place(self, resource_profile: Optional[str] = None) -> None:
+        """Chooses no host."""
+
+    async def run(self, job_id: str, *args: object) -> None:
+        """Fails to run a Job."""
+        self.runs += 1
+        raise RuntimeError("Docker daemon unavailable")
+
+
+class FakeDispatcher:
+    """Counts the dispatch requests."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+
+    async def request_dispatch(self) -> None:
+        """Counts a dispatch request."""
+        self.requests += 1
+
+
+@pytest.fixture
+def redis() -> fakeredis.FakeAsyncRedis:
+    """In-memory Redis, with Lua scripting."""
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.fixture
+def job_queue(
+    redis: fakeredis.FakeAsyncRedis,
+    monkeypatch: pytest.MonkeyPatch,
+) -> JobQueueRedisRepository:
+    """Job queue on the in-memory Redis, created anew for every test."""
+    monkeypatch.setattr(JobQueueRedisRepository, "_instances", {})
+    return JobQueueRedisRepository(redis.connection_pool)
+
+
+def _record(
+    calls: List[Tuple[str, str]],
+    name: str,
+    method: Callable[..., Awaitable[None]],
+) -> Callable[..., Awaitable[None]]:
+    async def record(job_id: str, *args: object) -> None:
+        calls.append((name, job_id))
+        await method(job_id, *args)
+
+    return record
+
+
+@pytest.fixture
+def queue_calls(
+    job_queue: JobQueueRedisRepository,
+    monkeypatch: pytest.MonkeyPatch,
+) -> List[Tuple[str, str]]:
+    """Records the slot releases and retries of the Job queue, in order."""
+    calls: List[Tuple[str, str]] = []
+    for name in ["release", "schedule_retry"]:
+        method = getattr(job_queue, name)
+        monkeypatch.setattr(job_queue, name, _record(calls, name, method))
+    return calls
+
+
+@pytest.fixture
+def job_repo() -> FakeJobRepository:
+    """Job repository holding a single pending Job."""
+    job_repo = FakeJobRepository()
+    job_repo.jobs["job"] = Job(id="job", env_vars={}, task_id="task")
+    return job_repo
+
+
+@pytest.mark.anyio
+async def test_rejects_jobs_past_the_queue_depth(
+    job_queue: JobQueueRedisRepository,
+) -> None:
+    """Tests that pushes beyond the maximum depth are rejected."""
+    assert await job_queue.push("a", 2)
+    assert await job_queue.push("b", 2)
+    assert not await job_queue.push("c", 2)
+
+    assert await job_queue.get_pending() == ["a", "b"]
+
+
+@pytest.mark.anyio
+async def test_admits_up_to_the_concurrent_jobs(
+    job_queue: JobQueueRedisRepository,
+) -> None:
+    """Tests that Jobs are admitted in order while running slots are free."""
+    for job_id in ["a", "b", "c"]:
+        await job_queue.push(job_id, 10)
+
+    assert await job_queue.admit(2) == "a"
+    assert await job_queue.admit(2) == "b"
+    assert await job_queue.admit(2) is None
+    assert await job_queue.running() == 2
+
+    await job_queue.release("a")
+    assert await job_queue.admit(2) == "c"
+    assert await job_queue.depth() == 0
+
+
+@pytest.mark.anyio
+async def test_promotes_only_due_retries(
+    job_queue: JobQueueRedisRepository,
+) -> None:
+    """Tests that retries go back to the end of the queue once they are due."""
+    await job_queue.push("pending", 10)
+    await job_queue.schedule_retry("due", 0)
+    await job_queue.schedule_retry("later", 60)
+
+    assert await job_queue.promote_due_retries() == 1
+    assert await job_queue.get_pending() == ["pending", "due"]
+    assert await job_queue.get_retrying() == ["later"]
+
+
+@pytest.mark.anyio
+async def test_answers_429_when_the_queue_is_full(
+    job_queue: JobQueueRedisRepository,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tests that a Job beyond the queue depth is rejected and not kept."""
+    monkeypatch.setattr(settings.job_manager_settings, "max_queue_depth", 1)
+    job_repo, dispatcher = FakeJobRepository(), FakeDispatcher()
+    job_svc = JobService(
+        task_svc=FakeTaskService(),
+        job_repo=job_repo,
+        job_queue=job_queue,
+        dispatcher=dispatcher,
+        storage_service=None,
+        log_streamer=None,
+    )
+
+    await create_job(JobDTO(task_id="task"), job_svc=job_svc)
+    with pytest.raises(HTTPException) as rejected:
+        await create_job(JobDTO(task_id="task"), job_svc=job_svc)
+
+    assert rejected.value.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert rejected.value.headers == {
+        "Retry-After": str(settings.job_manager_settings.queue_retry_after),
+    }
+    assert len(job_repo.jobs) == 1
+    assert dispatcher.requests == 1
+    assert await job_queue.depth() == 1
+
+
+@pytest.mark.anyio
+async def test_retries_failed_launches_with_backoff(
+    job_queue: JobQueueRedisRepository,
+    job_repo: FakeJobRepository,
+    queue_calls: List[Tuple[str, str]],
+    redis: fakeredis.FakeAsyncRedis,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tests that a failed launch frees its slot once, then is retried later."""
+    monkeypatch.setattr(settings.job_manager_settings, "retry_base_delay", 10)
+    dispatcher = JobDispatcher(
+        job_runner=FailingJobRunner(),
+        job_repo=job_repo,
+        task_repo=FakeTaskService(),
+        job_queue=job_queue,
+    )
+    await job_queue.push("job", 10)
+
+    assert await dispatcher.dispatch() == 1
+    await dispatcher.stop()
+
+    assert queue_calls == [("release", "job"), ("schedule_retry", "job")]
+    assert await job_queue.running() == 0
+    assert await job_queue.get_retrying() == ["job"]
+    delay = await redis.zscore("jobs:retry", "job") - time.time()
+    assert 4 < delay <= 10
+    assert await redis.hget("jobs:attempts", "job") == "1"
+    assert job_repo.jobs["job"].status == JobStatus.PENDING
+
+
+@pytest.mark.anyio
+async def test_buries_jobs_after_the_maximum_attempts(
+    job_queue: JobQueueRedisRepository,
+    job_repo: FakeJobRepository,
+    queue_calls: List[Tuple[str, str]],
+    redis: fakeredis.FakeAsyncRedis,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tests that a Job failing every launch is dead-lettered and marked failed."""
+    monkeypatch.setattr(settings.job_manager_settings, "retry_max_attempts", 3)
+    monkeypatch.setattr(settings.job_manager_settings, "retry_base_delay", 0)
+    job_runner = FailingJobRunner()
+    dispatcher = JobDispatcher(
+        job_runner=job_runner,
+        job_repo=job_repo,
+        task_repo=FakeTaskService(),
+        job_queue=job_queue,
+    )
+    await job_queue.push("job", 10)
+
+    for _ in range(5):
+        await dispatcher.dispatch()
+        await dispatcher.stop()
+
+    assert job_runner.runs == 3
+    assert queue_calls == [
+        ("release", "job"),
+        ("schedule_retry", "job"),
+        ("release", "job"),
+        ("schedule_retry", "job"),
+        ("release", "job"),
+    ]
+    assert await redis.smembers("jobs:dead") == {"job"}
+    assert await redis.hget("jobs:attempts", "job") is None
+    assert await job_queue.get_retrying() == []
+    assert await job_queue.depth() == 0
+    assert job_repo.jobs["job"].status == JobStatus.FAILED
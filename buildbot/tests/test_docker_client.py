@@ -0,0 +1,43 @@
+import socket
+import struct
+from types import SimpleNamespace
+from typing import Any, Dict
+
+from app.core.docker.client import AsyncDockerClient
+
+
+class FakeAPI:
+    """Stands in for docker-py's APIClient, attaching to a socket pair."""
+
+    def __init__(self, frames: bytes) -> None:
+        self.frames = frames
+        self.params: Dict[str, Any] = {}
+
+    def attach_socket(self, container: str, params: Dict[str, Any]) -> socket.socket:
+        """Returns the reading end of a socket the frames were written to."""
+        self.params = params
+        reader, writer = socket.socketpair()
+        with writer:
+            writer.sendall(self.frames)
+        return reader
+
+
+def _frame(stream: int, data: bytes) -> bytes:
+    return struct.pack(">BxxxL", stream, len(data)) + data
+
+
+def test_demultiplexes_log_frames() -> None:
+    """Tests that log frames are split per stream through docker-py's public API."""
+    api = FakeAPI(_frame(1, b"out\n") + _frame(2, b"err\n") + _frame(1, b"more"))
+    docker = AsyncDockerClient(SimpleNamespace(api=api), max_workers=1)
+    container = SimpleNamespace(
+        id="job",
+        attrs={"Config": {"Tty": False}, "State": {"Running": False}},
+    )
+
+    frames = list(docker.demuxed_logs(container, follow=True))
+
+    assert frames == [(b"out\n", None), (None, b"err\n"), (b"more", None)]
+    assert api.params["logs"] == 1
+    assert api.params["stream"] == 0
+    docker.close()
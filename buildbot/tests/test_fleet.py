@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+from typing import Any, Callable, List
+
+import pytest
+from app.core.docker.fleet import DockerFleet, DockerHost
+from app.core.docker.utils import Labels
+from app.core.exceptions import DockerHostUnavailableError
+
+
+class FakeDaemon:
+    """Stands in for the client of a Docker daemon running `running` Jobs."""
+
+    def __init__(self, running: int, idle: int = 0, reachable: bool = True) -> None:
+        self.running = running
+        self.idle = idle
+        self.reachable = reachable
+        self.client = self
+
+    async def list_containers(self, **_: Any) -> List[SimpleNamespace]:
+        """Lists the Job containers and the idle warm containers."""
+        if not self.reachable:
+            raise ConnectionError("daemon is down")
+        return [
+            SimpleNamespace(attrs={"Labels": {Labels.JOB_ID: job_id}, "Names": []})
+            for job_id in [f"job-{i}" for i in range(self.running)] + [""] * self.idle
+        ]
+
+    async def run_in_executor(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Runs a call inline."""
+        return fn(*args)
+
+    def info(self) -> dict:
+        """Returns the daemon's resources."""
+        return {"NCPU": 4, "MemTotal": 8 * 1024**3}
+
+
+@pytest.mark.anyio
+async def test_places_jobs_on_least_loaded_host() -> None:
+    """Tests that Jobs go to the host with the most free capacity.
+
+    Idle warm containers run no Job and do not count towards the load.
+    """
+    fleet = DockerFleet(
+        [
+            DockerHost("a", capacity=4, docker_client=FakeDaemon(running=3)),
+            DockerHost("b", capacity=4, docker_client=FakeDaemon(running=1, idle=2)),
+        ],
+    )
+
+    placed = [await fleet.place() for _ in range(4)]
+
+    assert placed == ["b", "b", "a", "b"]
+
+
+@pytest.mark.anyio
+async def test_derives_capacity_and_skips_unreachable_hosts() -> None:
+    """Tests that unset capacities come from the daemon and down hosts are skipped."""
+    down = FakeDaemon(running=0, reachable=False)
+    fleet = DockerFleet(
+        [
+            DockerHost("a", capacity=1, docker_client=FakeDaemon(running=1)),
+            DockerHost("b", docker_client=FakeDaemon(running=2)),
+            DockerHost("c", capacity=10, docker_client=down),
+        ],
+    )
+
+    assert await fleet.place() == "b"
+    assert list(await fleet.list_containers()) == ["a", "b"]
+
+    fleet = DockerFleet([DockerHost("c", docker_client=down)])
+    with pytest.raises(DockerHostUnavailableError):
+        await fleet.place()
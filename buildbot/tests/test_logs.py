@@ -0,0 +1,153 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import pytest
+from app.api.job.views import stream_job_logs_ws
+from app.core.settings import settings
+from app.services.job.logs import JobLogFollower, LogRingBuffer
+from app.services.job.schema import LogEntry
+
+Frame = Tuple[Optional[bytes], Optional[bytes]]
+
+
+class FakeDockerClient:
+    """Replays demultiplexed log frames of a container."""
+
+    def __init__(self, frames: List[Frame]) -> None:
+        self.frames = frames
+
+    def demuxed_logs(self, container: Any, follow: bool = False) -> Iterator[Frame]:
+        """Yields the log frames."""
+        yield from self.frames
+
+
+class FakeWebSocket:
+    """Records the sent messages of a viewer that disconnects on demand."""
+
+    def __init__(self) -> None:
+        self.sent: List[Dict[str, Any]] = []
+        self.closed = False
+        self.disconnected = asyncio.Event()
+
+    async def accept(self) -> None:
+        """Accepts the connection."""
+
+    async def send_json(self, data: Dict[str, Any]) -> None:
+        """Records a message."""
+        self.sent.append(data)
+
+    async def receive(self) -> Dict[str, Any]:
+        """Waits until the viewer disconnects."""
+        await self.disconnected.wait()
+        return {"type": "websocket.disconnect", "code": 1000}
+
+    async def close(self, code: int = 1000, reason: Optional[str] = None) -> None:
+        """Closes the connection."""
+        self.closed = True
+
+
+class FakeJobService:
+    """Streams the lines of a ring buffer and records when viewers leave."""
+
+    def __init__(self, buffer: LogRingBuffer) -> None:
+        self.buffer = buffer
+        self.viewers = 0
+
+    async def stream_logs(self, job_id: str, offset: int = 0) -> AsyncIterator[Any]:
+        """Subscribes to the ring buffer."""
+        self.viewers += 1
+        return self._read(offset)
+
+    async def _read(self, offset: int) -> AsyncIterator[LogEntry]:
+        try:
+            async for entry in self.buffer.read(offset):
+                yield entry
+        finally:
+            self.viewers -= 1
+
+
+@pytest.mark.anyio
+async def test_ring_buffer_keeps_the_latest_lines() -> None:
+    """Tests that old lines fall out and readers resume from the oldest kept."""
+    buffer = LogRingBuffer(max_lines=3)
+    for line in ["a", "b", "c", "d", "e"]:
+        await buffer.append("stdout", line)
+    await buffer.close()
+
+    entries = [entry async for entry in buffer.read(0)]
+
+    assert [(entry.offset, entry.data) for entry in entries] == [
+        (2, "c"),
+        (3, "d"),
+        (4, "e"),
+    ]
+    assert [entry.data async for entry in buffer.read(4)] == ["e"]
+
+
+@pytest.mark.anyio
+async def test_ring_buffer_wakes_up_readers() -> None:
+    """Tests that a reader waiting for lines gets them as they are appended."""
+    buffer = LogRingBuffer(max_lines=10)
+    await buffer.append("stdout", "old")
+    reader = asyncio.create_task(_collect(buffer.read(1)))
+
+    await asyncio.sleep(0)
+    await buffer.append("stderr", "new")
+    await buffer.close()
+
+    assert [(entry.stream, entry.data) for entry in await reader] == [
+        ("stderr", "new"),
+    ]
+
+
+async def _collect(entries: AsyncIterator[LogEntry]) -> List[LogEntry]:
+    return [entry async for entry in entries]
+
+
+@pytest.mark.anyio
+async def test_follower_splits_lines_past_the_maximum_length(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tests that long output is cut into bounded lines and partial ones kept."""
+    monkeypatch.setattr(settings.job_manager_settings, "log_stream_max_line_length", 4)
+    frames: List[Frame] = [
+        (b"abcdefghij", None),
+        (b"kl\nmn", b"err\r\n"),
+    ]
+    closed = asyncio.Event()
+    follower = JobLogFollower(
+        "job",
+        None,
+        FakeDockerClient(frames),
+        lambda _: closed.set(),
+    )
+
+    follower.start()
+    await asyncio.wait_for(closed.wait(), 5)
+
+    entries = await _collect(follower.buffer.read(0))
+    assert [(entry.stream, entry.data) for entry in entries] == [
+        ("stdout", "abcd"),
+        ("stdout", "efgh"),
+        ("stdout", "ijkl"),
+        ("stderr", "err"),
+        ("stdout", "mn"),
+    ]
+
+
+@pytest.mark.anyio
+async def test_websocket_viewers_leave_silent_jobs_on_disconnect() -> None:
+    """Tests that a viewer disconnecting from a silent Job is let go at once."""
+    buffer = LogRingBuffer(max_lines=10)
+    await buffer.append("stdout", "started")
+    job_svc, websocket = FakeJobService(buffer), FakeWebSocket()
+
+    viewer = asyncio.create_task(stream_job_logs_ws(websocket, "job", 0, job_svc))
+    await asyncio.sleep(0.1)
+    assert job_svc.viewers == 1
+    websocket.disconnected.set()
+    await asyncio.wait_for(viewer, 1)
+
+    assert [message["data"] for message in websocket.sent] == ["started"]
+    assert job_svc.viewers == 0
+    assert not buffer.closed
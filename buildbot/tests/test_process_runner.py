@@ -0,0 +1,145 @@
+import asyncio
+import resource
+import subprocess
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List
+
+import pytest
+from app.background.job_manager.process import manager as process_manager
+from app.background.job_manager.process.manager import ProcessJobManager
+from app.background.job_manager.utils import JobOutput
+from app.core.settings import ProcessJobManagerSettings
+from app.repository.job.schemas import JobStatus, JobUsage
+from app.services.job import runner as job_runner
+from app.services.job.runner import _GATE_SCRIPT, ProcessJobRunner, _spawn
+
+
+class FakeJobRepository:
+    """Records the status and usage updates of Jobs."""
+
+    def __init__(self) -> None:
+        self.statuses: Dict[str, JobStatus] = {}
+        self.usage: Dict[str, JobUsage] = {}
+
+    async def update_status(self, job_id: str, status: JobStatus) -> None:
+        """Records a Job status."""
+        self.statuses[job_id] = status
+
+    async def update_usage(self, job_id: str, usage: JobUsage) -> None:
+        """Records a Job usage."""
+        self.usage[job_id] = usage
+
+
+class FakeJobQueue:
+    """Records the released running slots."""
+
+    def __init__(self) -> None:
+        self.released: List[str] = []
+        self.event = asyncio.Event()
+
+    async def release(self, job_id: str) -> None:
+        """Releases the running slot of a Job."""
+        self.released.append(job_id)
+        self.event.set()
+
+
+class FakeArtifactHandler:
+    """Keeps the artifacts and outputs of Jobs in memory."""
+
+    def __init__(self) -> None:
+        self.artifacts: Dict[str, bytes] = {}
+        self.outputs: List[JobOutput] = []
+
+    async def save_artifact(self, job_id: str, stream: AsyncIterator[bytes]) -> None:
+        """Reads the whole artifact."""
+        self.artifacts[job_id] = b"".join([chunk async for chunk in stream])
+
+    async def handle_outputs(self, logs: JobOutput) -> None:
+        """Records the outputs."""
+        self.outputs.append(logs)
+
+
+class FakeProcessManager:
+    """Records the Job processes handed over by the runner."""
+
+    def __init__(self) -> None:
+        self.tracked: Dict[str, Any] = {}
+
+    def track(self, job_id: str, process: subprocess.Popen, workdir: Path) -> None:
+        """Records a Job process and waits for it."""
+        process.communicate()
+        self.tracked[job_id] = (process, workdir)
+
+
+@pytest.fixture
+def process_settings(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> ProcessJobManagerSettings:
+    """Process Job Manager settings creating workdirs in a temporary directory."""
+    process_settings = ProcessJobManagerSettings(
+        workdir_root=tmp_path,
+        isolate=False,
+        job_timeout=1,
+    )
+    for module in [process_manager, job_runner]:
+        monkeypatch.setattr(module, "_process_settings", process_settings)
+    return process_settings
+
+
+def test_spawns_processes_with_limits_and_no_stdin(
+    process_settings: ProcessJobManagerSettings,
+) -> None:
+    """Tests that limits are set before the command runs, without stdin."""
+    shell = process_settings.shell
+    process = _spawn(
+        [shell, "-c", _GATE_SCRIPT, shell, shell, "-c", "ulimit -n; cat"],
+        [(resource.RLIMIT_NOFILE, 77)],
+    )
+
+    stdout, _ = process.communicate(timeout=5)
+
+    assert process.returncode == 0
+    assert stdout == b"77\n"
+
+
+@pytest.mark.anyio
+async def test_writes_inputs_into_the_workdir(
+    process_settings: ProcessJobManagerSettings,
+) -> None:
+    """Tests that input files are written into the Job workdir before it runs."""
+    manager = FakeProcessManager()
+    runner = ProcessJobRunner(job_manager=manager)
+
+    await runner.run(
+        "job",
+        "cat data/in.txt > out.txt",
+        {},
+        inputs={"data/in.txt": b"input"},
+    )
+
+    process, workdir = manager.tracked["job"]
+    assert process.returncode == 0
+    assert workdir.parent == process_settings.workdir_root
+    assert (workdir / "out.txt").read_bytes() == b"input"
+
+
+@pytest.mark.anyio
+async def test_kills_jobs_past_their_timeout(
+    process_settings: ProcessJobManagerSettings,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tests that a Job running past its timeout is killed and marked as failed."""
+    job_repo, job_queue = FakeJobRepository(), FakeJobQueue()
+    manager = ProcessJobManager()
+    monkeypatch.setattr(manager, "_job_repo", job_repo)
+    monkeypatch.setattr(manager, "_job_queue", job_queue)
+    monkeypatch.setattr(manager, "_handler", FakeArtifactHandler())
+    runner = ProcessJobRunner(job_manager=manager)
+
+    await runner.run("job", "echo started; sleep 30", {})
+    await asyncio.wait_for(job_queue.event.wait(), 10)
+
+    assert job_repo.statuses == {"job": JobStatus.FAILED}
+    assert job_queue.released == ["job"]
+    assert list(process_settings.workdir_root.iterdir()) == []
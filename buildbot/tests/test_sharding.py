@@ -0,0 +1,117 @@
+import asyncio
+from typing import List
+
+import fakeredis
+import pytest
+from app.background.job_manager.sharding import JobOwnership
+from app.core.settings import settings
+from app.repository.job.lease import JobLeaseRedisRepository
+
+_JOB_IDS = [f"job-{i}" for i in range(300)]
+
+
+@pytest.fixture
+def redis() -> fakeredis.FakeAsyncRedis:
+    """In-memory Redis, with Lua scripting."""
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.fixture
+def lease_repo(
+    redis: fakeredis.FakeAsyncRedis,
+    monkeypatch: pytest.MonkeyPatch,
+) -> JobLeaseRedisRepository:
+    """Lease registry on the in-memory Redis, created anew for every test."""
+    monkeypatch.setattr(JobLeaseRedisRepository, "_instances", {})
+    return JobLeaseRedisRepository(redis.connection_pool)
+
+
+@pytest.fixture
+def heartbeats(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Sends heartbeats often and forgets silent managers quickly."""
+    monkeypatch.setattr(settings.job_manager_settings, "heartbeat_interval", 0.02)
+    monkeypatch.setattr(settings.job_manager_settings, "heartbeat_ttl", 0.3)
+
+
+async def _join(lease_repo: JobLeaseRedisRepository, count: int) -> List[JobOwnership]:
+    managers = [JobOwnership(lease_repo=lease_repo) for _ in range(count)]
+    for manager in managers:
+        await manager.start()
+    # ? Every manager sees the others after its next heartbeat.
+    await asyncio.sleep(0.1)
+    return managers
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("heartbeats")
+async def test_owns_every_job_exactly_once(
+    lease_repo: JobLeaseRedisRepository,
+) -> None:
+    """Tests that each Job has a single owner, and that all managers get some."""
+    managers = await _join(lease_repo, 3)
+
+    owners = {
+        job_id: [manager for manager in managers if manager.owns(job_id)]
+        for job_id in _JOB_IDS
+    }
+
+    assert all(len(owners[job_id]) == 1 for job_id in _JOB_IDS)
+    for manager in managers:
+        assert sum(owners[job_id] == [manager] for job_id in _JOB_IDS) > 50
+    assert sum(manager.is_leader for manager in managers) == 1
+    for manager in managers:
+        await manager.stop()
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("heartbeats")
+async def test_moves_only_the_jobs_of_a_manager_that_left(
+    lease_repo: JobLeaseRedisRepository,
+) -> None:
+    """Tests that ownership is stable when a Job Manager leaves."""
+    managers = await _join(lease_repo, 3)
+    before = {
+        job_id: next(manager for manager in managers if manager.owns(job_id))
+        for job_id in _JOB_IDS
+    }
+    gone, *remaining = managers
+
+    await gone.stop()
+    await asyncio.sleep(0.1)
+
+    for job_id, owner in before.items():
+        now = [manager for manager in remaining if manager.owns(job_id)]
+        assert len(now) == 1
+        if owner is not gone:
+            assert now == [owner]
+    for manager in remaining:
+        await manager.stop()
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("heartbeats")
+async def test_takes_jobs_over_once_the_lease_lapses(
+    lease_repo: JobLeaseRedisRepository,
+    redis: fakeredis.FakeAsyncRedis,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tests that a dead manager's Jobs are taken over after its lease expires."""
+    monkeypatch.setattr(settings.job_manager_settings, "job_lease_ttl", 1)
+    dead = JobOwnership(lease_repo=lease_repo)
+    await lease_repo.heartbeat(dead.manager_id)
+    (survivor,) = await _join(lease_repo, 1)
+    job_id = next(job_id for job_id in _JOB_IDS if not survivor.owns(job_id))
+    assert await dead.acquire(job_id)
+
+    # ? The dead manager sends no more heartbeats, so its Jobs move over.
+    await asyncio.sleep(0.5)
+    assert survivor.owns(job_id)
+    assert not await survivor.acquire(job_id)
+    await survivor.release(job_id)
+    assert await redis.get(f"job:lease:{job_id}") == dead.manager_id
+
+    await asyncio.sleep(0.6)
+    assert await survivor.acquire(job_id)
+    await dead.release(job_id)
+    assert await redis.get(f"job:lease:{job_id}") == survivor.manager_id
+    await survivor.stop()
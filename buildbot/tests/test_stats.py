@@ -0,0 +1,60 @@
+from typing import Any, Dict
+
+from app.background.job_manager.container.stats import UsageAccumulator
+from app.repository.job.schemas import JobUsage
+
+
+def _sample(
+    cpu_ns: int,
+    memory: Dict[str, int],
+    read: int = 0,
+    rx: int = 0,
+) -> Dict[str, Any]:
+    return {
+        "cpu_stats": {"cpu_usage": {"total_usage": cpu_ns}},
+        "memory_stats": memory,
+        "blkio_stats": {
+            "io_service_bytes_recursive": [
+                {"major": 8, "minor": 0, "op": "Read", "value": read},
+                {"major": 8, "minor": 0, "op": "Write", "value": 2 * read},
+            ],
+        },
+        "networks": {"eth0": {"rx_bytes": rx, "tx_bytes": 0}},
+    }
+
+
+def test_keeps_the_latest_counters_and_the_memory_peak() -> None:
+    """Tests that counters come from the latest sample and memory keeps its peak."""
+    accumulator = UsageAccumulator()
+
+    accumulator.add(_sample(1_000_000_000, {"usage": 300}, read=10, rx=5))
+    accumulator.add(_sample(3_000_000_000, {"usage": 100}, read=40, rx=9))
+
+    assert accumulator.usage == JobUsage(
+        cpu_seconds=3.0,
+        peak_memory_bytes=300,
+        block_read_bytes=40,
+        block_write_bytes=80,
+        network_rx_bytes=9,
+        samples=2,
+    )
+
+
+def test_prefers_the_kernel_peak_on_cgroup_v1() -> None:
+    """Tests that `max_usage` is used when the host reports it."""
+    accumulator = UsageAccumulator()
+
+    accumulator.add(_sample(0, {"usage": 100, "max_usage": 900}))
+
+    assert accumulator.usage.peak_memory_bytes == 900
+
+
+def test_ignores_samples_of_stopped_containers() -> None:
+    """Tests that samples without memory figures are not counted."""
+    accumulator = UsageAccumulator()
+    accumulator.add(_sample(2_000_000_000, {"usage": 100}))
+
+    accumulator.add(_sample(0, {}))
+
+    assert accumulator.usage.samples == 1
+    assert accumulator.usage.cpu_seconds == 2.0
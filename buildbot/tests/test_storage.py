@@ -0,0 +1,190 @@
+import gzip
+import io
+import json
+import tarfile
+from pathlib import Path
+from typing import AsyncIterator
+
+import pytest
+from app.core.exceptions import ArtifactCorruptedError
+from app.core.settings import S3StorageSettings
+from app.services.storage import (
+    ContentAddressedStorageService,
+    LocalStorageService,
+    S3StorageService,
+)
+from pydantic import ValidationError
+
+
+def _build_workdir_archive(files: dict) -> bytes:
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode="w") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name=f"workdir/{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return archive.getvalue()
+
+
+@pytest.fixture
+def storage(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> LocalStorageService:
+    """Local storage writing to a temporary volume."""
+    service = LocalStorageService()
+    monkeypatch.setattr(service, "_volume", tmp_path)
+    return service
+
+
+@pytest.fixture
+def blob_storage(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> ContentAddressedStorageService:
+    """Content-addressed storage writing to a temporary volume."""
+    service = ContentAddressedStorageService()
+    monkeypatch.setattr(service, "_volume", tmp_path)
+    monkeypatch.setattr(service, "_blobs", tmp_path / "blobs")
+    return service
+
+
+@pytest.mark.anyio
+async def test_downloads_indexed_artifact_files(
+    storage: LocalStorageService,
+    tmp_path: Path,
+) -> None:
+    """Tests that artifact files are served from the index written on upload."""
+    files = {"out/a.txt": b"a" * 1000, "b.txt": b"b"}
+    await storage.upload_artifact("job", _build_workdir_archive(files))
+
+    index = json.loads((tmp_path / "job/artifact.index.json").read_text())
+    assert set(index["members"]) == set(files)
+
+    for name, data in files.items():
+        stored_file = await storage.download("job", Path(name))
+        assert stored_file.size == len(data)
+        assert b"".join([chunk async for chunk in stored_file]) == data
+    with pytest.raises(FileNotFoundError):
+        await storage.download("job", Path("missing.txt"))
+
+
+@pytest.mark.anyio
+async def test_keeps_failed_uploads_out_of_place(
+    storage: LocalStorageService,
+    tmp_path: Path,
+) -> None:
+    """Tests that an interrupted upload leaves no partial artifact behind."""
+    archive = _build_workdir_archive({"a.txt": b"a" * 4096})
+
+    async def interrupted() -> AsyncIterator[bytes]:
+        yield archive[:1024]
+        raise ConnectionError("upload interrupted")
+
+    with pytest.raises(ConnectionError):
+        await storage.upload_artifact("job", interrupted())
+
+    assert list((tmp_path / "job").iterdir()) == []
+
+
+@pytest.mark.anyio
+async def test_rejects_corrupted_artifact_files(
+    storage: LocalStorageService,
+    tmp_path: Path,
+) -> None:
+    """Tests that a file no longer matching the index is refused before it is sent."""
+    files = {"a.txt": b"data", "b.txt": b"b" * 1000}
+    await storage.upload_artifact("job", _build_workdir_archive(files))
+    members = json.loads((tmp_path / "job/artifact.index.json").read_text())["members"]
+    with (tmp_path / "job/artifact.tar").open("r+b") as artifact:
+        artifact.seek(members["a.txt"]["offset"] - 512)
+        artifact.write(b"\0" * 512)
+        artifact.truncate(members["b.txt"]["offset"] + 10)
+
+    for name in files:
+        with pytest.raises(ArtifactCorruptedError):
+            await storage.download("job", Path(name))
+
+
+@pytest.mark.anyio
+async def test_migrates_legacy_gzipped_artifacts(
+    storage: LocalStorageService,
+    tmp_path: Path,
+) -> None:
+    """Tests that artifacts stored as .tar.gz before indexing are still served."""
+    files = {"a.txt": b"a" * 1000, "b/c.txt": b"c"}
+    (tmp_path / "job").mkdir()
+    (tmp_path / "job/artifact.tar.gz").write_bytes(
+        gzip.compress(_build_workdir_archive(files)),
+    )
+
+    for name, data in files.items():
+        stored_file = await storage.download("job", Path(name))
+        assert b"".join([chunk async for chunk in stored_file]) == data
+    assert not (tmp_path / "job/artifact.tar.gz").exists()
+    assert (tmp_path / "job/artifact.index.json").exists()
+
+
+@pytest.mark.anyio
+async def test_stores_identical_files_once(
+    blob_storage: ContentAddressedStorageService,
+    tmp_path: Path,
+) -> None:
+    """Tests that artifacts share blobs until the last one referencing them goes."""
+    shared = {"a.txt": b"a" * (2 * 1024 * 1024), "b/c.txt": b"c"}
+    await blob_storage.upload_artifact("one", _build_workdir_archive(shared))
+    await blob_storage.upload_artifact(
+        "two",
+        _build_workdir_archive({**shared, "d.txt": b"c"}),
+    )
+
+    blobs = [path for path in (tmp_path / "blobs").rglob("*") if path.is_file()]
+    assert len(blobs) == 2
+
+    await blob_storage.delete_artifact("one")
+    assert all(blob.exists() for blob in blobs)
+    stored_file = await blob_storage.download("two", Path("a.txt"))
+    assert b"".join([chunk async for chunk in stored_file]) == shared["a.txt"]
+
+    await blob_storage.delete_artifact("two")
+    assert not any(blob.exists() for blob in blobs)
+
+
+@pytest.mark.anyio
+async def test_uploads_artifacts_to_s3_in_parts(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tests that artifacts go up in parts and files come back by range."""
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+    for name in ["AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"]:
+        monkeypatch.setenv(name, "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+
+    with moto.mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket="artifacts")
+        service = S3StorageService()
+        monkeypatch.setattr(service, "_client", client)
+        monkeypatch.setattr(service, "_bucket", "artifacts")
+        monkeypatch.setattr(service, "_part_size", 5 * 1024 * 1024)
+
+        files = {"a.bin": bytes(range(256)) * 45000, "b/c.txt": b"c", "d": b""}
+        await service.upload_artifact("job", _build_workdir_archive(files))
+
+        artifact = client.head_object(Bucket="artifacts", Key="job/artifact.tar")
+        assert artifact["ETag"].endswith('-3"')
+        for name, data in files.items():
+            stored_file = await service.download("job", Path(name))
+            assert b"".join([chunk async for chunk in stored_file]) == data
+        with pytest.raises(FileNotFoundError):
+            await service.download("job", Path("missing.txt"))
+
+        assert await service.exists(Path("job"))
+        await service.delete_artifact("job")
+        assert not await service.exists(Path("job"))
+
+
+def test_rejects_parts_smaller_than_s3_allows() -> None:
+    """Tests that parts under 5 MiB fail validation rather than the upload."""
+    with pytest.raises(ValidationError):
+        S3StorageSettings(part_size=5 * 1024 * 1024 - 1)
+
+    assert S3StorageSettings(part_size=5 * 1024 * 1024)